@@ -0,0 +1,295 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import tree_to_prism as tp
+import validator
+
+MANIFEST_NAME = "manifest.json"
+PROPS_NAME = "properties.props"
+# characters replaced in the names of the output files
+UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_.+-]+")
+
+
+def collect_inputs(source):
+    """
+    Collects the ADTool files to convert.
+
+    Args:
+        source (str): A directory (every *.xml file inside it is used) or a glob pattern.
+
+    Returns:
+        list: The sorted list of input file paths.
+    """
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "*.xml")
+    else:
+        pattern = source
+    return sorted(p for p in glob.glob(pattern) if os.path.isfile(p))
+
+
+def load_prune_lists(file):
+    """
+    Loads the per-file prune lists.
+
+    The file is a JSON object mapping an input file name (or its path) to the list
+    of subtree roots to keep. Every entry, a label or a list of labels kept together,
+    produces its own pruned model next to the full one.
+
+    Args:
+        file (str): The path to the JSON file, or None.
+
+    Returns:
+        dict: A dictionary mapping file names to lists of labels or lists of labels.
+    """
+    if not file:
+        return {}
+    with open(file) as f:
+        data = json.load(f)
+    return {k: [v] if isinstance(v, str) else list(v) for k, v in data.items()}
+
+
+def file_digest(file, options):
+    """
+    Computes the content hash used to detect unchanged inputs.
+
+    Args:
+        file (str): The path to the input file.
+        options (dict): The conversion options that affect the outputs.
+
+    Returns:
+        str: The hex sha256 digest of the file content and the options.
+    """
+    h = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    h.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def output_stems(files):
+    """
+    Names the outputs of the inputs after their paths relative to their deepest common
+    directory, so that inputs with the same file name in different directories do not
+    overwrite each other (a/t.xml and b/t.xml give a__t and b__t).
+
+    Args:
+        files (list): The paths of the input files.
+
+    Returns:
+        dict: Maps every input file to the stem of its output files.
+    """
+    if not files:
+        return {}
+    paths = {file: os.path.abspath(file) for file in files}
+    root = os.path.commonpath([os.path.dirname(path) for path in paths.values()])
+    return {file: UNSAFE_NAME.sub("_", os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "__"))
+            for file, path in paths.items()}
+
+
+def model_path(output_dir, stem, prune=None):
+    if prune:
+        stem = f"{stem}__{UNSAFE_NAME.sub('_', prune if isinstance(prune, str) else '+'.join(prune))}"
+    return os.path.join(output_dir, stem + ".prism")
+
+
+def convert_file(file, output_dir, prune_labels=(), time_model=False, snapshots=True, stem=None):
+    """
+    Converts one ADTool file into its PRISM model(s). Runs inside a worker process.
+
+    Args:
+        file (str): The path to the input file.
+        output_dir (str): The directory where the models are written.
+        prune_labels (list): The subtree roots to keep, one pruned model for every label
+            or list of labels.
+        time_model (bool): Whether to generate the time-based model.
+        snapshots (bool): Whether to load the tree from its snapshot (see tree_to_prism.load_file).
+        stem (str): The name of the output files (see output_stems), the input file name by default.
+
+    Returns:
+        dict: The manifest entry of the file (timings, models and error, if any).
+    """
+    if stem is None:
+        stem = os.path.splitext(os.path.basename(file))[0]
+    generate = tp.get_prism_model_time if time_model else tp.get_prism_model
+    entry = {"input": file, "status": "converted", "timings": {}, "models": []}
+    start = time.perf_counter()
+    try:
+        issues = validator.validate_file(file, timed=time_model)
+        entry["timings"]["validate"] = time.perf_counter() - start
+        if issues:
+            entry["issues"] = [issue.to_dict() for issue in issues]
+        validator.check(issues)
+
+        t = time.perf_counter()
+        tree = tp.load_file(file, snapshots)
+        entry["timings"]["parse"] = time.perf_counter() - t
+
+        for prune in [None] + list(prune_labels):
+            t = time.perf_counter()
+            targets = [prune] if isinstance(prune, str) else prune
+            prism_model = generate(tree.prune(*targets) if prune else tree)
+            path = model_path(output_dir, stem, prune)
+            if any(model["path"] == path for model in entry["models"]):
+                raise ValueError(f"Prune lists {prune} and another one give the same output file {path}")
+            tp.save_prism_model(prism_model, path)
+            entry["models"].append({
+                "prune": prune,
+                "path": path,
+                "bytes": len(prism_model.encode("utf-8")),
+                "lines": prism_model.count("\n") + 1,
+                "convert_time": time.perf_counter() - t
+            })
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["timings"]["total"] = time.perf_counter() - start
+    return entry
+
+
+def run_prism(prism, model, props):
+    """
+    Runs PRISM on a generated model, writing its outputs next to the model.
+
+    Args:
+        prism (str): The path to the PRISM executable.
+        model (dict): The manifest entry of the model.
+        props (str): The path to the properties file.
+
+    Returns:
+        dict: The PRISM outcome (time, output files and error, if any).
+    """
+    base = os.path.splitext(model["path"])[0]
+    outputs = {"txt": base + ".txt", "csv": base + ".csv", "dot": base + ".dot"}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [prism, model["path"], props, "-prop", "1",
+         "-simpath", "deadlock", outputs["txt"],
+         "-exportresults", outputs["csv"] + ":csv",
+         "-exportstrat", outputs["dot"]],
+        capture_output=True,
+        text=True
+    )
+    outcome = {"time": time.perf_counter() - start, "returncode": result.returncode, "outputs": outputs}
+    if result.returncode != 0:
+        outcome["error"] = (result.stderr or result.stdout)[-2000:]
+    return outcome
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_up_to_date(entry, digest, run_prism):
+    """Checks if a previous manifest entry can be reused for an input with the given digest."""
+    if not entry or entry.get("sha256") != digest or entry.get("status") == "failed":
+        return False
+    for model in entry["models"]:
+        if not os.path.exists(model["path"]):
+            return False
+        if run_prism and model.get("prism", {}).get("returncode") != 0:
+            return False
+    return True
+
+
+def run_batch(source, output_dir, prune_lists=None, time_model=False, workers=None,
+              prism=None, prism_jobs=1, force=False, snapshots=True):
+    """
+    Converts every ADTool file of a directory or glob with a process pool.
+
+    Unchanged inputs (same content hash and options as in the previous manifest) are
+    skipped. When a PRISM executable is given, the generated models are checked with at
+    most `prism_jobs` concurrent PRISM processes, and a file with a model that PRISM
+    fails on is failed. A summary manifest is written in the output directory.
+
+    Args:
+        source (str): A directory or a glob pattern of input files.
+        output_dir (str): The directory where models, PRISM outputs and manifest are written.
+        prune_lists (dict): A dictionary mapping file names to lists of subtree roots to keep.
+        time_model (bool): Whether to generate the time-based models.
+        workers (int): The number of conversion processes (defaults to the CPU count).
+        prism (str): The path to the PRISM executable, or None to skip model checking.
+        prism_jobs (int): The maximum number of concurrent PRISM processes.
+        force (bool): Whether to convert inputs even if they are unchanged.
+        snapshots (bool): Whether to load the trees from their snapshots next to the inputs.
+
+    Returns:
+        dict: The manifest.
+    """
+    prune_lists = prune_lists or {}
+    os.makedirs(output_dir, exist_ok=True)
+    previous = load_manifest(output_dir).get("files", {})
+    files = {}
+    pending = {}
+
+    inputs = collect_inputs(source)
+    stems = output_stems(inputs)
+    # the stems can still clash once sanitised (e.g. "a b.xml" and "a_b.xml"): no file overwrites another
+    clashes = {stem for stem, count in Counter(stems.values()).items() if count > 1}
+    for file in inputs:
+        if stems[file] in clashes:
+            files[file] = {"input": file, "status": "failed", "timings": {}, "models": [],
+                           "error": f"Another input has the same output name {stems[file]}"}
+            continue
+        prune_labels = prune_lists.get(file, prune_lists.get(os.path.basename(file), []))
+        options = {"prune": prune_labels, "time": time_model, "prism": prism is not None, "stem": stems[file]}
+        digest = file_digest(file, options)
+        entry = previous.get(file)
+        if not force and is_up_to_date(entry, digest, prism is not None):
+            files[file] = dict(entry, status="skipped")
+        else:
+            pending[file] = (prune_labels, digest)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_file, file, output_dir, prune_labels, time_model, snapshots, stems[file]): (file, digest)
+            for file, (prune_labels, digest) in pending.items()
+        }
+        for future in as_completed(futures):
+            file, digest = futures[future]
+            entry = future.result()
+            entry["sha256"] = digest
+            files[file] = entry
+
+    if prism is not None:
+        props = os.path.join(output_dir, PROPS_NAME)
+        tp.save_prism_properties(props)
+        models = [m for file in pending for m in files[file]["models"]]
+        with ThreadPoolExecutor(max_workers=max(1, prism_jobs)) as executor:
+            futures = {executor.submit(run_prism, prism, m, props): m for m in models}
+            for future in as_completed(futures):
+                futures[future]["prism"] = future.result()
+        # a file whose models PRISM rejects is failed, so that the batch does not succeed
+        for file in pending:
+            entry = files[file]
+            rejected = [m["path"] for m in entry["models"] if m["prism"]["returncode"] != 0]
+            if rejected and entry["status"] != "failed":
+                entry["status"] = "failed"
+                entry["error"] = f"PRISM failed on {len(rejected)} of {len(entry['models'])} model(s): {', '.join(rejected)}"
+
+    manifest = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "total_time": time.perf_counter() - start,
+        "summary": {
+            status: sum(1 for e in files.values() if e["status"] == status)
+            for status in ("converted", "skipped", "failed")
+        },
+        "files": dict(sorted(files.items()))
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
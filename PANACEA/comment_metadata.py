@@ -0,0 +1,92 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# one "Key: value" field per line of an ADTool <comment>, split at the first colon
+FIELD = re.compile(r"^([^:\n]*):(.*)$", re.MULTILINE)
+
+# comments are repeated verbatim across templated trees, so parsed records are shared
+CACHE_SIZE = 4096
+
+
+def parse_number(value):
+    """
+    Parses a numeric field (cost or time) of a node comment.
+
+    Args:
+        value (str): The value of the field, possibly empty.
+
+    Returns:
+        int | float | None: The parsed number, or None if the field is empty.
+
+    Raises:
+        ValueError: If the value is not a number.
+    """
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"Invalid number: {value!r}") from None
+
+
+class NodeMetadata(NamedTuple):
+    """The fields of an ADTool node comment."""
+    type: str = ""
+    action: str = ""
+    cost: "int | float | None" = None
+    time: "int | float | None" = None
+    role: str = ""
+    fields: tuple = ()
+    errors: tuple = ()
+
+    def to_dict(self):
+        """
+        Returns all the fields of the comment as a dictionary with lowercase keys, as
+        exported to the frontend: unknown keys and invalid numbers are kept as written.
+
+        Returns:
+            dict: The fields, with the integer values converted.
+        """
+        return dict(self.fields)
+
+
+def _convert(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_comment(comment):
+    """
+    Parses an ADTool node comment into a metadata record, in a single pass.
+
+    Every field is also kept in `fields` (lowercase keys, integer values converted),
+    and invalid numbers are reported in `errors` instead of raising, so that callers
+    can decide how to handle them.
+
+    Args:
+        comment (str): The comment of the node, possibly empty or None.
+
+    Returns:
+        NodeMetadata: The parsed record.
+    """
+    known = {}
+    fields = []
+    errors = []
+    for key, value in FIELD.findall(comment or ""):
+        key, value = key.strip().lower(), value.strip()
+        fields.append((key, _convert(value)))
+        if key in ("type", "action", "role"):
+            known[key] = value
+        elif key in ("cost", "time"):
+            try:
+                known[key] = parse_number(value)
+            except ValueError:
+                errors.append(f"Invalid {key}: {value!r}")
+    return NodeMetadata(fields=tuple(fields), errors=tuple(errors), **known)
@@ -0,0 +1,576 @@
+# Explicit-state export of the attack-defense games: the reachable states are enumerated
+# in Python, straight from the action tables of get_info, and written as PRISM explicit
+# model files, so that PRISM imports the state space instead of parsing the language model
+# and building it. The semantics are those of build_prism_model and build_prism_model_time:
+# every command of those models is compiled here to a guard and updates over a state matrix.
+#
+# Files, for a base name:
+#   .sta   the variables and the value of every state
+#   .tra   the transitions, one choice per enabled command (the games are deterministic)
+#   .lab   the labels init, deadlock and terminate
+#   .pla   the player owning every state, in the format of the labels
+#   _<reward structure>.trew   the transition rewards of the attacker and the defender
+# The deadlock states have no transitions: PRISM adds their self-loops and labels them, as
+# it does when it builds the language model.
+
+import random
+
+import numpy as np
+
+from tree_to_prism import get_info, info_values
+
+PLAYERS = ("attacker", "defender")
+LABELS = ("init", "deadlock", "terminate")
+REWARDS = ("attacker", "defender")
+
+# comparisons of a guard, on a column of the state matrix
+COMPARISONS = {
+    "=": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    ">": np.greater,
+}
+
+# mixed-radix state keys are packed in 64-bit words
+WORD_CAPACITY = 2 ** 63
+# states of the frontier expanded together
+CHUNK = 16384
+
+
+class StateSpaceError(ValueError):
+    """Raised when a state space has more states than allowed."""
+
+
+class Variable:
+    """
+    A variable of the model: an integer range, or a bool stored as 0 and 1. As in the
+    PRISM models, its initial value is the lower bound.
+    """
+    __slots__ = ("name", "low", "high", "boolean")
+
+    def __init__(self, name, low, high, boolean=False):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.boolean = boolean
+
+
+class Command:
+    """
+    A command of the model: the action, its player, the guard and the updates.
+
+    The guard is a tuple tree: (comparison, variable, value) with a comparison of
+    COMPARISONS, or ("and", [guards]) and ("or", [guards]). The updates are
+    (variable, value, relative) tuples, relative ones adding the value.
+    """
+    __slots__ = ("action", "player", "guard", "updates")
+
+    def __init__(self, action, player, guard, updates):
+        self.action = action
+        self.player = player
+        self.guard = guard
+        self.updates = updates
+
+
+class ModelBuilder:
+    """
+    Declares the variables and the commands of a model, referring to the variables by name.
+    """
+    def __init__(self):
+        self.variables = []
+        self.index = {}
+        self.commands = []
+        self.rewards = {name: {} for name in REWARDS}
+
+    def declare(self, name, low, high, boolean=False):
+        if name in self.index:
+            raise ValueError(f"Duplicated variable: {name}")
+        self.index[name] = len(self.variables)
+        self.variables.append(Variable(name, low, high, boolean))
+
+    def variable(self, name):
+        if name not in self.index:
+            raise ValueError(f"Unknown variable: {name}")
+        return self.index[name]
+
+    def compare(self, comparison, name, value):
+        return (comparison, self.variable(name), value)
+
+    def preconditions(self, preconditions, refinement, comparison="=", value=1, negate=False):
+        """
+        Returns the guard on the preconditions of an action, or None without preconditions:
+        all of them (conjunctive) or any of them (disjunctive) equal to 1. With negate, the
+        guard of the failure of the timed model: the refinement is swapped and the
+        comparisons negated.
+        """
+        if not preconditions:
+            return None
+        conjunctive = (refinement != "disjunctive") != negate
+        atoms = [self.compare(comparison, p, value) for p in dict.fromkeys(preconditions)]
+        return ("and" if conjunctive else "or", atoms)
+
+    def command(self, action, player, guards, updates):
+        guard = ("and", [g for g in guards if g is not None])
+        updates = [(self.variable(name), value, relative) for name, value, relative in updates]
+        self.commands.append(Command(action, player, guard, updates))
+
+    def reward(self, structure, action, value):
+        # as in PRISM, the items of the same action add up
+        self.rewards[structure][action] = self.rewards[structure].get(action, 0) + value
+
+
+def integer(value, name):
+    if value is None:
+        raise ValueError(f"{name} has no time")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"The time of {name} is not an integer: {value}")
+        return int(value)
+    return value
+
+
+def declare_globals(builder, info):
+    goal, _, initial_attributes, _, _, attacker_nodes, _ = info
+    builder.declare("sched", 1, 2)
+    builder.declare(goal, 0, 1)
+    for a in dict.fromkeys(node.label for node in attacker_nodes if node.type == "Attribute"):
+        builder.declare(a, 0, 2)
+    for a in dict.fromkeys(initial_attributes):
+        builder.declare(a, 1, 2)
+
+
+def build_commands(info, value):
+    """
+    Compiles the commands of build_prism_model.
+
+    Args:
+        info (tuple): The information extracted by get_info.
+        value (callable): The accessor of the costs and times, see info_values.
+
+    Returns:
+        ModelBuilder: The variables, commands and rewards.
+    """
+    goal, actions_to_goal, _, attacker_actions, defender_actions, _, defender_nodes = info
+    builder = ModelBuilder()
+    declare_globals(builder, info)
+    for a in attacker_actions:
+        builder.declare(a, 0, 1, boolean=True)
+    defender_attributes = dict.fromkeys(node.label for node in defender_nodes if node.type == "Attribute")
+    for a in defender_attributes:
+        builder.declare(a, 0, 1)
+
+    for a, action in attacker_actions.items():
+        effect = action["effect"]
+        builder.command(a, 0, [
+            builder.compare("=", "sched", 1), builder.compare("!=", goal, 1), builder.compare("=", effect, 0),
+            builder.compare("=", a, 0), builder.preconditions(action["preconditions"], action["refinement"])
+        ], [(effect, 1, False), (a, 1, False), ("sched", 2, False)])
+
+    for a, action in defender_actions.items():
+        effect = action["effect"]
+        # a defender attribute is enabled, an attacker attribute disabled
+        enabled = effect in defender_attributes
+        builder.command(a, 1, [
+            builder.compare("=", "sched", 2), builder.compare("!=", goal, 1),
+            builder.compare("=", effect, 0) if enabled else builder.compare("!=", effect, 2),
+            builder.preconditions(action["preconditions"], action["refinement"])
+        ], [(effect, 1 if enabled else 2, False), ("sched", 1, False)])
+
+    for a in attacker_actions:
+        builder.reward("attacker", a, value("attacker", "cost", a))
+    for a in actions_to_goal:
+        builder.reward("defender", a, value("goal", "cost", a))
+    for a in defender_actions:
+        builder.reward("defender", a, value("defender", "cost", a))
+    return builder
+
+
+def build_commands_time(info, value):
+    """
+    Compiles the commands of build_prism_model_time.
+
+    Args:
+        info (tuple): The information extracted by get_info.
+        value (callable): The accessor of the costs and times, see info_values.
+
+    Returns:
+        ModelBuilder: The variables, commands and rewards.
+    """
+    goal, actions_to_goal, _, attacker_actions, defender_actions, attacker_nodes, defender_nodes = info
+    builder = ModelBuilder()
+    declare_globals(builder, info)
+    for a in dict.fromkeys(node.action for node in attacker_nodes if node.action):
+        builder.declare(f"progress{a}", 0, 1, boolean=True)
+    builder.declare("time1", -1, integer(value("attacker", "max_time"), "the attacker"))
+    defender_attributes = dict.fromkeys(node.label for node in defender_nodes if node.type == "Attribute")
+    for a in defender_attributes:
+        builder.declare(a, 0, 1)
+    for a in dict.fromkeys(node.action for node in defender_nodes if node.action):
+        builder.declare(f"progress{a}", 0, 1, boolean=True)
+    builder.declare("time2", -1, integer(value("defender", "max_time"), "the defender"))
+
+    builder.command("wait1", 0, [builder.compare("=", "sched", 1), builder.compare(">", "time1", 0)],
+                    [("sched", 2, False), ("time1", -1, True)])
+    for a, action in attacker_actions.items():
+        effect = action["effect"]
+        time = integer(value("attacker", "time", a), a)
+        preconditions = builder.preconditions(action["preconditions"], action["refinement"])
+        started = [builder.compare("=", "sched", 1), builder.compare("=", "time1", 0),
+                   builder.compare("=", f"progress{a}", 1), builder.compare("!=", goal, 1)]
+        builder.command(f"start{a}", 0, [
+            builder.compare("=", "sched", 1), builder.compare("<", "time1", 0), builder.compare("=", f"progress{a}", 0),
+            builder.compare("!=", goal, 1), builder.compare("=", effect, 0), preconditions
+        ], [("sched", 2, False), ("time1", time, False), (f"progress{a}", 1, False)])
+        builder.command(f"end{a}", 0, started + [builder.compare("=", effect, 0), preconditions],
+                        [("time1", -1, True), (f"progress{a}", 0, False), (effect, 1, False)])
+        failed = builder.preconditions(action["preconditions"], action["refinement"], "!=", negate=True)
+        builder.command(f"fail{a}", 0, started + [
+            ("or", [builder.compare("!=", effect, 0)] + ([failed] if failed else []))
+        ], [("time1", -1, True), (f"progress{a}", 0, False)])
+
+    builder.command("wait2", 1, [builder.compare("=", "sched", 2), builder.compare(">", "time2", 0)],
+                    [("sched", 1, False), ("time2", -1, True)])
+    for a, action in defender_actions.items():
+        effect = action["effect"]
+        time = integer(value("defender", "time", a), a)
+        enabled = effect in defender_attributes
+        available = builder.compare("=", effect, 0) if enabled else builder.compare("!=", effect, 2)
+        preconditions = builder.preconditions(action["preconditions"], action["refinement"])
+        builder.command(f"start{a}", 1, [
+            builder.compare("=", "sched", 2), builder.compare("<", "time2", 0), builder.compare("=", f"progress{a}", 0),
+            builder.compare("!=", goal, 1), available, preconditions
+        ], [("sched", 1, False), ("time2", time, False), (f"progress{a}", 1, False)])
+        builder.command(f"end{a}", 1, [
+            builder.compare("=", "sched", 2), builder.compare("=", "time2", 0), builder.compare("=", f"progress{a}", 1),
+            builder.compare("!=", goal, 1), available, preconditions
+        ], [("time2", -1, True), (f"progress{a}", 0, False), (effect, 1 if enabled else 2, False)])
+
+    for a in attacker_actions:
+        builder.reward("attacker", f"start{a}", value("attacker", "cost", a))
+    for a in actions_to_goal:
+        builder.reward("defender", f"end{a}", value("goal", "cost", a))
+    for a in defender_actions:
+        builder.reward("defender", f"start{a}", value("defender", "cost", a))
+    return builder
+
+
+def evaluate(guard, states):
+    """
+    Evaluates a guard on the rows of a state matrix.
+
+    Returns:
+        ndarray: The boolean mask of the states satisfying the guard.
+    """
+    operator = guard[0]
+    if operator == "and":
+        mask = np.ones(len(states), dtype=bool)
+        for g in guard[1]:
+            mask &= evaluate(g, states)
+        return mask
+    if operator == "or":
+        mask = np.zeros(len(states), dtype=bool)
+        for g in guard[1]:
+            mask |= evaluate(g, states)
+        return mask
+    return COMPARISONS[operator](states[:, guard[1]], guard[2])
+
+
+class StateKeys:
+    """
+    Packs the rows of state matrices into sortable keys: the values are mixed-radix
+    digits, packed in as many 64-bit words as needed (one word is a uint64 key, more
+    words a fixed-size bytes key).
+    """
+    def __init__(self, variables):
+        self.low = np.array([v.low for v in variables], dtype=np.int64)
+        self.words = []  # the variable columns and strides of every word
+        columns, strides, capacity = [], [], 1
+        for i, v in enumerate(variables):
+            size = v.high - v.low + 1
+            if capacity * size > WORD_CAPACITY and columns:
+                self.words.append((columns, strides))
+                columns, strides, capacity = [], [], 1
+            columns.append(i)
+            strides.append(capacity)
+            capacity *= size
+        self.words.append((columns, strides))
+
+    def __call__(self, states):
+        words = np.zeros((len(states), len(self.words)), dtype=np.uint64)
+        for w, (columns, strides) in enumerate(self.words):
+            # a column at a time: the states are small integers, the keys 64-bit
+            for column, stride in zip(columns, strides):
+                words[:, w] += (states[:, column] - self.low[column]).astype(np.uint64) * np.uint64(stride)
+        if len(self.words) == 1:
+            return words[:, 0]
+        return words.view(np.dtype((np.void, 8 * len(self.words)))).ravel()
+
+
+class ExplicitModel:
+    """
+    The reachable state space of a model, in arrays.
+
+    Attributes:
+        variables (list): The Variable of every column of the states.
+        states (ndarray): The values of every state, a row each; state 0 is the initial state.
+        actions (list): The action of every command.
+        players (ndarray): The player owning every state (the one whose turn it is).
+        offsets (ndarray): The choices of state i are offsets[i]:offsets[i + 1].
+        targets (ndarray): The successor of every choice.
+        choice_actions (ndarray): The index in actions of every choice.
+        rewards (dict): The reward of every choice, by reward structure.
+    """
+    def __init__(self, variables, states, actions, players, offsets, targets, choice_actions, rewards):
+        self.variables = variables
+        self.states = states
+        self.actions = actions
+        self.players = players
+        self.offsets = offsets
+        self.targets = targets
+        self.choice_actions = choice_actions
+        self.rewards = rewards
+
+    @property
+    def size(self):
+        return len(self.states)
+
+    def labels(self):
+        """
+        Returns:
+            dict: The boolean mask of the states of every label of LABELS.
+        """
+        init = np.zeros(self.size, dtype=bool)
+        init[0] = True
+        deadlock = np.diff(self.offsets) == 0
+        # the goal is the second variable, see declare_globals
+        return {"init": init, "deadlock": deadlock, "terminate": self.states[:, 1] == 1}
+
+    def value_tables(self):
+        """Returns the strings of the values of every variable as PRISM prints them, from the lower bound."""
+        return [["false", "true"] if v.boolean else [str(x) for x in range(v.low, v.high + 1)]
+                for v in self.variables]
+
+    def values(self, state):
+        """Returns the values of a state as PRISM prints them."""
+        return [table[x - v.low] for table, v, x in zip(self.value_tables(), self.variables, self.states[state].tolist())]
+
+    def value_columns(self):
+        """Returns the values of every variable as PRISM prints them, a column of strings each."""
+        return [np.array(table, dtype=object)[self.states[:, i] - v.low]
+                for i, (table, v) in enumerate(zip(self.value_tables(), self.variables))]
+
+    def valuations(self):
+        """
+        Returns:
+            list: The values of every state as PRISM prints them, e.g. (1,0,false).
+        """
+        rows = np.column_stack(self.value_columns()).tolist()
+        return [f"({','.join(row)})" for row in rows]
+
+    def statistics(self):
+        return {"states": self.size, "choices": len(self.targets), "transitions": len(self.targets),
+                "deadlocks": int(np.count_nonzero(np.diff(self.offsets) == 0))}
+
+    def write(self, basename):
+        """
+        Writes the explicit model files (see the top of the module).
+
+        Args:
+            basename (str): The path of the files without extension.
+
+        Returns:
+            list: The paths of the files written.
+        """
+        paths = []
+
+        def write_lines(suffix, header, lines):
+            path = f"{basename}{suffix}"
+            with open(path, "w") as f:
+                f.write(header + "\n")
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+            paths.append(path)
+
+        names = ",".join(v.name for v in self.variables)
+        write_lines(".sta", f"({names})", [f"{i}:{v}" for i, v in enumerate(self.valuations())])
+
+        sources = np.repeat(np.arange(self.size), np.diff(self.offsets))
+        choices = np.arange(len(self.targets)) - self.offsets[sources]
+        columns = (sources.tolist(), choices.tolist(), self.targets.tolist())
+        actions = [self.actions[a] for a in self.choice_actions.tolist()]
+        write_lines(".tra", f"{self.size} {len(self.targets)} {len(self.targets)}",
+                    ["%d %d %d 1 %s" % row for row in zip(*columns, actions)])
+
+        # the labels of a state as a bit mask, written from the text of every combination
+        labels = self.labels()
+        codes = sum(labels[name].astype(np.int64) << i for i, name in enumerate(LABELS))
+        combinations = [" ".join(str(i) for i in range(len(LABELS)) if code >> i & 1) for code in range(2 ** len(LABELS))]
+        labelled = np.flatnonzero(codes)
+        write_lines(".lab", " ".join(f'{i}="{name}"' for i, name in enumerate(LABELS)),
+                    [f"{s}: {combinations[c]}" for s, c in zip(labelled.tolist(), codes[labelled].tolist())])
+
+        write_lines(".pla", " ".join(f'{i}="{name}"' for i, name in enumerate(PLAYERS)),
+                    ["%d: %d" % row for row in enumerate(self.players.tolist())])
+
+        for name, values in self.rewards.items():
+            nonzero = np.flatnonzero(values)
+            write_lines(f"_{name}.trew", f'# Reward structure "{name}"\n{self.size} {len(self.targets)} {len(nonzero)}',
+                        ["%d %d %d %r" % row for row in zip(*(np.asarray(c)[nonzero].tolist() for c in columns),
+                                                            values[nonzero].tolist())])
+        return paths
+
+    def import_args(self, basename):
+        """
+        Returns:
+            list: The PRISM options importing the files written by write, in place of the model file.
+        """
+        args = ["-importtrans", f"{basename}.tra", "-importstates", f"{basename}.sta",
+                "-importlabels", f"{basename}.lab", "-importplayers", f"{basename}.pla"]
+        for name in self.rewards:
+            args += ["-importtransrewards", f"{basename}_{name}.trew"]
+        return args + ["-smg"]
+
+    def policy_path(self, choices=None, max_steps=10000, seed=None):
+        """
+        Simulates a path from the initial state to a deadlock, in the format of PRISM's
+        -simpath: the states where a choice is prescribed take one of its actions, the
+        others a random choice.
+
+        Args:
+            choices (dict): The actions chosen in every state, by valuation (see valuations).
+            max_steps (int): The maximum number of transitions.
+            seed (int): The random seed.
+
+        Returns:
+            str: The path, a header and a line per state.
+        """
+        r = random.Random(seed)
+        choices = choices or {}
+        lines = ["action step " + " ".join(v.name for v in self.variables)]
+        state, values = 0, self.values(0)
+        lines.append(f"- 0 {' '.join(values)}")
+        for step in range(1, max_steps + 1):
+            available = range(self.offsets[state], self.offsets[state + 1])
+            if not available:
+                break
+            chosen = choices.get(f"({','.join(values)})")
+            candidates = [c for c in available if self.actions[self.choice_actions[c]] in chosen] if chosen else []
+            choice = r.choice(candidates or available)
+            state = int(self.targets[choice])
+            values = self.values(state)
+            lines.append(f"[{self.actions[self.choice_actions[choice]]}] {step} {' '.join(values)}")
+        return "\n".join(lines) + "\n"
+
+
+def successors(commands, frontier, frontier_ids, low, high, variables):
+    """
+    Applies every command enabled in the states of a frontier.
+
+    Returns:
+        tuple: The successor rows, their source state ids and their command indices.
+
+    Raises:
+        ValueError: If an update leaves the range of its variable.
+    """
+    rows, sources, command_ids = [], [], []
+    for c, command in enumerate(commands):
+        enabled = np.flatnonzero(evaluate(command.guard, frontier))
+        if not len(enabled):
+            continue
+        updated = frontier[enabled]
+        for variable, value, relative in command.updates:
+            updated[:, variable] = updated[:, variable] + value if relative else value
+        outside = (updated < low) | (updated > high)
+        if outside.any():
+            r, v = np.argwhere(outside)[0]
+            raise ValueError(f"Value {updated[r, v]} of {variables[v].name} out of its range "
+                             f"[{low[v]}..{high[v]}] after {command.action}")
+        rows.append(updated)
+        sources.append(frontier_ids[enabled])
+        command_ids.append(np.full(len(enabled), c, dtype=np.int32))
+    if not rows:
+        return frontier[:0], frontier_ids[:0], np.zeros(0, dtype=np.int32)
+    return np.concatenate(rows), np.concatenate(sources), np.concatenate(command_ids)
+
+
+def explore(tree, timed=False, max_states=None):
+    """
+    Enumerates the reachable states of the model of a tree, breadth-first: the guards of
+    all the commands are evaluated on a chunk of the frontier at a time (at most CHUNK
+    states), the successors are deduplicated by their packed keys against the sorted
+    keys of the known states.
+
+    Args:
+        tree (Tree): The tree.
+        timed (bool): Whether to explore the time-based model.
+        max_states (int): The maximum number of states, or None.
+
+    Returns:
+        ExplicitModel: The state space.
+
+    Raises:
+        ValueError: If the model is invalid, as PRISM would report it.
+        StateSpaceError: If the model has more than max_states states.
+    """
+    info = get_info(tree)
+    builder = (build_commands_time if timed else build_commands)(info, info_values(info))
+    variables, commands = builder.variables, builder.commands
+    low = np.array([v.low for v in variables])
+    high = np.array([v.high for v in variables])
+    dtype = np.result_type(np.min_scalar_type(int(low.min())), np.min_scalar_type(int(high.max())))
+    state_keys = StateKeys(variables)
+
+    frontier = low[np.newaxis].astype(dtype)
+    frontier_ids = np.zeros(1, dtype=np.int64)
+    known_keys = state_keys(frontier)
+    known_ids = frontier_ids.copy()
+    levels = [frontier]
+    count = 1
+    sources, command_ids, targets = [], [], []
+
+    while len(frontier):
+        next_frontier, next_ids = [], []
+        for start in range(0, len(frontier), CHUNK):
+            rows, row_sources, row_commands = successors(commands, frontier[start:start + CHUNK],
+                                                         frontier_ids[start:start + CHUNK], low, high, variables)
+            if not len(rows):
+                continue
+            keys = state_keys(rows)
+            positions = np.minimum(np.searchsorted(known_keys, keys), len(known_keys) - 1)
+            found = known_keys[positions] == keys
+            row_targets = np.empty(len(rows), dtype=np.int64)
+            row_targets[found] = known_ids[positions[found]]
+            new_keys, first, inverse = np.unique(keys[~found], return_index=True, return_inverse=True)
+            new_ids = np.arange(count, count + len(new_keys))
+            count += len(new_keys)
+            if max_states is not None and count > max_states:
+                raise StateSpaceError(f"The model has more than {max_states} states")
+            row_targets[~found] = new_ids[inverse]
+
+            sources.append(row_sources)
+            command_ids.append(row_commands)
+            targets.append(row_targets)
+            next_frontier.append(rows[~found][first])
+            next_ids.append(new_ids)
+            # both are sorted: the merged keys stay sorted
+            insert = np.searchsorted(known_keys, new_keys)
+            known_keys = np.insert(known_keys, insert, new_keys)
+            known_ids = np.insert(known_ids, insert, new_ids)
+        if not next_frontier:
+            break
+        frontier = np.concatenate(next_frontier)
+        frontier_ids = np.concatenate(next_ids)
+        levels.append(frontier)
+
+    states = np.concatenate(levels)
+    sources = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    command_ids = np.concatenate(command_ids) if command_ids else np.zeros(0, dtype=np.int32)
+    targets = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+    order = np.lexsort((command_ids, sources))
+    sources, command_ids, targets = sources[order], command_ids[order], targets[order]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=count))])
+
+    actions = [command.action for command in commands]
+    rewards = {name: np.array([items.get(a, 0) for a in actions])[command_ids] for name, items in builder.rewards.items()}
+    players = np.where(states[:, builder.variable("sched")] == 1, 0, 1)
+    return ExplicitModel(variables, states, actions, players, offsets, targets, command_ids, rewards)
@@ -0,0 +1,256 @@
+# Tree layouts in O(n), without recursion: the trees of large systems are too deep
+# for Python's recursion limit and too wide for a layout in the browser.
+
+import numpy as np
+
+MODES = ("tidy", "hierarchy")
+
+
+def forest(children, roots):
+    """
+    Joins the trees of a forest below a virtual root, the last node.
+
+    Returns:
+        tuple: The children lists with the virtual root and its index.
+    """
+    virtual = len(children)
+    return list(children) + [list(roots)], virtual
+
+
+def preorder(children, root):
+    """
+    Returns:
+        list: The nodes reachable from the root, parents before children, siblings in order.
+    """
+    order = []
+    stack = [root]
+    while stack:
+        v = stack.pop()
+        order.append(v)
+        stack.extend(reversed(children[v]))
+    return order
+
+
+def postorder(children, root):
+    """
+    Returns:
+        list: The nodes reachable from the root, children before parents, siblings in order.
+    """
+    order = []
+    stack = [root]
+    while stack:
+        v = stack.pop()
+        order.append(v)
+        stack.extend(children[v])
+    order.reverse()
+    return order
+
+
+def depths(children, order):
+    depth = [0] * len(children)
+    for v in order:
+        for w in children[v]:
+            depth[w] = depth[v] + 1
+    return depth
+
+
+def hierarchy_layout(children, roots, width=1., vert_gap=0.2, vert_loc=0, xcenter=0.5):
+    """
+    Lays out a forest as Tree.hierarchy_pos does: every node splits its width equally
+    among its children, whatever the size of their subtrees.
+
+    Args:
+        children (list): The children of every node, as lists of node indices.
+        roots (list): The roots, laid out side by side as children of a virtual root.
+        width (float): The width of the layout.
+        vert_gap (float): The gap between the levels.
+        vert_loc (float): The vertical position of the roots.
+        xcenter (float): The horizontal center of the layout.
+
+    Returns:
+        tuple: The x and y coordinates of the nodes, as NumPy arrays (NaN for the nodes
+            that no root reaches).
+    """
+    n = len(children)
+    x = np.full(n, np.nan)
+    y = np.full(n, np.nan)
+    if len(roots) == 1:
+        stack = [(roots[0], width, xcenter, vert_loc)]
+    else:
+        dx = width / max(len(roots), 1)
+        stack = [(r, dx, xcenter - width / 2 + dx * (i + 0.5), vert_loc) for i, r in enumerate(roots)]
+    while stack:
+        v, w, cx, cy = stack.pop()
+        x[v] = cx
+        y[v] = cy
+        if children[v]:
+            dx = w / len(children[v])
+            left = cx - w / 2 - dx / 2
+            for i, c in enumerate(children[v], 1):
+                stack.append((c, dx, left + i * dx, cy - vert_gap))
+    return x, y
+
+
+def tidy_layout(children, roots, distance=1.):
+    """
+    Lays out a forest as a tidy tree (Reingold-Tilford): the levels are horizontal, a
+    parent is centered above its children, the subtrees are as close as the contours
+    allow and isomorphic subtrees are drawn identically. This is the linear-time
+    algorithm of Buchheim, Jünger and Leipert (Walker's algorithm with threads), with
+    explicit stacks instead of recursion.
+
+    Args:
+        children (list): The children of every node, as lists of node indices.
+        roots (list): The roots, laid out side by side.
+        distance (float): The minimum horizontal distance between two nodes of a level.
+
+    Returns:
+        tuple: The x coordinates (the leftmost node at 0) and the depths of the nodes,
+            as NumPy arrays (NaN for the nodes that no root reaches).
+    """
+    n = len(children)
+    children, root = forest(children, roots)
+    size = n + 1
+    parent = [-1] * size
+    number = [0] * size  # position among the siblings, from 1
+    for v in range(size):
+        for i, w in enumerate(children[v], 1):
+            parent[w] = v
+            number[w] = i
+    prelim = [0.] * size
+    mod = [0.] * size
+    shift = [0.] * size
+    change = [0.] * size
+    thread = [-1] * size
+    ancestor = list(range(size))
+    default_ancestor = [-1] * size
+
+    def left_sibling(v):
+        return children[parent[v]][number[v] - 2] if parent[v] >= 0 and number[v] > 1 else -1
+
+    def next_left(v):
+        return children[v][0] if children[v] else thread[v]
+
+    def next_right(v):
+        return children[v][-1] if children[v] else thread[v]
+
+    def move_subtree(wm, wp, amount):
+        subtrees = number[wp] - number[wm]
+        change[wp] -= amount / subtrees
+        shift[wp] += amount
+        change[wm] += amount / subtrees
+        prelim[wp] += amount
+        mod[wp] += amount
+
+    def apportion(v, default):
+        w = left_sibling(v)
+        if w < 0:
+            return default
+        vip = vop = v
+        vim = w
+        vom = children[parent[v]][0]
+        sip, sop, sim, som = mod[vip], mod[vop], mod[vim], mod[vom]
+        while next_right(vim) >= 0 and next_left(vip) >= 0:
+            vim = next_right(vim)
+            vip = next_left(vip)
+            vom = next_left(vom)
+            vop = next_right(vop)
+            ancestor[vop] = v
+            amount = (prelim[vim] + sim) - (prelim[vip] + sip) + distance
+            if amount > 0:
+                a = ancestor[vim] if parent[ancestor[vim]] == parent[v] else default
+                move_subtree(a, v, amount)
+                sip += amount
+                sop += amount
+            sim += mod[vim]
+            sip += mod[vip]
+            som += mod[vom]
+            sop += mod[vop]
+        if next_right(vim) >= 0 and next_right(vop) < 0:
+            thread[vop] = next_right(vim)
+            mod[vop] += sim - sop
+        if next_left(vip) >= 0 and next_left(vom) < 0:
+            thread[vom] = next_left(vip)
+            mod[vom] += sip - som
+            default = v
+        return default
+
+    def execute_shifts(v):
+        amount = 0.
+        total = 0.
+        for w in reversed(children[v]):
+            prelim[w] += amount
+            mod[w] += amount
+            total += change[w]
+            amount += shift[w] + total
+
+    # first walk, in postorder: every node is placed as soon as its children are, then
+    # moved next to its left siblings, in the order of the recursive version
+    for v in postorder(children, root):
+        w = left_sibling(v)
+        if children[v]:
+            execute_shifts(v)
+            midpoint = (prelim[children[v][0]] + prelim[children[v][-1]]) / 2
+            if w >= 0:
+                prelim[v] = prelim[w] + distance
+                mod[v] = prelim[v] - midpoint
+            else:
+                prelim[v] = midpoint
+        elif w >= 0:
+            prelim[v] = prelim[w] + distance
+        p = parent[v]
+        if p >= 0:
+            if default_ancestor[p] < 0:
+                default_ancestor[p] = children[p][0]
+            default_ancestor[p] = apportion(v, default_ancestor[p])
+
+    # second walk, in preorder: the coordinates add the mods of the ancestors
+    x = np.full(n, np.nan)
+    y = np.full(n, np.nan)
+    offset = [0.] * size
+    order = preorder(children, root)
+    depth = depths(children, order)
+    for v in order:
+        for w in children[v]:
+            offset[w] = offset[v] + mod[v]
+        if v != root:
+            x[v] = prelim[v] + offset[v]
+            y[v] = depth[v] - 1
+    if n and not np.all(np.isnan(x)):
+        x -= np.nanmin(x)
+    return x, y
+
+
+def layout(children, roots, mode="tidy"):
+    """
+    Lays out a forest, see tidy_layout and hierarchy_layout.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode == "tidy":
+        return tidy_layout(children, roots)
+    if mode == "hierarchy":
+        return hierarchy_layout(children, roots)
+    raise ValueError(f"Unknown layout mode: {mode} (expected one of {', '.join(MODES)})")
+
+
+def edge_layout(count, edges, mode="tidy"):
+    """
+    Lays out a forest given as edges between node indices (e.g. the JSON tree of the
+    server, with the ids of its nodes).
+
+    Args:
+        count (int): The number of nodes.
+        edges (list): The (parent, child) pairs, children in order.
+        mode (str): "tidy" or "hierarchy".
+
+    Returns:
+        tuple: The x and y coordinates of the nodes, as NumPy arrays.
+    """
+    children = [[] for _ in range(count)]
+    has_parent = [False] * count
+    for p, c in edges:
+        children[p].append(c)
+        has_parent[c] = True
+    return layout(children, [v for v in range(count) if not has_parent[v]], mode)
@@ -1,31 +1,70 @@
 import argparse
 import os
+import sys
 
 import tree_to_prism as tp
+import validator
 
 
 def main():
     parser = argparse.ArgumentParser(description='Process XML file from ADTool and generate PRISM model')
     parser.add_argument('--input', '-i', type=str, help='Path to the XML file from ADTool')
-    parser.add_argument('--output', '-o', type=str, help='Path to the output file for the PRISM model')
+    parser.add_argument('--output', '-o', type=str, help='Path to the output file for the PRISM model (output directory in batch mode)')
     parser.add_argument('--props', action='store_true', help='Generate the properties file')
-    parser.add_argument('--prune', '-p', type=str, help='Name of the subtree root to keep')
+    parser.add_argument('--queries', '-q', type=str, nargs='+', help='Queries of the properties file, as NAME or NAME:BOUND (implies --props)')
+    parser.add_argument('--prune', '-p', type=str, nargs='+', help='Names of the subtree roots to keep')
     parser.add_argument('--time', '-t', action='store_true', help='Generate a time-based PRISM model')
+    parser.add_argument('--constants', '-c', action='store_true', help='Emit costs and times as PRISM constants')
+    parser.add_argument('--batch', '-b', type=str, help='Directory or glob of XML files to convert in batch mode')
+    parser.add_argument('--prune-lists', type=str, help='JSON file mapping input files to lists of subtree roots (or lists of roots) to keep (batch mode)')
+    parser.add_argument('--workers', type=int, help='Number of conversion processes (batch mode)')
+    parser.add_argument('--prism', type=str, help='Path to the PRISM executable, to check the generated models (batch mode)')
+    parser.add_argument('--prism-jobs', type=int, default=1, help='Maximum number of concurrent PRISM processes (batch mode)')
+    parser.add_argument('--force', action='store_true', help='Convert the inputs even if they are unchanged (batch mode)')
+    parser.add_argument('--no-snapshots', action='store_true', help='Do not read or write the binary snapshots of the parsed trees next to the inputs')
     args = parser.parse_args()
 
-    tree = tp.parse_file(args.input)
+    if args.batch:
+        import batch
+        manifest = batch.run_batch(args.batch, args.output or ".", batch.load_prune_lists(args.prune_lists),
+                                   time_model=args.time, workers=args.workers, prism=args.prism,
+                                   prism_jobs=args.prism_jobs, force=args.force, snapshots=not args.no_snapshots)
+        summary = manifest["summary"]
+        print(f"{summary['converted']} converted, {summary['skipped']} skipped, {summary['failed']} failed")
+        sys.exit(1 if summary["failed"] else 0)
+
+    # report every problem of the tree before converting it
+    issues = validator.validate_file(args.input, timed=args.time)
+    for issue in issues:
+        print(f"{issue.severity}: {issue.message}", file=sys.stderr)
+    if any(issue.severity == "error" for issue in issues):
+        sys.exit(1)
+
+    tree = tp.load_file(args.input, snapshots=not args.no_snapshots)
     if args.prune:
-        tree = tree.prune(args.prune)
+        try:
+            tree = tree.prune(*args.prune)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            sys.exit(1)
     if args.time:
-        prism_model = tp.get_prism_model_time(tree)
+        prism_model = tp.get_prism_model_time(tree, constants=args.constants)
     else:
-        prism_model = tp.get_prism_model(tree)
+        prism_model = tp.get_prism_model(tree, constants=args.constants)
     file = args.output
     tp.save_prism_model(prism_model, file)
-    if args.props:
+    if args.props or args.queries:
         # save the properties file in the same directory as the output file
         path_output = "/".join(file.split("/")[:-1])
-        tp.save_prism_properties(os.path.join(path_output, "properties.props"))
+        try:
+            queries = []
+            for query in args.queries or []:
+                name, _, bound = query.partition(":")
+                queries.append({"query": name, "bound": int(bound)} if bound else name)
+            tp.save_prism_properties(os.path.join(path_output, "properties.props"), queries)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            sys.exit(1)
 
 
 if __name__ == '__main__':
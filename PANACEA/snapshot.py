@@ -0,0 +1,249 @@
+# Binary snapshots of parsed trees: loading one is a few array copies and one loop
+# over the nodes, instead of the XML parse and the comment parsing of every node.
+#
+# Layout (little-endian, every section aligned to 8 bytes):
+#   header     magic, format version, CRC-32 of the sections, SHA-256 of the source XML
+#              and the table sizes
+#   strings    the string table, NUL-separated UTF-8: the tree symbols first, then the
+#              other strings of the nodes (XML cannot contain NUL)
+#   nodes      int32 string ids of label, refinement, type, action and role, a column each
+#   numbers    float64 cost and time columns, and uint8 kinds (0 None, 1 int, 2 float)
+#   edges      int64 parent, child and action symbol id columns
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+
+from tree import Node, Tree
+
+MAGIC = b"PNCT"
+# bump when the layout or the parsing of the trees changes: older snapshots are then outdated
+VERSION = 1
+SUFFIX = ".snapshot"
+
+HEADER = struct.Struct("<4sHHI32sQQQQ4x")
+NODE_FIELDS = ("label", "refinement", "type", "action", "role")
+KINDS = {type(None): 0, int: 1, float: 2}
+# integers above 2**53 are not exact as float64
+MAX_EXACT = 2 ** 53
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is invalid, of another format version or outdated."""
+
+
+def digest(source):
+    """
+    Returns:
+        bytes: The SHA-256 of the source XML (str or bytes), stored in its snapshot.
+    """
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    return hashlib.sha256(source).digest()
+
+
+def snapshot_path(file):
+    """Returns the path of the snapshot stored next to an XML file."""
+    return file + SUFFIX
+
+
+def _pad(size):
+    return -size % 8
+
+
+def _column(typecode, values):
+    column = array(typecode, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def dumps(tree, source_digest=b""):
+    """
+    Serialises a tree.
+
+    Args:
+        tree (Tree): The tree.
+        source_digest (bytes): The digest of the XML the tree was parsed from.
+
+    Returns:
+        bytes: The snapshot.
+
+    Raises:
+        SnapshotError: If a cost or time cannot be stored exactly.
+    """
+    nodes, symbols, parents, children, actions = tree.tables()
+    strings = list(symbols)
+    ids = {string: id for id, string in enumerate(strings)}
+    columns = {field: [] for field in NODE_FIELDS}
+    numbers = []
+    kinds = []
+    for node in nodes:
+        for field in NODE_FIELDS:
+            value = getattr(node, field)
+            id = ids.get(value)
+            if id is None:
+                id = ids[value] = len(strings)
+                strings.append(value)
+            columns[field].append(id)
+    for field in ("cost", "time"):
+        for node in nodes:
+            value = getattr(node, field)
+            if isinstance(value, int) and abs(value) >= MAX_EXACT:
+                raise SnapshotError(f"Node {node.label}: {field} {value} cannot be stored exactly")
+            numbers.append(0. if value is None else float(value))
+            kinds.append(KINDS[type(value)])
+
+    blob = "\0".join(strings).encode("utf-8")
+    sections = [
+        blob,
+        b"".join(_column("i", columns[field]) for field in NODE_FIELDS),
+        _column("d", numbers),
+        bytes(kinds),
+        b"".join(_column("q", column) for column in (parents, children, actions)),
+    ]
+    parts = []
+    for section in sections:
+        parts.append(struct.pack("<Q", len(section)))
+        parts.append(section)
+        parts.append(b"\0" * _pad(len(section)))
+    body = b"".join(parts)
+    header = HEADER.pack(MAGIC, VERSION, 0, zlib.crc32(body), source_digest.ljust(32, b"\0"),
+                         len(strings), len(symbols), len(nodes), len(parents))
+    return header + body
+
+
+def loads(buffer, source_digest=None):
+    """
+    Deserialises a tree. The numeric columns are read in place from the buffer (e.g. a
+    memory-mapped file or a bytea value).
+
+    Args:
+        buffer (bytes-like): The snapshot.
+        source_digest (bytes): The digest of the current XML, to reject an outdated
+            snapshot; not checked if None.
+
+    Returns:
+        Tree: The tree.
+
+    Raises:
+        SnapshotError: If the snapshot is invalid, of another version or outdated.
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        raise SnapshotError("Truncated snapshot")
+    magic, version, _, crc, stored_digest, n_strings, n_symbols, n_nodes, n_edges = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError("Not a tree snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"Snapshot version {version}, expected {VERSION}")
+    if source_digest is not None and stored_digest != source_digest.ljust(32, b"\0"):
+        raise SnapshotError("Outdated snapshot")
+    if sys.byteorder != "little":
+        raise SnapshotError("Snapshots are read on little-endian machines only")
+    if zlib.crc32(view[HEADER.size:]) != crc:
+        raise SnapshotError("Corrupted snapshot")
+
+    sections = []
+    offset = HEADER.size
+    try:
+        for _ in range(5):
+            (size,) = struct.unpack_from("<Q", view, offset)
+            offset += 8
+            if offset + size > len(view):
+                raise SnapshotError("Truncated snapshot")
+            sections.append(view[offset:offset + size])
+            offset += size + _pad(size)
+    except struct.error:
+        raise SnapshotError("Truncated snapshot") from None
+    blob, node_ids, numbers, kinds, edges = sections
+    try:
+        return _load(blob, node_ids, numbers, kinds, edges, n_strings, n_symbols, n_nodes, n_edges)
+    except (IndexError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Corrupted snapshot: {e}") from None
+
+
+def _load(blob, node_ids, numbers, kinds, edges, n_strings, n_symbols, n_nodes, n_edges):
+    strings = list(map(sys.intern, str(blob, "utf-8").split("\0"))) if n_strings else []
+    if (len(strings) != n_strings or n_symbols > n_strings or len(node_ids) != 20 * n_nodes
+            or len(numbers) != 16 * n_nodes or len(kinds) != 2 * n_nodes or len(edges) != 24 * n_edges):
+        raise SnapshotError("Inconsistent snapshot")
+
+    node_ids = node_ids.cast("i")
+    numbers = numbers.cast("d")
+    columns = [[strings[id] for id in node_ids[k * n_nodes:(k + 1) * n_nodes]] for k in range(5)]
+    values = [
+        [None if kind == 0 else int(number) if kind == 1 else number
+         for number, kind in zip(numbers[k * n_nodes:(k + 1) * n_nodes], kinds[k * n_nodes:(k + 1) * n_nodes])]
+        for k in range(2)
+    ]
+    labels, refinements, types, actions, roles = columns
+    costs, times = values
+    from_fields = Node.from_fields
+    nodes = [
+        from_fields(label, refinement, type, action, cost, time, role)
+        for label, refinement, type, action, cost, time, role
+        in zip(labels, refinements, types, actions, costs, times, roles)
+    ]
+
+    edge_columns = []
+    for k in range(3):
+        column = array("l")
+        part = edges[8 * k * n_edges:8 * (k + 1) * n_edges]
+        if column.itemsize == 8:
+            column.frombytes(part)
+        else:
+            column.extend(part.cast("q"))
+        edge_columns.append(column)
+    return Tree.from_tables(nodes, strings[:n_symbols], *edge_columns)
+
+
+def read(path, source_digest=None):
+    """
+    Loads the snapshot in a file, memory-mapped.
+
+    Returns:
+        Tree: The tree.
+
+    Raises:
+        OSError: If the file cannot be read.
+        SnapshotError: If the snapshot is invalid, of another version or outdated.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise SnapshotError("Empty snapshot")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            try:
+                return loads(mapped, source_digest)
+            except SnapshotError as e:
+                # the frames of the tracebacks hold views of the mapping, which cannot
+                # be closed while they exist
+                error = e.with_traceback(None)
+                error.__context__ = None
+    raise error
+
+
+def write(tree, path, source_digest=b""):
+    """
+    Writes the snapshot of a tree to a file atomically, so that concurrent readers
+    see the old snapshot or the new one.
+
+    Raises:
+        OSError: If the file cannot be written.
+        SnapshotError: If the tree cannot be stored exactly.
+    """
+    data = dumps(tree, source_digest)
+    temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.unlink(temp)
+        raise
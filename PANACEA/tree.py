@@ -1,39 +1,76 @@
-import networkx as nx
-import pandas as pd
+# networkx and pandas are optional extras: they are only imported by the
+# visualisation and DataFrame export methods, so that the conversion path
+# does not pay their import cost.
+
+import heapq
+import sys
+from array import array
+from bisect import bisect_right
+
+from comment_metadata import parse_comment
 
 # define the structure of a node of the tree
 class Node:
+    # nodes of large trees are many small objects: slots drop the per-instance
+    # __dict__, strings are interned and numbers are parsed once at load
+    __slots__ = ("label", "refinement", "type", "action", "cost", "time", "role")
+
     def __init__(self, label, refinement="disjunctive", comment=""):
-        self.label = label
-        self.refinement = refinement
-        self.type, self.action, self.cost, self.time, self.role = self.comment_to_data(comment)
+        self.label = sys.intern(label)
+        self.refinement = sys.intern(refinement)
+        metadata = parse_comment(comment)
+        if metadata.errors:
+            raise ValueError(f"Node {label}: {'; '.join(metadata.errors)}")
+        self.type = sys.intern(metadata.type)
+        self.action = sys.intern(metadata.action)
+        self.cost = metadata.cost
+        self.time = metadata.time
+        self.role = sys.intern(metadata.role)
         
+    @classmethod
+    def from_fields(cls, label, refinement, type, action, cost, time, role):
+        """
+        Builds a node from its parsed fields (e.g. read from a snapshot), without
+        parsing a comment.
+
+        Returns:
+            Node: The node.
+        """
+        node = cls.__new__(cls)
+        node.label = label
+        node.refinement = refinement
+        node.type = type
+        node.action = action
+        node.cost = cost
+        node.time = time
+        node.role = role
+        return node
+
     def comment_to_data(self, comment):
-        type, action, cost, role, time = "", "", "", "", ""
-        
-        for line in comment.split('\n'):
-            if line.startswith('Type:'):
-                type = line.split(': ')[1]
-            elif line.startswith('Action:'):
-                action = line.split(': ')[1]
-            elif line.startswith('Cost:'):
-                cost = line.split(': ')[1]
-            elif line.startswith('Time:'):
-                time = line.split(': ')[1]
-            elif line.startswith('Role:'):
-                role = line.split(': ')[1]
-                
-        return type, action, cost, time, role
+        metadata = parse_comment(comment)
+        return metadata.type, metadata.action, metadata.cost, metadata.time, metadata.role
     
     def to_string(self):
-        return "Label: " + self.label + "\nRefinement: " + self.refinement + "\nType: " + self.type + "\nAction: " + self.action + "\nCost: " + self.cost + "\nRole: " + self.role
+        cost = "" if self.cost is None else str(self.cost)
+        return "Label: " + self.label + "\nRefinement: " + self.refinement + "\nType: " + self.type + "\nAction: " + self.action + "\nCost: " + cost + "\nRole: " + self.role
             
 # define the structure of the tree
 class Tree:
     def __init__(self):
         self.root = None
         self.nodes = []
-        self.edges = []
+        # interned string table: edges store the integer ids of labels and actions
+        self.symbols = []
+        self.symbol_ids = {}
+        self._edge_parents = array("l")
+        self._edge_children = array("l")
+        self._edge_actions = array("l")
+        self._index = None
+        self._index_size = None
+        self._ancestry = None
+        self._ancestry_size = None
+        self._layouts = {}
+        self._layouts_size = None
         
     def add_node(self, node):
         if self.nodes == []:
@@ -41,26 +78,113 @@ class Tree:
         self.nodes.append(node)
         
     def add_edge(self, parent, child):
-        self.edges.append(((parent.label, child.label), child.action))
+        self._edge_parents.append(self.symbol_id(parent.label))
+        self._edge_children.append(self.symbol_id(child.label))
+        self._edge_actions.append(self.symbol_id(child.action))
+
+    def extend(self, tree):
+        """
+        Appends the nodes and edges of another tree to this one.
+
+        Args:
+            tree (Tree): The tree to append.
+        """
+        for node in tree.nodes:
+            self.add_node(node)
+        for (parent, child), action in tree.edges:
+            self._edge_parents.append(self.symbol_id(parent))
+            self._edge_children.append(self.symbol_id(child))
+            self._edge_actions.append(self.symbol_id(action))
+
+    @classmethod
+    def from_tables(cls, nodes, symbols, edge_parents, edge_children, edge_actions):
+        """
+        Builds a tree from its tables (e.g. read from a snapshot), see tables.
+
+        Returns:
+            Tree: The tree.
+        """
+        tree = cls()
+        tree.nodes = nodes
+        tree.root = nodes[0] if nodes else None
+        tree.symbols = symbols
+        tree.symbol_ids = {string: id for id, string in enumerate(symbols)}
+        tree._edge_parents = edge_parents
+        tree._edge_children = edge_children
+        tree._edge_actions = edge_actions
+        return tree
+
+    def tables(self):
+        """
+        Returns:
+            tuple: The nodes, the string table and the parent, child and action string
+                ids of the edges, as arrays.
+        """
+        return self.nodes, self.symbols, self._edge_parents, self._edge_children, self._edge_actions
+
+    def symbol_id(self, string):
+        """
+        Returns the id of a label or action in the string table, adding it if needed.
+
+        Args:
+            string (str): The label or action.
+
+        Returns:
+            int: The id of the string.
+        """
+        id = self.symbol_ids.get(string)
+        if id is None:
+            id = len(self.symbols)
+            self.symbols.append(sys.intern(string))
+            self.symbol_ids[string] = id
+        return id
+
+    @property
+    def edges(self):
+        """The edges as a list of ((parent label, child label), child action) tuples."""
+        symbols = self.symbols
+        return [
+            ((symbols[p], symbols[c]), symbols[a])
+            for p, c, a in zip(self._edge_parents, self._edge_children, self._edge_actions)
+        ]
+
+    def index(self):
+        """
+        Returns the lookup tables of the tree, rebuilding them if nodes or edges were added.
+
+        Returns:
+            tuple: A tuple containing the following elements:
+                - first_node (dict): The first node of every label.
+                - parent_of (dict): The parent label id of every (label id, action id) pair.
+                - children_of (dict): The child labels of every label id, in edge order.
+        """
+        size = (len(self.nodes), len(self._edge_parents))
+        if self._index_size != size:
+            first_node = {}
+            for node in self.nodes:
+                first_node.setdefault(node.label, node)
+            parent_of = {}
+            children_of = {}
+            symbols = self.symbols
+            for p, c, a in zip(self._edge_parents, self._edge_children, self._edge_actions):
+                parent_of.setdefault((c, a), p)
+                children_of.setdefault(p, []).append(symbols[c])
+            self._index = first_node, parent_of, children_of
+            self._index_size = size
+        return self._index
         
     def get_node(self, label):
-        for node in self.nodes:
-            if node.label == label:
-                return node
-        return None
+        return self.index()[0].get(label)
     
     def get_parent(self, node):
-        for edge, action in self.edges:
-            if edge[1] == node.label and action == node.action:
-                return edge[0]
-        return None
+        _, parent_of, _ = self.index()
+        key = (self.symbol_ids.get(node.label), self.symbol_ids.get(node.action))
+        parent = parent_of.get(key)
+        return None if parent is None else self.symbols[parent]
     
     def get_children(self, node):
-        children = set()
-        for edge, _ in self.edges:
-            if edge[0] == node.label:
-                children.add(edge[1])
-        return children
+        _, _, children_of = self.index()
+        return set(children_of.get(self.symbol_ids.get(node.label), ()))
     
     def to_string(self):
         string = ""
@@ -69,6 +193,8 @@ class Tree:
         return string
     
     def to_graph(self):
+        import networkx as nx
+
         G = nx.DiGraph()
         for node in self.nodes:
             G.add_node(node.label, color="Red" if node.role == "Attacker" else "Green")
@@ -77,6 +203,8 @@ class Tree:
         return G
     
     def to_dataframe(self):
+        import pandas as pd
+
         data = []
         for node in self.nodes:
             children = self.get_children(node)
@@ -85,53 +213,201 @@ class Tree:
         return pd.DataFrame(data, columns=["Label", "Refinement", "Type", "Action", "Cost", "Role", "Time", "Parent", "Children"])
     
     def hierarchy_pos(self, G, root, width=1., vert_gap = 0.2, vert_loc = 0, xcenter = 0.5, pos = None, parent = None):    
+        import networkx as nx
+
+        # iterative: deep trees exceed the recursion limit
         if pos is None:
-            pos = {root:(xcenter,vert_loc)}
-        else:
-            pos[root] = (xcenter, vert_loc)
-        children = list(G.neighbors(root))
-        if not isinstance(G, nx.DiGraph) and parent is not None:
-            children.remove(parent)  
-        if len(children)!=0:
-            dx = width/len(children) 
-            nextx = xcenter - width/2 - dx/2
-            for child in children:
-                nextx += dx
-                pos = self.hierarchy_pos(G, child, width = dx, vert_gap = vert_gap, 
-                                    vert_loc = vert_loc-vert_gap, xcenter=nextx,
-                                    pos=pos, parent = root)
+            pos = {}
+        stack = [(root, parent, width, xcenter, vert_loc)]
+        while stack:
+            node, node_parent, node_width, x, y = stack.pop()
+            pos[node] = (x, y)
+            children = list(G.neighbors(node))
+            if not isinstance(G, nx.DiGraph) and node_parent is not None:
+                children.remove(node_parent)
+            if len(children) != 0:
+                dx = node_width / len(children)
+                nextx = x - node_width / 2 - dx / 2
+                for child in children:
+                    nextx += dx
+                    stack.append((child, node, dx, nextx, y - vert_gap))
         return pos
+
+    def layout(self, mode="tidy"):
+        """
+        Computes the positions of the nodes in O(n) from the index of the tree, see
+        layout.tidy_layout and layout.hierarchy_layout. The positions are cached until
+        nodes or edges are added.
+
+        Args:
+            mode (str): "tidy" (Reingold-Tilford) or "hierarchy" (as hierarchy_pos).
+
+        Returns:
+            tuple: The labels of the nodes, and their x and y coordinates as NumPy arrays.
+        """
+        import layout
+
+        size = (len(self.nodes), len(self._edge_parents))
+        if self._layouts_size != size:
+            self._layouts = {}
+            self._layouts_size = size
+        if mode not in self._layouts:
+            first_node, _, children_of = self.index()
+            labels = list(first_node)
+            position = {label: i for i, label in enumerate(labels)}
+            children = [[position[c] for c in children_of.get(self.symbol_ids.get(label), ()) if c in position]
+                        for label in labels]
+            roots = [position[self.root.label]] if self.root is not None else []
+            x, y = layout.layout(children, roots, mode)
+            self._layouts[mode] = (labels, x, y)
+        return self._layouts[mode]
     
-    def prune(self, label):
+    def ancestry(self):
         """
-        Prunes the tree but keeps the path to the root.
-        If the parents has the refinement "conjunctive" then it keeps the subtree.
+        Returns the Euler-tour index of the tree, rebuilding it if nodes or edges were added:
+        the nodes in preorder from the root, so that the subtree of the node at position i
+        is the slice nodes[i:end[i]] and u is an ancestor of v if and only if
+        u <= v < end[u].
+
+        Returns:
+            tuple: A tuple containing the following elements:
+                - nodes (list): The nodes reachable from the root, in preorder.
+                - position (dict): The position of every label in the preorder.
+                - parent (list): The position of the parent of every node (-1 for the root).
+                - end (list): The position after the last descendant of every node.
+        """
+        size = (len(self.nodes), len(self._edge_parents))
+        if self._ancestry_size != size:
+            first_node, _, children_of = self.index()
+            symbol_ids = self.symbol_ids
+            nodes = []
+            position = {}
+            parent = []
+            stack = [(self.root.label, -1)] if self.root is not None else []
+            while stack:
+                label, p = stack.pop()
+                # a label is indexed once, under its first parent
+                if label in position:
+                    continue
+                i = len(nodes)
+                position[label] = i
+                nodes.append(first_node[label])
+                parent.append(p)
+                stack.extend((c, i) for c in reversed(children_of.get(symbol_ids[label], ())) if c in first_node)
+            end = list(range(1, len(nodes) + 1))
+            for i in range(len(nodes) - 1, 0, -1):
+                if end[i] > end[parent[i]]:
+                    end[parent[i]] = end[i]
+            self._ancestry = nodes, position, parent, end
+            self._ancestry_size = size
+        return self._ancestry
+
+    def prune(self, *labels):
+        """
+        Prunes the tree but keeps the paths to the root of the given nodes, with the
+        Defender children of the nodes on the paths, and the subtrees of the given nodes.
+        If a node on a path has the refinement "conjunctive", then its whole subtree is
+        kept instead. The result is the union of the prunes of every label, built from
+        the Euler-tour index in time linear in the paths and the kept nodes.
 
         Args:
-            label (str): The label of the subtree to keep.
-            
+            *labels (str): The labels of the subtrees to keep.
+
         Returns:
             Tree: a new pruned tree object.
-        """    
-        path = self.get_path_to_node(label)
+
+        Raises:
+            ValueError: If no label is given or a label is not in the tree.
+        """
+        if not labels:
+            raise ValueError("No node to keep")
+        nodes, position, parent, end = self.ancestry()
+        unknown = [label for label in labels if label not in position]
+        if unknown:
+            raise ValueError(f"Unknown nodes: {', '.join(unknown)}")
+
+        # the kept subtrees: every label keeps the subtree of the topmost conjunctive
+        # node on its path, or its own
+        roots = set()
+        on_path = set()
+        for label in labels:
+            root = p = position[label]
+            while p >= 0:
+                if nodes[p].refinement == "conjunctive":
+                    root = p
+                p = parent[p]
+            roots.add(root)
+            p = parent[root]
+            while p >= 0 and p not in on_path:
+                on_path.add(p)
+                p = parent[p]
+
+        # the subtrees are disjoint or nested slices of the preorder
+        spans = []
+        for root in sorted(roots):
+            if not spans or root >= spans[-1][1]:
+                spans.append((root, end[root]))
+        starts = [start for start, _ in spans]
+
+        def outside(i):
+            k = bisect_right(starts, i) - 1
+            return k < 0 or i >= spans[k][1]
+
+        singles = set()
+        for p in on_path:
+            singles.add(p)
+            c = p + 1
+            while c < end[p]:
+                if nodes[c].role == "Defender":
+                    singles.add(c)
+                c = end[c]
+        kept = heapq.merge(sorted(i for i in singles if outside(i)),
+                           (i for start, stop in spans for i in range(start, stop)))
+
         tree = Tree()
-        for parent in path:
-            parent_node = self.get_node(parent)
-            if parent_node.refinement == "conjunctive" or parent == label:
-                subtree = self.get_subtree(parent)
-                tree.nodes += subtree.nodes
-                tree.edges += subtree.edges
-                break
-            else:
-                tree.add_node(parent_node)
-                children = [c for c in self.get_children(parent_node) if c in path or self.get_node(c).role == "Defender"]
-                for child in children:
-                    tree.add_node(self.get_node(child))
-                    tree.add_edge(parent_node, self.get_node(child))
+        for i in kept:
+            node = nodes[i]
+            tree.add_node(node)
+            if parent[i] >= 0:
+                tree.add_edge(nodes[parent[i]], node)
         return tree
-                
-            
-            
+
+    def hide(self, *labels):
+        """
+        Removes the subtrees of the nodes with the given labels, as the server does for
+        the nodes hidden in a JSON tree. Unknown labels are ignored and the remaining
+        nodes and edges keep their order, so the result equals the parse of the XML
+        without those subtrees.
+
+        Args:
+            *labels (str): The labels of the subtrees to remove.
+
+        Returns:
+            Tree: a new tree object.
+        """
+        _, position, _, end = self.ancestry()
+        hidden = bytearray(len(end))
+        for label in labels:
+            i = position.get(label)
+            if i is not None and not hidden[i]:
+                hidden[i:end[i]] = b"\x01" * (end[i] - i)
+
+        def visible(label):
+            i = position.get(label)
+            return i is None or not hidden[i]
+
+        tree = Tree()
+        for node in self.nodes:
+            if visible(node.label):
+                tree.add_node(node)
+        symbols = self.symbols
+        for p, c, a in zip(self._edge_parents, self._edge_children, self._edge_actions):
+            if visible(symbols[c]):
+                tree._edge_parents.append(tree.symbol_id(symbols[p]))
+                tree._edge_children.append(tree.symbol_id(symbols[c]))
+                tree._edge_actions.append(tree.symbol_id(symbols[a]))
+        return tree
+
     def get_path_to_node(self, label):
         """
         Returns the path to the root of the node with the given label.
@@ -142,11 +418,12 @@ class Tree:
         Returns:
             list: The path to the root.
         """
+        nodes, position, parent, _ = self.ancestry()
         path = []
-        node = self.get_node(label)
-        while node is not None:
-            path.append(node.label)
-            node = self.get_node(self.get_parent(node))
+        i = position.get(label, -1)
+        while i >= 0:
+            path.append(nodes[i].label)
+            i = parent[i]
         return path[::-1]
     
     def get_subtree(self, label):
@@ -159,17 +436,11 @@ class Tree:
         Returns:
             Tree: The subtree.
         """
+        nodes, position, parent, end = self.ancestry()
         tree = Tree()
-        queue = [label]
-        while queue:
-            parent = queue.pop(0)
-            parent_node = self.get_node(parent)
-            tree.add_node(parent_node)
-            children = self.get_children(parent_node)
-            for child in children:
-                child_node = self.get_node(child)
-                tree.add_edge(parent_node, child_node)
-                queue.append(child)
-                
+        start = position[label]
+        for i in range(start, end[start]):
+            tree.add_node(nodes[i])
+            if i > start:
+                tree.add_edge(nodes[parent[i]], nodes[i])
         return tree
-        
\ No newline at end of file
@@ -1,4 +1,10 @@
+import hashlib
+import re
+import threading
 import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
+
+import snapshot
 from tree import Node, Tree
 
 def parse_children(node):
@@ -47,13 +53,66 @@ def parse_file(file):
     Returns:
         Tree: The constructed tree object.
     """
-    xml = ET.parse(file)
+    return parse_element(ET.parse(file).getroot())
+
+def load_file(file, snapshots=True):
+    """
+    Parses an XML file through its binary snapshot (see snapshot), stored next to it:
+    the snapshot is loaded if it is up to date, otherwise the XML is parsed and the
+    snapshot written, if the directory is writable.
+
+    Args:
+        file (str): The path to the XML file.
+        snapshots (bool): Whether to use the snapshot.
+
+    Returns:
+        Tree: The constructed tree object.
+    """
+    with open(file, "rb") as f:
+        content = f.read()
+    if not snapshots:
+        return parse_element(ET.fromstring(content))
+    source = snapshot.digest(content)
+    path = snapshot.snapshot_path(file)
+    try:
+        return snapshot.read(path, source)
+    except (OSError, snapshot.SnapshotError):
+        pass
+    tree = parse_element(ET.fromstring(content))
+    try:
+        snapshot.write(tree, path, source)
+    except (OSError, snapshot.SnapshotError):
+        pass
+    return tree
+
+def parse_string(xml_content):
+    """
+    Parses XML content and constructs a tree representation.
+
+    Args:
+        xml_content (str): The content of the XML file from ADTool.
+
+    Returns:
+        Tree: The constructed tree object.
+    """
+    return parse_element(ET.fromstring(xml_content))
+
+def parse_element(xml):
+    """
+    Constructs a tree representation from the root element of an ADTool file.
+
+    Args:
+        xml (Element): The <adtree> element.
+
+    Returns:
+        Tree: The constructed tree object.
+    """
     r = xml.find('node')
 
     root = parse_node(r)
     
     tree = Tree()
-    queue = [(root, r)]
+    queue = deque([(root, r)])
 
     while queue:
         parent_node, parent = queue.pop()
@@ -62,68 +121,72 @@ def parse_file(file):
         children = parse_children(parent)
         for child in children:
             child_node = parse_node(child)
-            queue = [(child_node, child)] + queue
+            queue.appendleft((child_node, child))
             tree.add_edge(parent_node, child_node)
             
     return tree
 
-def get_info(df):
+def get_info(tree):
     """
-    Extracts information from a DataFrame and returns relevant data.
+    Extracts information from a tree and returns relevant data.
 
     Args:
-        df (pandas.DataFrame): The input DataFrame containing the information.
+        tree (Tree): The input tree.
 
     Returns:
         tuple: A tuple containing the following elements:
-            - goal (str): The goal extracted from the DataFrame.
+            - goal (str): The goal extracted from the tree.
             - actions_to_goal (set): A set of actions leading to the goal.
             - initial_attributes (list): A list of initial attributes of the system.
             - attacker_actions (dict): A dictionary of attacker actions with their properties.
             - defender_actions (dict): A dictionary of defender actions with their properties.
-            - df_attacker (pandas.DataFrame): The filtered DataFrame for attacker actions.
-            - df_defender (pandas.DataFrame): The filtered DataFrame for defender actions.
+            - attacker_nodes (list): The attacker nodes, without the goal and the initial attributes.
+            - defender_nodes (list): The defender nodes.
     """
-    goal = df.loc[df["Type"] == "Goal"]["Label"].values[0]
-    actions_to_goal = set(df.loc[df["Parent"] == goal]["Action"].values)
+    nodes = tree.nodes
+    parents = [tree.get_parent(node) for node in nodes]
+
+    goals = [node.label for node in nodes if node.type == "Goal"]
+    if not goals:
+        raise ValueError("The tree has no node of type Goal")
+    goal = goals[0]
+    actions_to_goal = {node.action for node, parent in zip(nodes, parents) if parent == goal}
     actions_to_goal = {a for a in actions_to_goal if a != ""}
 
-    df_attacker = df.loc[df["Role"] == "Attacker"]
-    df_attacker = df_attacker.loc[df_attacker["Type"] != "Goal"]
+    attacker_nodes = [node for node in nodes if node.role == "Attacker" and node.type != "Goal"]
+    attacker_labels = {node.label for node in attacker_nodes}
 
-    df_defender = df.loc[df["Role"] == "Defender"]
+    defender_nodes = [node for node in nodes if node.role == "Defender"]
+    defender_labels = {node.label for node in defender_nodes}
 
-    # initial system attributes
-    initial_attributes = df_attacker.loc[df_attacker["Action"] == ""]["Label"].to_list()
-    for row in df_attacker.loc[df_attacker["Action"] == ""]["Label"].to_list():
-        children = df.loc[df["Label"] == row]["Children"].values
-        children = [c for sets in children for c in sets]
-        for child in children:
-            if child in df_attacker["Label"].values and row in initial_attributes:
-                initial_attributes.remove(row)
+    # initial system attributes: attacker attributes without attacker children
+    initial_attributes = [
+        node.label for node in attacker_nodes
+        if node.action == "" and not tree.get_children(node) & attacker_labels
+    ]
 
-    df_attacker = df_attacker.loc[~df_attacker["Label"].isin(initial_attributes)]
+    initial_labels = set(initial_attributes)
+    attacker_nodes = [node for node in attacker_nodes if node.label not in initial_labels]
 
-    # df actions with preconditions, effect and costs
+    # actions with preconditions, effect and costs
     attacker_actions = {}
     defender_actions = {}
     
-    for _, row in df.iterrows():
-        action = row["Action"]
+    for node, effect in zip(nodes, parents):
+        action = node.action
         
         if action == "":
             continue
         
-        effect = row["Parent"]
-        cost = row["Cost"]
-        refinement = df.loc[df['Label'] == effect]["Refinement"].values[0]
-        time = row["Time"]
-        preconditions = row["Children"]
+        cost = node.cost
+        refinement = tree.get_node(effect).refinement
+        time = node.time
+        preconditions = tree.get_children(node)
         
-        preconditions = [p for p in preconditions if row["Role"]==df.loc[df["Label"] == p]["Role"].values[0]]
+        preconditions = [p for p in preconditions if node.role == tree.get_node(p).role]
 
-        if row["Role"] == "Attacker" and action not in attacker_actions:
-            preconditions = [p for p in preconditions if p not in df_defender["Label"].values]
+        if node.role == "Attacker" and action not in attacker_actions:
+            preconditions = [p for p in preconditions if p not in defender_labels]
             attacker_actions[action] = {
                 "preconditions" : preconditions, 
                 "effect" : effect, 
@@ -132,7 +195,7 @@ def get_info(df):
                 "refinement" : refinement}
         elif action in attacker_actions.keys():
             attacker_actions[action]["preconditions"] += preconditions
-        elif row["Role"] == "Defender" and action not in defender_actions:
+        elif node.role == "Defender" and action not in defender_actions:
                 defender_actions[action] = {
                     "preconditions" : preconditions, 
                     "effect" : effect, 
@@ -140,20 +203,266 @@ def get_info(df):
                     "time" : time,
                     "refinement" : refinement}
                 
-    return goal, actions_to_goal, initial_attributes, attacker_actions, defender_actions, df_attacker, df_defender
+    return goal, actions_to_goal, initial_attributes, attacker_actions, defender_actions, attacker_nodes, defender_nodes
+
+def info_values(info):
+    """
+    Returns the accessor of the costs and times of the actions extracted by get_info.
+
+    The accessor takes a (role, field, action) key: role is "attacker", "defender" or
+    "goal" (the defender reward of an attacker action reaching the goal, ten times its
+    cost) and field is "cost", "time" or "max_time" (the latter without action).
 
-def get_prism_model(tree):
+    Args:
+        info (tuple): The information extracted by get_info.
+
+    Returns:
+        callable: The accessor.
+    """
+    _, _, _, attacker_actions, defender_actions, attacker_nodes, defender_nodes = info
+    actions = {"attacker": attacker_actions, "defender": defender_actions, "goal": attacker_actions}
+    nodes = {"attacker": attacker_nodes, "defender": defender_nodes}
+
+    def value(role, field, action=None):
+        if field == "max_time":
+            return max((node.time for node in nodes[role] if node.time is not None), default=0)
+        v = actions[role][action][field]
+        return v * 10 if role == "goal" else v
+
+    return value
+
+def constant_values(value, actions, undefined=()):
+    """
+    Wraps a value accessor so that costs and times are emitted as PRISM constants.
+
+    Costs and times are named cost_<action> and time_<action>, and the time ranges
+    are bounded by the maximum of the time constants of each player.
+
+    Args:
+        value (callable): The accessor of the actual values, see info_values.
+        actions (dict): The action names of the "attacker" and the "defender".
+        undefined (iterable): The names of the constants to declare without a value,
+            to be set with PRISM's -const option.
+
+    Returns:
+        tuple: The accessor returning constant names, and the dictionary of the
+            declarations it has emitted, by name.
+    """
+    undefined = set(undefined)
+    declarations = {}
+
+    def constant(role, field, action=None):
+        if role == "goal":
+            return f"{constant('attacker', field, action)}*10"
+        if field == "max_time":
+            names = [constant(role, "time", a) for a in actions[role]]
+            return f"max({', '.join(['0'] + names)})" if names else "0"
+        name = f"{field}_{action}"
+        if name not in declarations:
+            v = value(role, field, action)
+            type = "double" if isinstance(v, float) else "int"
+            declarations[name] = f"const {type} {name};" if name in undefined else f"const {type} {name} = {v};"
+        return name
+
+    return constant, declarations
+
+def declare_constants(text, declarations):
+    """Inserts the constant declarations after the model type of a PRISM model."""
+    header, body = text.split("\n\n", 1)
+    return f"{header}\n\n" + "\n".join(declarations.values()) + f"\n\n{body}"
+
+def structure_key(tree, timed=False):
+    """
+    Hashes everything of a tree that the PRISM model depends on, except costs and times.
+
+    Args:
+        tree (Tree): The tree.
+        timed (bool): Whether the key is for the time-based model.
+
+    Returns:
+        str: The hex sha256 digest.
+    """
+    h = hashlib.sha256(b"timed\n" if timed else b"untimed\n")
+    for node in tree.nodes:
+        h.update(f"{node.label}\x1f{node.refinement}\x1f{node.type}\x1f{node.action}\x1f{node.role}\n".encode("utf-8"))
+    h.update(b"\x1d")
+    for (parent, child), action in tree.edges:
+        h.update(f"{parent}\x1f{child}\x1f{action}\n".encode("utf-8"))
+    return h.hexdigest()
+
+class PrismTemplate:
+    """
+    A PRISM model compiled for a tree structure, with placeholders for costs and times.
+    """
+    PLACEHOLDER = re.compile("\x00([0-9]+)\x00")
+
+    def __init__(self, tree, timed=False):
+        info = get_info(tree)
+        keys = []
+
+        def placeholder(*key):
+            keys.append(key)
+            return f"\x00{len(keys) - 1}\x00"
+
+        build = build_prism_model_time if timed else build_prism_model
+        parts = self.PLACEHOLDER.split(build(info, placeholder))
+        self.parts = parts[0::2]
+        self.slots = [keys[int(i)] for i in parts[1::2]]
+
+        # positions of the nodes whose times bound the time1/time2 ranges
+        _, _, _, _, _, attacker_nodes, defender_nodes = info
+        self.time_nodes = {}
+        for role, role_nodes in (("attacker", attacker_nodes), ("defender", defender_nodes)):
+            ids = {id(node) for node in role_nodes}
+            self.time_nodes[role] = [i for i, node in enumerate(tree.nodes) if id(node) in ids]
+
+    def values(self, tree):
+        """
+        Returns the accessor of the costs and times of a tree with the template structure.
+
+        It picks the same nodes as get_info (the first attacker and defender node of
+        every action) without computing the rest of the information.
+
+        Args:
+            tree (Tree): The tree.
+
+        Returns:
+            callable: The accessor, see info_values.
+        """
+        actions = {"attacker": {}, "defender": {}}
+        for node in tree.nodes:
+            action = node.action
+            if action == "":
+                continue
+            if node.role == "Attacker" and action not in actions["attacker"]:
+                actions["attacker"][action] = node
+            elif action in actions["attacker"]:
+                continue
+            elif node.role == "Defender" and action not in actions["defender"]:
+                actions["defender"][action] = node
+        actions["goal"] = actions["attacker"]
+        nodes = tree.nodes
+
+        def value(role, field, action=None):
+            if field == "max_time":
+                times = (nodes[i].time for i in self.time_nodes[role])
+                return max((t for t in times if t is not None), default=0)
+            v = getattr(actions[role][action], field)
+            return v * 10 if role == "goal" else v
+
+        return value
+
+    def render(self, tree, constants=False, undefined=()):
+        """
+        Renders the PRISM model of a tree with the template structure.
+
+        Args:
+            tree (Tree): The tree.
+            constants (bool): Whether costs and times are emitted as constants.
+            undefined (iterable): The constants declared without a value.
+
+        Returns:
+            A string representing the PRISM model.
+        """
+        value = self.values(tree)
+        if constants:
+            value, declarations = constant_values(value, self.actions(), undefined)
+        text = [self.parts[0]]
+        for key, part in zip(self.slots, self.parts[1:]):
+            text.append(str(value(*key)))
+            text.append(part)
+        text = "".join(text)
+        return declare_constants(text, declarations) if constants else text
+
+    def actions(self):
+        """Returns the action names of the attacker and the defender, in model order."""
+        actions = {"attacker": {}, "defender": {}}
+        for role, field, *action in self.slots:
+            if role in actions and action:
+                actions[role][action[0]] = None
+        return {role: list(names) for role, names in actions.items()}
+
+class TemplateCache:
+    """
+    A thread-safe LRU cache of PRISM templates, keyed by the structure of the trees.
+
+    Args:
+        maxsize (int): The maximum number of templates kept.
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, tree, timed=False):
+        """
+        Returns the template of a tree structure, compiling it if needed.
+
+        Args:
+            tree (Tree): The tree.
+            timed (bool): Whether the template is for the time-based model.
+
+        Returns:
+            PrismTemplate: The template.
+        """
+        key = structure_key(tree, timed)
+        with self.lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+
+        template = PrismTemplate(tree, timed)
+        with self.lock:
+            self.templates[key] = template
+            while len(self.templates) > self.maxsize:
+                self.templates.popitem(last=False)
+        return template
+
+    def render(self, tree, timed=False, constants=False, undefined=()):
+        return self.get(tree, timed).render(tree, constants, undefined)
+
+def get_prism_model(tree, templates=None, constants=False, undefined=()):
     """
     Converts a tree object into a PRISM model.
 
     Args:
         tree: The tree object to be converted.
+        templates (TemplateCache): Optional cache of compiled models. If given, the model
+            is rendered from the template of the tree structure, compiled on first use.
+        constants (bool): Whether costs and times are emitted as PRISM constants
+            (cost_<action> and time_<action>) instead of inline values.
+        undefined (iterable): The constants declared without a value, to be set with
+            PRISM's -const option.
+
+    Returns:
+        A string representing the PRISM model.
+    """
+    if templates is not None:
+        return templates.render(tree, timed=False, constants=constants, undefined=undefined)
+    info = get_info(tree)
+    value = info_values(info)
+    if not constants:
+        return build_prism_model(info, value)
+    value, declarations = constant_values(value, {"attacker": list(info[3]), "defender": list(info[4])}, undefined)
+    return declare_constants(build_prism_model(info, value), declarations)
+
+def build_prism_model(info, value):
+    """
+    Builds the text of the PRISM model.
+
+    Args:
+        info (tuple): The information extracted by get_info.
+        value (callable): Returns the text of a cost or time, given its key (see info_values).
 
     Returns:
         A string representing the PRISM model.
     """
-    df = tree.to_dataframe()
-    goal, actions_to_goal, initial_attributes, attacker_actions, defender_actions, df_attacker, df_defender = get_info(df)
+    goal, actions_to_goal, initial_attributes, attacker_actions, defender_actions, attacker_nodes, defender_nodes = info
     text = "smg\n\nplayer attacker\n\tattacker,\n\t"
 
     for a in attacker_actions.keys():
@@ -170,7 +479,7 @@ def get_prism_model(tree):
 
     text += f'global {goal} : [0..1];\nlabel "terminate" = {goal}=1;\n\n'
 
-    for a in set(df_attacker.loc[df_attacker["Type"] == "Attribute"]["Label"].values):
+    for a in {node.label for node in attacker_nodes if node.type == "Attribute"}:
         text += "global " + a + " : [0..2];\n"
         
     for a in set(initial_attributes):
@@ -204,7 +513,7 @@ def get_prism_model(tree):
         
     text += "\nendmodule\n\nmodule defender\n\n"
 
-    defender_attributes = set(df_defender.loc[df_defender["Type"] == "Attribute"]["Label"].values)
+    defender_attributes = {node.label for node in defender_nodes if node.type == "Attribute"}
     for a in defender_attributes:
         text += f"\t{a} : [0..1];\n"
         
@@ -238,33 +547,58 @@ def get_prism_model(tree):
     text += '\nendmodule\n\nrewards "attacker"\n\n'
 
     for a in attacker_actions.keys():
-        text += f"\t[{a}] true : {attacker_actions[a]['cost']};\n"
+        text += f"\t[{a}] true : {value('attacker', 'cost', a)};\n"
         
     text += '\nendrewards\n\nrewards "defender"\n\n'
 
     for a in actions_to_goal:
-        text += f"\t[{a}] true : {int(attacker_actions[a]['cost'])*10};\n"
+        text += f"\t[{a}] true : {value('goal', 'cost', a)};\n"
     for a in defender_actions.keys():
-        text += f"\t[{a}] true : {defender_actions[a]['cost']};\n"
+        text += f"\t[{a}] true : {value('defender', 'cost', a)};\n"
           
     text += "\nendrewards"
 
     return text
 
-def get_prism_model_time(tree):
+def get_prism_model_time(tree, templates=None, constants=False, undefined=()):
     """
     Converts a tree object into a PRISM model with time.
 
     Args:
         tree: The tree object to be converted.
+        templates (TemplateCache): Optional cache of compiled models. If given, the model
+            is rendered from the template of the tree structure, compiled on first use.
+        constants (bool): Whether costs and times are emitted as PRISM constants
+            (cost_<action> and time_<action>) instead of inline values.
+        undefined (iterable): The constants declared without a value, to be set with
+            PRISM's -const option.
 
     Returns:
         A string representing the PRISM model.
     """
-    df = tree.to_dataframe()
-    goal, actions_to_goal, list_initial, attacker_actions, defender_actions, df_attacker, df_defender = get_info(df)
-    attacker_max_time = max(df_attacker["Time"].values)
-    defender_max_time = max(df_defender["Time"].values)
+    if templates is not None:
+        return templates.render(tree, timed=True, constants=constants, undefined=undefined)
+    info = get_info(tree)
+    value = info_values(info)
+    if not constants:
+        return build_prism_model_time(info, value)
+    value, declarations = constant_values(value, {"attacker": list(info[3]), "defender": list(info[4])}, undefined)
+    return declare_constants(build_prism_model_time(info, value), declarations)
+
+def build_prism_model_time(info, value):
+    """
+    Builds the text of the PRISM model with time.
+
+    Args:
+        info (tuple): The information extracted by get_info.
+        value (callable): Returns the text of a cost or time, given its key (see info_values).
+
+    Returns:
+        A string representing the PRISM model.
+    """
+    goal, actions_to_goal, list_initial, attacker_actions, defender_actions, attacker_nodes, defender_nodes = info
+    attacker_max_time = value("attacker", "max_time")
+    defender_max_time = value("defender", "max_time")
     
     text = "smg\n\nplayer attacker\n\tattacker, [wait1],\n\t"
 
@@ -282,7 +616,7 @@ def get_prism_model_time(tree):
 
     text += f'global {goal} : [0..1];\nlabel "terminate" = {goal}=1;\n\n'
 
-    for a in set(df_attacker.loc[df_attacker["Type"] == "Attribute"]["Label"].values):
+    for a in {node.label for node in attacker_nodes if node.type == "Attribute"}:
         text += "global " + a + " : [0..2];\n"
         
     for a in set(list_initial):
@@ -290,7 +624,8 @@ def get_prism_model_time(tree):
 
     text += "\nmodule attacker\n\n"
 
-    for a in set(df_attacker["Action"].values):
+    # the attributes have no action: only the actions have a progress variable
+    for a in {node.action for node in attacker_nodes if node.action}:
         text += f"\tprogress{a} : bool;\n"
         
     text += "\n"
@@ -301,7 +636,7 @@ def get_prism_model_time(tree):
         preconditions = attacker_actions[a]["preconditions"]
         effect = attacker_actions[a]["effect"]
         effects = f"({effect}'=1)"
-        time = attacker_actions[a]["time"]
+        time = value("attacker", "time", a)
         
         if attacker_actions[a]["refinement"] == "disjunctive":
             refinement = "|"
@@ -328,12 +663,12 @@ def get_prism_model_time(tree):
         
     text += "\nendmodule\n\nmodule defender\n\n"
 
-    defender_attributes = set(df_defender.loc[df_defender["Type"] == "Attribute"]["Label"].values)
+    defender_attributes = {node.label for node in defender_nodes if node.type == "Attribute"}
     for a in defender_attributes:
         text += f"\t{a} : [0..1];\n"
     
     text += "\n"
-    for a in set(df_defender["Action"].values):
+    for a in {node.action for node in defender_nodes if node.action}:
         text += f"\tprogress{a} : bool;\n"
         
     text += f"\n\ttime2 : [-1..{defender_max_time}];\n"
@@ -342,7 +677,7 @@ def get_prism_model_time(tree):
     for a in defender_actions.keys():
         preconditions = defender_actions[a]["preconditions"]
         effect = defender_actions[a]["effect"]
-        time = defender_actions[a]["time"]
+        time = value("defender", "time", a)
         
         if defender_actions[a]["refinement"] == "disjunctive":
             refinement = "|"
@@ -371,14 +706,14 @@ def get_prism_model_time(tree):
     text += '\nendmodule\n\nrewards "attacker"\n\n'
 
     for a in attacker_actions.keys():
-        text += f"\t[start{a}] true : {attacker_actions[a]['cost']};\n"
+        text += f"\t[start{a}] true : {value('attacker', 'cost', a)};\n"
         
     text += '\nendrewards\n\nrewards "defender"\n\n'
 
     for a in actions_to_goal:
-        text += f"\t[end{a}] true : {int(attacker_actions[a]['cost'])*10};\n"
+        text += f"\t[end{a}] true : {value('goal', 'cost', a)};\n"
     for a in defender_actions.keys():
-        text += f"\t[start{a}] true : {defender_actions[a]['cost']};\n"
+        text += f"\t[start{a}] true : {value('defender', 'cost', a)};\n"
           
     text += "\nendrewards"
 
@@ -389,9 +724,88 @@ def save_prism_model(prism_model, file):
         f.write(prism_model)
         f.close()
     
-def save_prism_properties(file):
+# the properties that can be checked, by query name; {bound} is the number of steps
+QUERIES = {
+    "equilibrium": ('Each agent tries to get the minimum expected cost to reach a terminate state',
+                    '<<attacker,defender>>R{"attacker"}min=? [ F "terminate" ] + R{"defender"}min=? [ F "deadlock" ]'),
+    "attacker_cost": ('Minimum expected cost of the attacker to reach the goal',
+                      '<<attacker>>R{"attacker"}min=? [ F "terminate" ]'),
+    "defender_cost": ('Minimum expected cost of the defender until the game ends',
+                      '<<defender>>R{"defender"}min=? [ F "deadlock" ]'),
+    "goal_probability": ('Maximum probability of the attacker reaching the goal',
+                         '<<attacker>>Pmax=? [ F "terminate" ]'),
+    "goal_probability_defended": ('Probability of the goal being reached against the best defender',
+                                  '<<defender>>Pmin=? [ F "terminate" ]'),
+    "goal_probability_within": ('Maximum probability of the attacker reaching the goal within {bound} steps',
+                                '<<attacker>>Pmax=? [ F<={bound} "terminate" ]'),
+    "goal_probability_defended_within": ('Probability of the goal being reached within {bound} steps against the best defender',
+                                         '<<defender>>Pmin=? [ F<={bound} "terminate" ]'),
+}
+
+# the property whose strategy is exported and simulated
+POLICY_QUERY = "equilibrium"
+
+def parse_queries(queries):
+    """
+    Validates a list of queries.
+
+    Args:
+        queries (list): Query names (see QUERIES), or dictionaries with the "query" name,
+            the "bound" of the bounded queries (the number of steps, each wait being one
+            time unit in the time-based model) and an optional result "name".
+
+    Returns:
+        list: The (name, query, bound) tuples, with unique names.
+
+    Raises:
+        ValueError: If a query is unknown, misses its bound, is repeated or takes the
+            name of the policy query.
+    """
+    parsed = []
+    names = set()
+    for q in queries:
+        if isinstance(q, str):
+            q = {"query": q}
+        if not isinstance(q, dict) or q.get("query") not in QUERIES:
+            raise ValueError(f"Unknown query: {q} (expected one of {', '.join(QUERIES)})")
+        query, bound = q["query"], q.get("bound")
+        if "{bound}" in QUERIES[query][1]:
+            if not isinstance(bound, int) or isinstance(bound, bool) or bound < 0:
+                raise ValueError(f"Query {query} needs a non-negative integer bound")
+        elif bound is not None:
+            raise ValueError(f"Query {query} has no bound")
+        name = q.get("name") or (f"{query}_{bound}" if bound is not None else query)
+        # the result of the policy query is always reported under its own name
+        if name == POLICY_QUERY and query != POLICY_QUERY:
+            raise ValueError(f"Query {query} cannot be named {POLICY_QUERY}, the name of the policy query")
+        if name in names:
+            raise ValueError(f"Query {name} is repeated")
+        names.add(name)
+        parsed.append((name, query, bound))
+    return parsed
+
+def get_prism_properties(queries=None):
+    """
+    Generates the PRISM properties file of a list of queries, to check all of them in
+    one PRISM run. The policy query (equilibrium) is always included and written last,
+    so that the strategy exported and simulated by PRISM is the one of the policy.
+
+    Args:
+        queries (list): The queries, see parse_queries. Defaults to the policy query only.
+
+    Returns:
+        tuple: The text of the properties file and the names of its properties, in order.
+    """
+    parsed = [q for q in parse_queries(queries or []) if q[0] != POLICY_QUERY]
+    parsed.append((POLICY_QUERY, POLICY_QUERY, None))
+    text = ""
+    for name, query, bound in parsed:
+        comment, prop = QUERIES[query]
+        text += f"// {comment}\n{prop}\n".replace("{bound}", str(bound))
+    return text, [q[0] for q in parsed]
+
+def save_prism_properties(file, queries=None):
+    text, _ = get_prism_properties(queries)
     with open(file, 'w') as f:
-        f.write('// Each agent tries to get the minimum expected cost to reach a terminate state\n')
-        f.write('<<attacker,defender>>R{"attacker"}min=? [ F "terminate" ] + R{"defender"}min=? [ F "deadlock" ]\n')
-        f.close()
+        f.write(text)
     
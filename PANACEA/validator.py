@@ -0,0 +1,253 @@
+import re
+import xml.etree.ElementTree as ET
+from typing import NamedTuple
+
+from comment_metadata import parse_comment
+
+TYPES = ("Goal", "Attribute", "Action")
+ROLES = ("Attacker", "Defender")
+REFINEMENTS = ("disjunctive", "conjunctive")
+
+# labels and actions become PRISM variables and action names
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+PRISM_KEYWORDS = frozenset((
+    "A", "bool", "clock", "const", "ctmc", "C", "double", "dtmc", "E", "endinit", "endinvariant",
+    "endmodule", "endobservables", "endplayer", "endrewards", "endsystem", "false", "formula",
+    "filter", "func", "F", "global", "G", "init", "invariant", "I", "int", "label", "max", "mdp",
+    "min", "module", "X", "nondeterministic", "observable", "observables", "player", "pomdp",
+    "popta", "P", "Pmax", "Pmin", "probabilistic", "prob", "pta", "rate", "rewards", "Rmax", "Rmin",
+    "R", "S", "smg", "stochastic", "system", "true", "U", "W",
+    # variables and labels of the generated models
+    "sched", "attacker", "defender", "progress", "time1", "time2", "terminate",
+))
+
+
+class Issue(NamedTuple):
+    """A problem found in a tree: errors prevent the conversion, warnings do not."""
+    severity: str
+    code: str
+    message: str
+    label: "str | None" = None
+    path: "str | None" = None
+
+    def to_dict(self):
+        return {k: v for k, v in self._asdict().items() if v is not None}
+
+
+class ValidationError(ValueError):
+    """
+    Raised when a tree has errors.
+
+    Args:
+        issues (list): All the issues found, errors and warnings.
+    """
+    def __init__(self, issues):
+        self.issues = issues
+        errors = [issue for issue in issues if issue.severity == "error"]
+        super().__init__(f"{len(errors)} error(s) in the tree: " + "; ".join(issue.message for issue in errors))
+
+
+def validate_file(file, timed=False):
+    """
+    Validates an ADTool XML file, see validate_element.
+
+    Args:
+        file (str): The path to the XML file.
+        timed (bool): Whether the time-based model will be generated.
+
+    Returns:
+        list: The issues found.
+    """
+    try:
+        xml = ET.parse(file).getroot()
+    except ET.ParseError as e:
+        return [Issue("error", "malformed_xml", f"Malformed XML: {e}")]
+    return validate_element(xml, timed)
+
+
+def validate_string(xml_content, timed=False):
+    """
+    Validates ADTool XML content, see validate_element.
+
+    Args:
+        xml_content (str): The content of the XML file from ADTool.
+        timed (bool): Whether the time-based model will be generated.
+
+    Returns:
+        list: The issues found.
+    """
+    try:
+        xml = ET.fromstring(xml_content)
+    except ET.ParseError as e:
+        return [Issue("error", "malformed_xml", f"Malformed XML: {e}")]
+    return validate_element(xml, timed)
+
+
+def check(issues):
+    """
+    Raises ValidationError if the issues contain errors.
+
+    Args:
+        issues (list): The issues returned by a validate function.
+
+    Returns:
+        list: The warnings.
+    """
+    if any(issue.severity == "error" for issue in issues):
+        raise ValidationError(issues)
+    return issues
+
+
+def validate_element(xml, timed=False):
+    """
+    Validates a tree before its conversion, in a single pass over the XML elements, and
+    returns all the issues at once instead of failing on the first one.
+
+    The nodes are read as parse_node reads them (labels without spaces, fields of the
+    comment as in Node), and checked for: the structure (one Goal at the root, actions
+    below attributes or the goal), the types, roles and refinements, numeric costs and
+    times (integer times for the time-based model), duplicate labels, PRISM-compatible
+    names, and actions shared by both players or defined with different values.
+
+    Args:
+        xml (Element): The <adtree> element.
+        timed (bool): Whether the time-based model will be generated (times are required).
+
+    Returns:
+        list: The issues found, errors first.
+    """
+    issues = []
+
+    def add(severity, code, message, label=None, path=None):
+        issues.append(Issue(severity, code, message, label, path))
+
+    root = xml.find('node') if xml.tag == 'adtree' else None
+    if root is None:
+        add("error", "no_root", "The file must contain an <adtree> element with a root <node>")
+        return issues
+
+    labels = {}
+    actions = {}
+    goals = []
+    attacker_actions = 0
+    # actions checked against the labels after the walk, when all the labels are known
+    named_actions = []
+    # (element, path, parent type, parent role, parent label)
+    stack = [(root, "adtree/node[1]", None, None, None)]
+    while stack:
+        element, path, parent_type, parent_role, parent_label = stack.pop()
+
+        label_element = element.find('label')
+        label = (label_element.text or "").replace(" ", "") if label_element is not None else ""
+        if not label:
+            add("error", "missing_label", "A node has no label", path=path)
+        elif label in labels:
+            add("error", "duplicate_label", f"Label {label} is used by more than one node", label, path)
+        else:
+            labels[label] = path
+            if not IDENTIFIER.match(label):
+                add("error", "invalid_label", f"Label {label} is not a valid PRISM identifier", label, path)
+            elif label in PRISM_KEYWORDS:
+                add("error", "reserved_label", f"Label {label} is a reserved PRISM name", label, path)
+        name = label or path
+
+        refinement = element.attrib.get('refinement')
+        if refinement not in REFINEMENTS:
+            add("error", "invalid_refinement",
+                f"Node {name} has refinement {refinement!r}, expected one of {', '.join(REFINEMENTS)}", label, path)
+
+        comment_element = element.find('comment')
+        metadata = parse_comment(comment_element.text if comment_element is not None else "")
+        for error in metadata.errors:
+            add("error", "invalid_number", f"Node {name}: {error}", label, path)
+
+        node_type, role, action = metadata.type, metadata.role, metadata.action
+        if node_type not in TYPES:
+            add("error", "invalid_type",
+                f"Node {name} has type {node_type!r}, expected one of {', '.join(TYPES)}", label, path)
+        if role not in ROLES:
+            add("error", "invalid_role",
+                f"Node {name} has role {role!r}, expected one of {', '.join(ROLES)}", label, path)
+
+        # ADTool marks the nodes of the other player with switchRole
+        if parent_role in ROLES and role in ROLES:
+            switched = element.attrib.get('switchRole') == "yes"
+            if switched != (role != parent_role):
+                add("warning", "role_mismatch",
+                    f"Node {name} has role {role} but switchRole={'yes' if switched else 'no'} below {parent_role} node {parent_label}",
+                    label, path)
+
+        if node_type == "Goal":
+            goals.append(name)
+            if parent_type is not None:
+                add("error", "nested_goal", f"Goal {name} is not the root of the tree", label, path)
+            if role and role != "Attacker":
+                add("error", "invalid_goal_role", f"Goal {name} must have role Attacker", label, path)
+
+        if node_type == "Action" and not action:
+            add("error", "missing_action", f"Action node {name} has no Action name", label, path)
+        if action and node_type != "Action":
+            add("warning", "action_on_attribute",
+                f"Node {name} of type {node_type or 'unknown'} has Action {action} and is converted as an action",
+                label, path)
+
+        if action:
+            if parent_type is None:
+                add("error", "root_action", f"Action {action} is the root of the tree and has no effect", label, path)
+            elif parent_type == "Action":
+                add("error", "action_effect",
+                    f"Action {action} ({name}) is below action {parent_label}: the effect of an action must be an attribute or the goal",
+                    label, path)
+            if not IDENTIFIER.match(action):
+                add("error", "invalid_action", f"Action {action} ({name}) is not a valid PRISM identifier", label, path)
+            elif action in PRISM_KEYWORDS:
+                add("error", "reserved_action", f"Action {action} ({name}) clashes with a PRISM name or a node label", label, path)
+            else:
+                named_actions.append((action, name, label, path))
+            if metadata.cost is None:
+                add("error", "missing_cost", f"Action {action} ({name}) has no Cost", label, path)
+            elif metadata.cost < 0:
+                add("error", "negative_cost", f"Action {action} ({name}) has a negative Cost", label, path)
+            if metadata.time is None and timed:
+                add("error", "missing_time", f"Action {action} ({name}) has no Time", label, path)
+            elif metadata.time is not None and metadata.time < 0:
+                add("error", "negative_time", f"Action {action} ({name}) has a negative Time", label, path)
+            elif timed and metadata.time is not None and metadata.time != int(metadata.time):
+                # times are the values of the integer time1 and time2 variables
+                add("error", "invalid_time", f"Action {action} ({name}) has a non-integer Time", label, path)
+            if role == "Attacker":
+                attacker_actions += 1
+
+            first = actions.setdefault(action, (role, metadata.cost, metadata.time, name))
+            if first[0] != role and role in ROLES and first[0] in ROLES:
+                add("error", "shared_action",
+                    f"Action {action} is used by both players ({first[3]} and {name})", label, path)
+            elif first[1:3] != (metadata.cost, metadata.time):
+                add("warning", "inconsistent_action",
+                    f"Action {action} has different cost or time in {first[3]} and {name}: the values of {first[3]} are used",
+                    label, path)
+
+        children = [child for child in element if child.tag == 'node']
+        if refinement == "conjunctive" and len(children) == 1:
+            add("warning", "single_conjunct", f"Conjunctive node {name} has a single child", label, path)
+        for i, child in reversed(list(enumerate(children, 1))):
+            stack.append((child, f"{path}/node[{i}]", node_type, role, label))
+
+    for action, name, label, path in named_actions:
+        if action in labels:
+            add("error", "reserved_action", f"Action {action} ({name}) clashes with a PRISM name or a node label", label, path)
+    if timed:
+        # the time-based model declares a variable progress<action> for every action
+        for label, path in labels.items():
+            if label.startswith("progress") and label[len("progress"):] in actions:
+                add("error", "reserved_label", f"Label {label} is a reserved PRISM name", label, path)
+
+    if not goals:
+        add("error", "missing_goal", "The tree has no node of type Goal")
+    elif len(goals) > 1:
+        add("error", "multiple_goals", f"The tree has more than one Goal: {', '.join(goals)}")
+    if not attacker_actions:
+        add("error", "no_attacker_actions", "The tree has no attacker action")
+
+    issues.sort(key=lambda issue: issue.severity != "error")
+    return issues
@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def policy_record(index, states):
+    """A synthetic policy of the given number of states, like those extracted by the server."""
+    return {
+        "name": f"bulk_benchmark_policy_{index}.json",
+        "content": {"states": [{
+            "state_id": i,
+            "state_data": {"DataStolen": i % 2, "ServerAccess": i % 3, "phish": i > 0},
+            "optimal_action": f"action{i}" if i else None
+        } for i in range(states)]}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the single-record and the bulk NDJSON ingestion of the database service '
+                                                 '(the records are inserted in the database of DATABASE_URL)')
+    parser.add_argument('--records', '-n', type=int, default=5000, help='Number of records of the bulk runs')
+    parser.add_argument('--single', type=int, default=500, help='Number of records inserted one per request')
+    parser.add_argument('--states', type=int, default=20, help='Number of states of each policy')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 500, 2000], help='Batch sizes of the bulk runs')
+    args = parser.parse_args()
+
+    # Il servizio si connette al database all'importazione
+    sys.path.insert(0, os.path.join(ROOT, 'database'))
+    import db as database
+
+    client = database.app.test_client()
+    records = [policy_record(i, args.states) for i in range(args.records)]
+    payload = "".join(json.dumps(record) + "\n" for record in records).encode()
+    print(f"{args.records} policies of {args.states} states, {len(payload) / 1e6:.1f} MB of NDJSON\n")
+
+    start = time.perf_counter()
+    for record in records[:args.single]:
+        response = client.post('/api/policies', json=record)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    single = args.single / (time.perf_counter() - start)
+    print(f"{'one per request':<22} {single:10.0f} records/s")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        response = client.post(f'/api/policies/bulk?batch_size={batch_size}', data=payload,
+                               content_type='application/x-ndjson')
+        elapsed = time.perf_counter() - start
+        report = response.get_json()
+        assert report["inserted"] == args.records, report["errors"][:5]
+        print(f"{'bulk, batch ' + str(batch_size):<22} {args.records / elapsed:10.0f} records/s "
+              f"({args.records / elapsed / single:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../PANACEA')))
+from comment_metadata import parse_comment
+
+
+def legacy_node_parse(comment):
+    """The line-by-line parsing previously done by Node.comment_to_data."""
+    type, action, cost, role, time = "", "", "", "", ""
+    for line in comment.split('\n'):
+        if line.startswith('Type:'):
+            type = line.split(': ')[1]
+        elif line.startswith('Action:'):
+            action = line.split(': ')[1]
+        elif line.startswith('Cost:'):
+            cost = line.split(': ')[1]
+        elif line.startswith('Time:'):
+            time = line.split(': ')[1]
+        elif line.startswith('Role:'):
+            role = line.split(': ')[1]
+    return type, action, cost, time, role
+
+
+def legacy_json_parse(comment):
+    """The type scan and extract_additional_info previously done by xml2json_parser.traverse."""
+    node_type = None
+    for line in comment.splitlines():
+        if "Type:" in line:
+            node_type = line.split("Type:")[1].strip()
+            break
+    info = {}
+    if node_type == "Action":
+        for line in comment.splitlines():
+            if ":" in line:
+                key, value = line.split(":", 1)
+                value = value.strip()
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass
+                info[key.strip().lower()] = value
+    return node_type, info
+
+
+def comments(count, distinct):
+    r = random.Random(0)
+    pool = [
+        f"Type: Action\nAction: a{i}\nCost: {r.randint(1, 50)}\nTime: {r.randint(1, 10)}\nRole: {r.choice(['Attacker', 'Defender'])}"
+        if i % 3 else "Type: Attribute\nRole: Attacker"
+        for i in range(distinct)
+    ]
+    return [pool[r.randrange(distinct)] for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark of the ADTool comment parsing')
+    parser.add_argument('--count', '-n', type=int, default=100000, help='Number of comments to parse')
+    parser.add_argument('--distinct', '-d', type=int, default=500, help='Number of distinct comments (templated trees repeat them)')
+    parser.add_argument('--repeat', '-r', type=int, default=5, help='Number of repetitions')
+    args = parser.parse_args()
+
+    data = comments(args.count, args.distinct)
+
+    def cold():
+        parse_comment.cache_clear()
+        for c in data:
+            parse_comment(c).to_dict()
+
+    def warm():
+        for c in data:
+            parse_comment(c).to_dict()
+
+    cases = [
+        ("legacy Node + xml2json", lambda: [(legacy_node_parse(c), legacy_json_parse(c)) for c in data]),
+        ("parse_comment (cold)", cold),
+        ("parse_comment (warm)", warm),
+    ]
+    for name, function in cases:
+        best = min(timeit.repeat(function, number=1, repeat=args.repeat))
+        print(f"{name:<24} {best * 1000:10.2f} ms {best / args.count * 1e9:10.0f} ns/comment")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+
+from generator import generate_tree
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'PANACEA'))
+sys.path.append(os.path.join(ROOT, 'server'))
+import explicit_model as em
+import tree_to_prism as tp
+from validator import validate_string
+from modules.prism2json_parser import parse_property_results, parse_statistics
+
+DECLARATION = re.compile(r"^\s*(?:global\s+)?(\w+)\s*:\s*(?:\[(-?\d+)\.\.(-?\d+)\]|(bool))\s*;")
+COMMAND = re.compile(r"^\s*\[(\w*)\]\s*(.*?)\s*->\s*(.*?)\s*;\s*$")
+REWARD = re.compile(r"^\s*\[(\w+)\]\s*true\s*:\s*(.+?)\s*;\s*$")
+UPDATE = re.compile(r"\((\w+)'=([^)]*)\)")
+
+
+def expression(text):
+    """Translates a PRISM expression of the generated models to Python."""
+    text = re.sub(r"(?<![<>!])=", "==", text)
+    text = re.sub(r"!(?!=)", " not ", text)
+    text = text.replace("&", " and ").replace("|", " or ")
+    return compile(re.sub(r"\btrue\b", "True", re.sub(r"\bfalse\b", "False", text)), "<prism>", "eval")
+
+
+def interpret(model_text):
+    """
+    Explores a generated PRISM language model naively, reading its text: a reference for
+    the explicit explorer that shares nothing with it but the model.
+
+    Returns:
+        dict: The states (sorted (variable, value) tuples, bools as 0 and 1), the
+            transitions (state, action, successor), the rewards by (state, action) of every
+            structure, the terminate states and the player of every action.
+
+    Raises:
+        ValueError: If the model is invalid for PRISM (duplicated or unknown variables,
+            values out of range).
+    """
+    variables, commands, rewards, players = {}, [], {}, {}
+    block = None
+    for line in model_text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("player "):
+            block = ("player", stripped.split()[1])
+        elif stripped.startswith("rewards "):
+            block = ("rewards", stripped.split('"')[1])
+            rewards[block[1]] = {}
+        elif stripped in ("endplayer", "endrewards", "endmodule"):
+            block = None
+        elif block and block[0] == "player":
+            for action in re.findall(r"\[(\w+)\]", stripped):
+                players[action] = block[1]
+        elif block and block[0] == "rewards":
+            match = REWARD.match(line)
+            if match:
+                items = rewards[block[1]]
+                items[match.group(1)] = items.get(match.group(1), 0) + float(match.group(2))
+        elif DECLARATION.match(line):
+            name, low, high, boolean = DECLARATION.match(line).groups()
+            if name in variables:
+                raise ValueError(f"Duplicated variable: {name}")
+            variables[name] = (0, 1, True) if boolean else (int(low), int(high), False)
+        elif COMMAND.match(line):
+            action, guard, updates = COMMAND.match(line).groups()
+            commands.append((action, expression(guard),
+                             [(name, expression(value)) for name, value in UPDATE.findall(updates)]))
+
+    names = sorted(variables)
+    initial = tuple(variables[name][0] for name in names)
+    index = {initial: 0}
+    states = [initial]
+    transitions = set()
+    queue = deque([initial])
+    while queue:
+        state = queue.popleft()
+        scope = {name: bool(v) if variables[name][2] else v for name, v in zip(names, state)}
+        for action, guard, updates in commands:
+            try:
+                if not eval(guard, {}, scope):
+                    continue
+                successor = dict(scope)
+                successor.update({name: eval(value, {}, scope) for name, value in updates})
+            except NameError as e:
+                raise ValueError(f"Unknown variable: {e}")
+            successor = tuple(int(successor[name]) for name in names)
+            for name, v in zip(names, successor):
+                low, high, _ = variables[name]
+                if not low <= v <= high:
+                    raise ValueError(f"Value {v} of {name} out of its range [{low}..{high}] after {action}")
+            if successor not in index:
+                index[successor] = len(states)
+                states.append(successor)
+                queue.append(successor)
+            transitions.add((state, action, successor))
+
+    def named(state):
+        return tuple(zip(names, state))
+
+    goal = next(name for name in names if re.search(rf'label "terminate" = {name}=1;', model_text))
+    return {
+        "states": {named(s) for s in states},
+        "transitions": {(named(s), a, named(t)) for s, a, t in transitions},
+        "rewards": {structure: {(named(s), a): items[a] for s, a, _ in transitions if items.get(a)}
+                    for structure, items in rewards.items()},
+        "terminate": {named(s) for s in states if dict(named(s))[goal] == 1},
+        "players": players,
+    }
+
+
+def explicit_view(model):
+    """Converts an ExplicitModel to the structure returned by interpret."""
+    names = [v.name for v in model.variables]
+    order = sorted(range(len(names)), key=lambda i: names[i])
+    states = [tuple((names[i], int(row[i])) for i in order) for row in model.states.tolist()]
+    sources = [s for s in range(model.size) for _ in range(model.offsets[s], model.offsets[s + 1])]
+    actions = [model.actions[a] for a in model.choice_actions.tolist()]
+    targets = model.targets.tolist()
+    terminate = model.labels()["terminate"]
+    return {
+        "states": set(states),
+        "transitions": {(states[s], a, states[t]) for s, a, t in zip(sources, actions, targets)},
+        "rewards": {structure: {(states[s], a): float(r) for s, a, r in zip(sources, actions, values.tolist()) if r}
+                    for structure, values in model.rewards.items()},
+        "terminate": {states[s] for s in range(model.size) if terminate[s]},
+        "players": {a: em.PLAYERS[p] for a, p in
+                    ((actions[c], int(model.players[s])) for c, s in enumerate(sources))},
+    }
+
+
+def compare(reference, explicit):
+    """
+    Returns:
+        list: The differences between two state spaces, empty if they are the same.
+    """
+    differences = []
+    for field in ("states", "transitions", "terminate"):
+        missing, extra = reference[field] - explicit[field], explicit[field] - reference[field]
+        if missing or extra:
+            differences.append(f"{field}: {len(missing)} missing, {len(extra)} extra")
+    for structure, items in reference["rewards"].items():
+        if items != explicit["rewards"].get(structure, {}):
+            differences.append(f"rewards {structure} differ")
+    # the actions of the timed failures are not listed by any player of the language model
+    owned = {a: p for a, p in explicit["players"].items() if a in reference["players"]}
+    if any(reference["players"][a] != p for a, p in owned.items()):
+        differences.append("players differ")
+    return differences
+
+
+def run_prism(prism, args):
+    start = time.perf_counter()
+    result = subprocess.run([prism] + args, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0 or "Error" in result.stdout:
+        error = next((line for line in result.stdout.splitlines() if "Error" in line), result.stderr.strip())
+        raise RuntimeError(f"PRISM failed: {error}")
+    return result.stdout, wall
+
+
+def corpus(args):
+    """Yields the (name, XML) pairs of the input files and of the generated trees."""
+    for path in args.input or []:
+        with open(path) as f:
+            yield os.path.basename(path), f.read()
+    for depth in args.depths:
+        for ratio in args.defender_ratios:
+            for seed in range(args.seeds):
+                yield (f"depth{depth}-defenders{ratio}-seed{seed}",
+                       generate_tree(depth=depth, branching=args.branching, defender_ratio=ratio,
+                                     max_nodes=args.max_nodes, seed=seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check that the explicit-state export of the PANACEA models matches the language models, '
+                    'and compare the two paths: the export against the model text and, with --prism, PRISM '
+                    'importing the explicit files against PRISM parsing and building the language model')
+    parser.add_argument('--input', '-i', type=str, nargs='+', help='XML files of the corpus, besides the generated trees')
+    parser.add_argument('--depths', type=int, nargs='+', default=[2, 3, 4], help='Depths of the generated trees')
+    parser.add_argument('--defender-ratios', type=float, nargs='+', default=[0.0, 0.3], help='Countermeasure ratios of the generated trees')
+    parser.add_argument('--branching', type=int, default=3, help='Branching of the generated trees')
+    parser.add_argument('--max-nodes', type=int, default=120, help='Maximum nodes of the generated trees')
+    parser.add_argument('--seeds', type=int, default=3, help='Generated trees per depth and ratio')
+    parser.add_argument('--time', '-t', action='store_true', help='Use the time-based models')
+    parser.add_argument('--max-states', type=int, default=1_000_000, help='Larger state spaces are skipped')
+    parser.add_argument('--check-limit', type=int, default=200_000, help='Larger state spaces are not interpreted')
+    parser.add_argument('--prism', type=str, help='Path to the PRISM executable, to compare the results and times')
+    args = parser.parse_args()
+
+    # the queries without a bound, checked in one run as by the server
+    properties, names = tp.get_prism_properties([q for q, (_, prop) in tp.QUERIES.items() if "{bound}" not in prop])
+    print(f"{'tree':<30} {'nodes':>6} {'states':>9} {'text':>8} {'explore':>8} {'write':>8} "
+          f"{'check':>6}" + (f" {'PRISM text':>11} {'PRISM files':>12} {'results':>8}" if args.prism else ""))
+    failures = 0
+    for name, xml in corpus(args):
+        if any(issue.severity == "error" for issue in validate_string(xml, args.time)):
+            print(f"{name:<30} invalid tree, skipped")
+            continue
+        tree = tp.parse_string(xml)
+        start = time.perf_counter()
+        model_text = tp.get_prism_model_time(tree) if args.time else tp.get_prism_model(tree)
+        text_time = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            model = em.explore(tree, timed=args.time, max_states=args.max_states)
+        except em.StateSpaceError as e:
+            print(f"{name:<30} {len(tree.nodes):>6} skipped: {e}")
+            continue
+        except ValueError as e:
+            # an invalid model must be invalid for both
+            try:
+                interpret(model_text)
+                print(f"{name:<30} FAIL: only the explicit model is invalid: {e}")
+                failures += 1
+            except ValueError:
+                print(f"{name:<30} {len(tree.nodes):>6} skipped: {e}")
+            continue
+        explore_time = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as workdir:
+            basename = os.path.join(workdir, "model")
+            start = time.perf_counter()
+            model.write(basename)
+            write_time = time.perf_counter() - start
+
+            check = "-"
+            if model.size <= args.check_limit:
+                differences = compare(interpret(model_text), explicit_view(model))
+                check = "FAIL" if differences else "ok"
+                if differences:
+                    failures += 1
+                    print(f"{name:<30} FAIL: {'; '.join(differences)}")
+            line = (f"{name:<30} {len(tree.nodes):>6} {model.size:>9} {text_time * 1000:6.1f}ms "
+                    f"{explore_time * 1000:6.1f}ms {write_time * 1000:6.1f}ms {check:>6}")
+
+            if args.prism:
+                model_path = os.path.join(workdir, "model.prism")
+                props_path = os.path.join(workdir, "properties.props")
+                tp.save_prism_model(model_text, model_path)
+                with open(props_path, "w") as f:
+                    f.write(properties)
+                try:
+                    text_stdout, text_wall = run_prism(args.prism, [model_path, props_path])
+                    files_stdout, files_wall = run_prism(args.prism, model.import_args(basename) + [props_path])
+                except RuntimeError as e:
+                    print(f"{line} {e}")
+                    failures += 1
+                    continue
+                same = parse_property_results(text_stdout, names) == parse_property_results(files_stdout, names)
+                built = parse_statistics(text_stdout).get("states"), parse_statistics(files_stdout).get("states")
+                if not same or built[0] != built[1]:
+                    failures += 1
+                line += (f" {text_wall:10.2f}s {files_wall + explore_time + write_time:11.2f}s "
+                         f"{'same' if same and built[0] == built[1] else 'DIFFER':>8}")
+            print(line)
+
+    if not args.prism:
+        print("\nPRISM not given: the state spaces were compared, not the model checking results")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
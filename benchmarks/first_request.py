@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+from load_test import analyse, multipart
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# the previous command of the image, without preload and warm-up, and the production profile,
+# whose traffic waits for /ready as behind a load balancer
+PROFILES = {
+    "plain": (lambda bind: ["gunicorn", "--chdir", os.path.join(ROOT, "server"), "-k", "gthread",
+                            "--threads", "64", "-b", bind, "server:app"], False),
+    "preloaded": (lambda bind: ["gunicorn", "-c", os.path.join(ROOT, "server", "gunicorn.conf.py")], True),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def ready(url):
+    try:
+        with urllib.request.urlopen(f"{url}/ready", timeout=1) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def run_profile(profile, body, content_type, requests, factor, timeout):
+    """
+    Starts the server with a profile and sends analyses one after the other from the
+    launch (from /ready if the profile has the probe), then finds the first request as
+    fast as the steady state.
+
+    Args:
+        profile (str): The name of the profile in PROFILES.
+        body (bytes): The body of /receive_xml.
+        content_type (str): Its content type.
+        requests (int): The requests sent after the first successful one, for the steady state.
+        factor (float): A request is fast when its latency is within factor times the steady state.
+        timeout (float): The timeout of the start, in seconds.
+
+    Returns:
+        dict: The time to the first answer, to /ready and to the first fast request
+            (seconds from the launch), the latency of the first answer and the steady state.
+    """
+    bind = f"127.0.0.1:{free_port()}"
+    url = f"http://{bind}"
+    command, probe = PROFILES[profile]
+    # no speculative prunes, which would load the server, and no result cache, which would
+    # answer the repeated analysis without PRISM
+    env = dict(os.environ, SERVER_BIND=bind, SPECULATIVE_PRUNES="0", RESULT_CACHE_BYTES="0")
+    launch = time.perf_counter()
+    process = subprocess.Popen(command(bind), env=env, cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        results, ready_at = [], None
+        while len(results) <= requests:
+            if time.perf_counter() - launch > timeout:
+                raise TimeoutError(f"{profile}: no answer within {timeout} s")
+            if probe and ready_at is None:
+                if not ready(url):
+                    time.sleep(0.05)
+                    continue
+                ready_at = time.perf_counter() - launch
+            sent = time.perf_counter() - launch
+            result = analyse(url, body, content_type, timeout)
+            if result["status"] is None:
+                time.sleep(0.05)
+                continue
+            if result["status"] != 200:
+                raise RuntimeError(f"{profile}: HTTP {result['status']}")
+            results.append(dict(result, sent=sent, done=time.perf_counter() - launch))
+    finally:
+        process.terminate()
+        process.wait()
+
+    steady = statistics.median(r["latency"] for r in results[len(results) // 2:])
+    fast = next(r for r in results if r["latency"] <= factor * steady)
+    return {
+        "profile": profile,
+        "first_answer": results[0]["done"],
+        "first_latency": results[0]["latency"],
+        "ready": ready_at,
+        "first_fast": fast["done"],
+        "steady_latency": steady
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time to the first fast request after the start of the analysis server, with the plain '
+                    'gunicorn command and with the preloaded profile (server/gunicorn.conf.py). Set DATABASE_URL, '
+                    'and PRISM_PATH to benchmarks/stub_prism.py (with a small STUB_PRISM_TIME) to leave PRISM out.')
+    parser.add_argument('--input', '-i', type=str, required=True, help='XML file to analyse')
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES), help='Profiles to start')
+    parser.add_argument('--runs', type=int, default=3, help='Starts of every profile')
+    parser.add_argument('--requests', '-n', type=int, default=10, help='Requests after the first answer')
+    parser.add_argument('--factor', type=float, default=1.5, help='Latency within factor times the steady state is fast')
+    parser.add_argument('--timeout', type=float, default=120, help='Timeout of a start in seconds')
+    parser.add_argument('--output', '-o', type=str, help='Path to the JSON results')
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f:
+        body, content_type = multipart({}, {"file": (os.path.basename(args.input), f.read())})
+
+    runs = []
+    print(f"{'profile':>10} {'first answer':>13} {'latency':>8} {'ready':>7} {'first fast':>11} {'steady':>7}")
+    for profile in args.profiles:
+        for _ in range(args.runs):
+            run = run_profile(profile, body, content_type, args.requests, args.factor, args.timeout)
+            runs.append(run)
+            ready_text = f"{run['ready']:6.2f}s" if run["ready"] is not None else f"{'-':>7}"
+            print(f"{profile:>10} {run['first_answer']:12.2f}s {run['first_latency']:7.3f}s {ready_text} "
+                  f"{run['first_fast']:10.2f}s {run['steady_latency']:6.3f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"input": args.input, "runs": runs}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import os
+import random
+from collections import deque
+from xml.sax.saxutils import escape
+
+
+def generate_tree(depth=4, branching=3, conjunctive_ratio=0.3, defender_ratio=0.3,
+                  time_range=(1, 10), cost_range=(1, 50), max_nodes=None, seed=0):
+    """
+    Generates a random attack-defense tree in the ADTool XML format.
+
+    The goal is refined into attacker actions, whose preconditions are attacker
+    attributes, refined again into actions down to `depth` attribute levels; the
+    attributes of the last level are the initial attributes. Attributes are countered
+    by defender actions with probability `defender_ratio`, and defender actions may
+    require a defender attribute enabled by another defender action.
+
+    Args:
+        depth (int): The number of attribute levels below the goal.
+        branching (int): The maximum number of children of a node.
+        conjunctive_ratio (float): The probability of an attribute being conjunctive.
+        defender_ratio (float): The probability of an attribute having a countermeasure.
+        time_range (tuple): The inclusive range of the action times.
+        cost_range (tuple): The inclusive range of the action costs.
+        max_nodes (int): The maximum number of nodes, or None.
+        seed (int): The random seed.
+
+    Returns:
+        str: The XML content.
+    """
+    r = random.Random(seed)
+    count = 0
+
+    def new_node(kind, role, level):
+        nonlocal count
+        count += 1
+        node = {"children": [], "level": level, "kind": kind, "role": role, "id": count,
+                "refinement": "disjunctive", "comment": f"Type: {kind}"}
+        if kind == "Attribute" and r.random() < conjunctive_ratio:
+            node["refinement"] = "conjunctive"
+        if kind == "Action":
+            node["label"] = f"{role}Action{count}"
+            node["comment"] += (f"\nAction: {role.lower()}action{count}"
+                                f"\nCost: {r.randint(*cost_range)}\nTime: {r.randint(*time_range)}")
+        else:
+            node["label"] = "Goal" if kind == "Goal" else f"{role}Attribute{count}"
+        node["comment"] += f"\nRole: {role}"
+        return node
+
+    def full():
+        return max_nodes is not None and count >= max_nodes
+
+    root = new_node("Goal", "Attacker", 0)
+    queue = deque([root])
+    while queue and not full():
+        node = queue.popleft()
+        if node["kind"] in ("Goal", "Attribute") and node["role"] == "Attacker":
+            if node["level"] < depth or node["kind"] == "Goal":
+                # a conjunction needs at least two actions
+                low = 2 if node["refinement"] == "conjunctive" else 1
+                for _ in range(r.randint(low, max(low, branching))):
+                    if full():
+                        break
+                    child = new_node("Action", "Attacker", node["level"])
+                    node["children"].append(child)
+                    queue.append(child)
+            if node["kind"] == "Attribute" and r.random() < defender_ratio and not full():
+                child = new_node("Action", "Defender", node["level"])
+                node["children"].append(child)
+                queue.append(child)
+        elif node["kind"] == "Action" and node["role"] == "Attacker":
+            for _ in range(r.randint(1, branching)):
+                if full():
+                    break
+                child = new_node("Attribute", "Attacker", node["level"] + 1)
+                node["children"].append(child)
+                queue.append(child)
+        elif node["kind"] == "Action" and node["role"] == "Defender" and r.random() < defender_ratio:
+            attribute = new_node("Attribute", "Defender", node["level"])
+            node["children"].append(attribute)
+            if not full():
+                attribute["children"].append(new_node("Action", "Defender", node["level"]))
+
+    # render iteratively, so that deep trees do not hit the recursion limit
+    parts = ["<?xml version='1.0'?>\n<adtree>\n"]
+    stack = [(root, False, root["role"])]
+    while stack:
+        node, closing, parent_role = stack.pop()
+        if closing:
+            parts.append("</node>\n")
+            continue
+        # a conjunction cut short by max_nodes, or with only a countermeasure, is a disjunction
+        if node["refinement"] == "conjunctive" and len(node["children"]) == 1:
+            node["refinement"] = "disjunctive"
+        # ADTool marks the nodes whose role differs from their parent's
+        switch = ' switchRole="yes"' if node["role"] != parent_role else ""
+        parts.append(f'<node refinement="{node["refinement"]}"{switch}>'
+                     f'<label>{escape(node["label"])}</label>'
+                     f'<comment>{escape(node["comment"])}</comment>\n')
+        stack.append((node, True, parent_role))
+        for child in reversed(node["children"]):
+            stack.append((child, False, node["role"]))
+    parts.append("</adtree>\n")
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic attack-defense trees in the ADTool format')
+    parser.add_argument('--output', '-o', type=str, required=True, help='Output directory')
+    parser.add_argument('--count', '-n', type=int, default=10, help='Number of trees')
+    parser.add_argument('--depth', '-d', type=int, default=4, help='Number of attribute levels')
+    parser.add_argument('--branching', '-b', type=int, default=3, help='Maximum number of children of a node')
+    parser.add_argument('--conjunctive-ratio', type=float, default=0.3, help='Probability of a conjunctive attribute')
+    parser.add_argument('--defender-ratio', type=float, default=0.3, help='Probability of a countered attribute')
+    parser.add_argument('--time-range', type=int, nargs=2, default=[1, 10], help='Range of the action times')
+    parser.add_argument('--cost-range', type=int, nargs=2, default=[1, 50], help='Range of the action costs')
+    parser.add_argument('--max-nodes', type=int, help='Maximum number of nodes of a tree')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the first tree')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    for i in range(args.count):
+        xml = generate_tree(args.depth, args.branching, args.conjunctive_ratio, args.defender_ratio,
+                            tuple(args.time_range), tuple(args.cost_range), args.max_nodes, args.seed + i)
+        with open(os.path.join(args.output, f"tree_{args.seed + i}.xml"), "w") as f:
+            f.write(xml)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def multipart(fields, files):
+    """
+    Encodes a multipart/form-data body.
+
+    Args:
+        fields (dict): The form fields.
+        files (dict): Maps the file fields to (file name, content bytes).
+
+    Returns:
+        tuple: The body and its content type.
+    """
+    boundary = uuid.uuid4().hex
+    body = b""
+    for name, value in fields.items():
+        body += f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    for name, (filename, content) in files.items():
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/xml\r\n\r\n').encode() + content + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def analyse(url, body, content_type, timeout):
+    """
+    Sends one analysis request.
+
+    Returns:
+        dict: The latency, the HTTP status (None if the connection failed) and the
+            PRISM wall time reported by the server.
+    """
+    request = urllib.request.Request(f"{url}/receive_xml", data=body, headers={"Content-Type": content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    except (urllib.error.URLError, OSError) as e:
+        return {"latency": time.perf_counter() - start, "status": None, "error": str(e)}
+    result = {"latency": time.perf_counter() - start, "status": status}
+    try:
+        result["prism_time"] = json.loads(payload).get("usage", {}).get("wall_time")
+    except (ValueError, AttributeError):
+        pass
+    return result
+
+
+def run_level(url, body, content_type, concurrency, requests, timeout):
+    """
+    Sends the requests from concurrency clients at once.
+
+    Returns:
+        dict: The throughput, the latency percentiles, the failures and the average
+            number of PRISM executions in progress on the server.
+    """
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def client(_):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        try:
+            return analyse(url, body, content_type, timeout)
+        finally:
+            with lock:
+                in_flight -= 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(client, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["status"] == 200]
+    latencies = sorted(r["latency"] for r in ok) or [float("nan")]
+    prism_time = sum(r.get("prism_time") or 0 for r in ok)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "errors": sorted({r.get("error") or f"HTTP {r['status']}" for r in results if r["status"] != 200}),
+        "elapsed": elapsed,
+        "throughput": len(ok) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        # PRISM in esecuzione in media sul server: la capacità effettiva
+        "parallel_prism": prism_time / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Load test of the analysis server. Start the server with PRISM_PATH pointing to '
+                    'benchmarks/stub_prism.py (and STUB_PRISM_TIME, PRISM_CONCURRENCY as needed), e.g. '
+                    'PRISM_PATH=$PWD/benchmarks/stub_prism.py gunicorn -k gthread --threads 64 --chdir server server:app')
+    parser.add_argument('--url', type=str, default='http://localhost:5002', help='URL of the analysis server')
+    parser.add_argument('--input', '-i', type=str, required=True, help='XML file to analyse')
+    parser.add_argument('--concurrency', '-c', type=int, nargs='+', default=[1, 8, 32, 64], help='Numbers of concurrent clients')
+    parser.add_argument('--requests', '-n', type=int, default=2, help='Requests per client at each level')
+    parser.add_argument('--timeout', type=float, default=120, help='Timeout of a request in seconds')
+    parser.add_argument('--output', '-o', type=str, help='Path to the JSON results')
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f:
+        body, content_type = multipart({}, {"file": (os.path.basename(args.input), f.read())})
+
+    levels = []
+    print(f"{'clients':>8} {'ok':>5} {'failed':>7} {'req/s':>8} {'p50 [s]':>8} {'p95 [s]':>8} {'PRISM in parallel':>18}")
+    for concurrency in args.concurrency:
+        level = run_level(args.url, body, content_type, concurrency, concurrency * args.requests, args.timeout)
+        levels.append(level)
+        print(f"{concurrency:>8} {level['ok']:>5} {level['failed']:>7} {level['throughput']:>8.2f} "
+              f"{level['p50']:>8.2f} {level['p95']:>8.2f} {level['parallel_prism']:>18.1f}"
+              + (f"  {', '.join(level['errors'])}" if level['errors'] else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "input": args.input, "levels": levels}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    sys.exit(1 if any(level["failed"] for level in levels) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../PANACEA')))
+import tree_to_prism as tp
+from generator import generate_tree
+
+
+def measure(label, function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<20} {elapsed * 1000:10.1f} ms {current / 2**20:10.2f} MiB {peak / 2**20:10.2f} MiB peak")
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory used by parsed trees')
+    parser.add_argument('--nodes', '-n', type=int, default=100000, help='Number of nodes of the synthetic tree')
+    parser.add_argument('--input', '-i', type=str, help='XML file to measure instead of the synthetic tree')
+    args = parser.parse_args()
+
+    if args.input:
+        file = args.input
+    else:
+        file = os.path.join(tempfile.mkdtemp(), "synthetic.xml")
+        with open(file, "w") as f:
+            f.write(generate_tree(depth=64, branching=4, max_nodes=args.nodes))
+
+    print(f"{'stage':<20} {'time':>13} {'retained':>14} {'':>14}")
+    tree, retained = measure("parse_file", lambda: tp.parse_file(file))
+    measure("index", tree.index)
+    measure("get_info", lambda: tp.get_info(tree))
+    print(f"\n{len(tree.nodes)} nodes, {len(tree.symbols)} interned strings, "
+          f"{retained / len(tree.nodes):.0f} bytes per node retained by the tree")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'PANACEA'))
+sys.path.append(os.path.join(ROOT, 'server'))
+import tree_to_prism as tp
+from generator import generate_tree
+from modules.json2xml_pruner import prune_tree
+from modules.txt2json_parser import extract_policy
+from modules.xml2json_parser import parse_tree
+
+# stands in for PRISM in the endpoint benchmarks: writes the outputs of a short path
+STUB_PRISM = """#!{python}
+import sys
+args = sys.argv[1:]
+def output(option, offset=1):
+    return args[args.index(option) + offset] if option in args else None
+print("States:      1 (1 initial)")
+print("Result: 0.0 (value in the initial state)")
+if output("-simpath"):
+    with open(output("-simpath", 2), "w") as f:
+        f.write("action step sched\\n- 0 1\\n[a] 1 2\\n")
+if output("-exportresults"):
+    with open(output("-exportresults").rsplit(":", 1)[0], "w") as f:
+        f.write("Result\\n0.0\\n")
+if output("-exportstrat"):
+    with open(output("-exportstrat"), "w") as f:
+        f.write("digraph S {{\\n}}\\n")
+"""
+
+
+def measure(function, repeat):
+    """
+    Runs a function several times.
+
+    Returns:
+        dict: The best and mean wall times in seconds, and the number of runs.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "mean": statistics.mean(times), "repeat": repeat}
+
+
+def simulated_path(tree):
+    """Builds a PRISM -simpath output with one step per action of the tree."""
+    actions = [node.action for node in tree.nodes if node.action]
+    lines = ["action step sched " + " ".join(node.label for node in tree.nodes[:20])]
+    for step, action in enumerate(actions):
+        values = " ".join(str(i % 3) for i in range(min(20, len(tree.nodes))))
+        lines.append(f"[{action}] {step} {step % 2 + 1} {values}")
+    return "\n".join(lines) + "\n"
+
+
+def stages(xml_content, path):
+    """
+    Returns the stages of the pipeline to benchmark for one tree.
+
+    Returns:
+        list: A list of (name, function) tuples.
+    """
+    tree = tp.parse_file(path)
+    json_tree = parse_tree(xml_content)
+    # hide every defender countermeasure, as the UI does
+    for node in json_tree["tree"]["nodes"]:
+        node["hidden"] = node.get("role") == "Defender"
+    txt_content = simulated_path(tree)
+
+    result = [
+        ("parse_file", lambda: tp.parse_file(path)),
+        ("get_info", lambda: tp.get_info(tree)),
+        ("get_prism_model", lambda: tp.get_prism_model(tree)),
+        ("get_prism_model_time", lambda: tp.get_prism_model_time(tree)),
+        ("parse_tree", lambda: parse_tree(xml_content)),
+        ("prune_tree", lambda: prune_tree(json_tree, xml_content)),
+        ("extract_policy", lambda: extract_policy(txt_content)),
+    ]
+    try:
+        import pandas  # noqa: F401
+        result.insert(1, ("to_dataframe", tree.to_dataframe))
+    except ImportError:
+        pass
+    return result
+
+
+def endpoint_stages(files, workdir):
+    """
+    Returns the Flask endpoint stages, with PRISM replaced by a stub.
+
+    The database given by DATABASE_URL is used; the stages are skipped if it is not
+    reachable.
+
+    Returns:
+        list: A list of (name, path, function) tuples, one per file and endpoint.
+    """
+    stub = os.path.join(workdir, "prism")
+    with open(stub, "w") as f:
+        f.write(STUB_PRISM.format(python=sys.executable))
+    os.chmod(stub, 0o755)
+
+    import server
+    import modules.panacea_script as panacea_script
+    panacea_script.PRISM_PATH = stub
+    panacea_script.PROPS_PATH = os.path.join(ROOT, "PANACEA", "properties.props")
+
+    try:
+        with server.app.app_context():
+            server.db.create_all()
+    except Exception as e:
+        print(f"Skipping the endpoint benchmarks: {e}", file=sys.stderr)
+        return []
+
+    client = server.app.test_client()
+    result = []
+    for path in files:
+        name = os.path.basename(path)
+        with open(path, "rb") as f:
+            content = f.read()
+
+        def receive_xml(content=content, name=name):
+            response = client.post("/receive_xml", data={"file": (io.BytesIO(content), name)},
+                                   content_type="multipart/form-data")
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json())
+            return response.get_json()
+
+        body = parse_tree(content.decode("utf-8"))
+        body.update({"tree_id": receive_xml()["tree_json_id"], "file_name": name})
+
+        def receive_json(body=body):
+            response = client.post("/receive_json", json=body)
+            if response.status_code != 200:
+                raise RuntimeError(response.get_json())
+
+        result.append(("POST /receive_xml", path, receive_xml))
+        result.append(("POST /receive_json", path, receive_json))
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every stage of the analysis pipeline on synthetic trees')
+    parser.add_argument('inputs', nargs='*', help='XML files to add to the synthetic corpus')
+    parser.add_argument('--count', '-n', type=int, default=3, help='Number of synthetic trees per size')
+    parser.add_argument('--sizes', type=str, nargs='+', default=['3x2', '4x3', '6x3'], help='Synthetic tree sizes as DEPTHxBRANCHING')
+    parser.add_argument('--conjunctive-ratio', type=float, default=0.3, help='Probability of a conjunctive attribute')
+    parser.add_argument('--defender-ratio', type=float, default=0.3, help='Probability of a countered attribute')
+    parser.add_argument('--max-nodes', type=int, default=20000, help='Maximum number of nodes of a synthetic tree')
+    parser.add_argument('--repeat', '-r', type=int, default=5, help='Number of runs of every stage')
+    parser.add_argument('--endpoints', action='store_true', help='Also benchmark the Flask endpoints with a stubbed PRISM (uses DATABASE_URL)')
+    parser.add_argument('--output', '-o', type=str, help='Path to the JSON results (defaults to benchmarks/results/pipeline_<timestamp>.json)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    files = list(args.inputs)
+    for size in args.sizes:
+        depth, branching = (int(v) for v in size.split("x"))
+        for seed in range(args.count):
+            path = os.path.join(workdir, f"tree_{size}_{seed}.xml")
+            with open(path, "w") as f:
+                f.write(generate_tree(depth, branching, args.conjunctive_ratio, args.defender_ratio,
+                                      max_nodes=args.max_nodes, seed=seed))
+            files.append(path)
+
+    results = []
+    for path in files:
+        with open(path) as f:
+            xml_content = f.read()
+        nodes = len(tp.parse_file(path).nodes)
+        for name, function in stages(xml_content, path):
+            results.append(dict(measure(function, args.repeat), stage=name, tree=os.path.basename(path), nodes=nodes))
+            print(f"{name:<22} {os.path.basename(path):<24} {nodes:>7} nodes {results[-1]['best'] * 1000:10.2f} ms")
+
+    if args.endpoints:
+        for name, path, function in endpoint_stages(files, workdir):
+            results.append(dict(measure(function, args.repeat), stage=name, tree=os.path.basename(path)))
+            print(f"{name:<22} {os.path.basename(path):<24} {results[-1]['best'] * 1000:16.2f} ms")
+
+    timestamp = datetime.now()
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"pipeline_{timestamp:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "timestamp": timestamp.isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": vars(args),
+            "results": results
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'PANACEA'))
+sys.path.append(os.path.join(ROOT, 'server'))
+import tree_to_prism as tp
+from generator import generate_tree
+from modules import prism_settings
+from modules.prism2json_parser import parse_statistics
+
+DEFAULT_PRISM = os.getenv('PRISM_PATH', '/app/PANACEA/prism-games-3.2.1-linux64-x86/bin/prism')
+
+
+def run(prism, model_path, props_path, settings, timeout):
+    """
+    Checks a model with the given settings.
+
+    Returns:
+        dict: The wall time, the PRISM statistics and the error, if any.
+    """
+    start = time.perf_counter()
+    try:
+        process = subprocess.run([prism, model_path, props_path, "-prop", "1"] + settings.to_args(),
+                                 capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"wall_time": timeout, "error": "timeout"}
+    result = {"wall_time": time.perf_counter() - start, "statistics": parse_statistics(process.stdout)}
+    if process.returncode != 0 or "Error:" in process.stdout:
+        result["error"] = next((line for line in process.stdout.splitlines() if line.startswith("Error")),
+                               f"exit code {process.returncode}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the PRISM engines and solution methods on synthetic trees')
+    parser.add_argument('inputs', nargs='*', help='XML files to add to the synthetic corpus')
+    parser.add_argument('--prism', type=str, default=DEFAULT_PRISM, help='Path to the PRISM executable')
+    parser.add_argument('--props', type=str, default=os.path.join(ROOT, 'PANACEA', 'properties.props'), help='Path to the properties file')
+    parser.add_argument('--count', '-n', type=int, default=2, help='Number of synthetic trees per size')
+    parser.add_argument('--sizes', type=str, nargs='+', default=['2x2', '3x2', '3x3', '4x3'], help='Synthetic tree sizes as DEPTHxBRANCHING')
+    parser.add_argument('--max-nodes', type=int, default=2000, help='Maximum number of nodes of a synthetic tree')
+    parser.add_argument('--engines', type=str, nargs='+', default=list(prism_settings.ENGINES), help='Engines to compare')
+    parser.add_argument('--methods', type=str, nargs='+', default=['valiter', 'gaussseidel', 'politer'], help='Solution methods to compare')
+    parser.add_argument('--epsilon', type=float, help='Convergence epsilon of every run')
+    parser.add_argument('--javamaxmem', type=str, default='2g', help='JVM heap of every run')
+    parser.add_argument('--timeout', type=float, default=300, help='Timeout of a PRISM run in seconds')
+    parser.add_argument('--output', '-o', type=str, help='Path to the JSON results (defaults to benchmarks/results/prism_settings_<timestamp>.json)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    files = list(args.inputs)
+    for size in args.sizes:
+        depth, branching = (int(v) for v in size.split("x"))
+        for seed in range(args.count):
+            path = os.path.join(workdir, f"tree_{size}_{seed}.xml")
+            with open(path, "w") as f:
+                f.write(generate_tree(depth, branching, max_nodes=args.max_nodes, seed=seed))
+            files.append(path)
+
+    results = []
+    for path in files:
+        tree = tp.parse_file(path)
+        model_path = os.path.join(workdir, os.path.basename(path) + ".prism")
+        tp.save_prism_model(tp.get_prism_model(tree), model_path)
+        heuristic = prism_settings.PrismSettings(**prism_settings.heuristics(len(tree.nodes)))
+
+        runs = []
+        for engine, method in itertools.product(args.engines, args.methods):
+            settings = prism_settings.PrismSettings(engine, method, args.epsilon, None, args.javamaxmem)
+            result = dict(run(args.prism, model_path, args.props, settings, args.timeout),
+                          tree=os.path.basename(path), nodes=len(tree.nodes), settings=settings.to_dict())
+            runs.append(result)
+            states = result.get("statistics", {}).get("states", "?")
+            status = result.get("error", "")
+            print(f"{os.path.basename(path):<20} {len(tree.nodes):>6} nodes {states:>10} states "
+                  f"{engine:<9} {method:<12} {result['wall_time']:9.2f} s {status}")
+
+        # La scelta delle euristiche rispetto alla più veloce
+        valid = [r for r in runs if "error" not in r]
+        if valid:
+            fastest = min(valid, key=lambda r: r["wall_time"])
+            chosen = next((r for r in valid if r["settings"]["engine"] == heuristic.engine
+                           and r["settings"]["method"] == heuristic.method), None)
+            print(f"{'':<20} fastest {fastest['settings']['engine']}/{fastest['settings']['method']}, "
+                  f"heuristic {heuristic.engine}/{heuristic.method}"
+                  + (f" ({chosen['wall_time'] / fastest['wall_time']:.2f}x the fastest)" if chosen else " (failed or not compared)"))
+        results += runs
+
+    timestamp = datetime.now()
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"prism_settings_{timestamp:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "timestamp": timestamp.isoformat(timespec="seconds"),
+            "prism": args.prism,
+            "parameters": vars(args),
+            "results": results
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
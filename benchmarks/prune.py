@@ -0,0 +1,64 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../PANACEA')))
+import tree_to_prism as tp
+from generator import generate_tree
+
+
+def check(tree, targets):
+    """
+    Checks that the prune of several targets is the union of their single prunes.
+
+    Returns:
+        bool: Whether the nodes and edges match.
+    """
+    pruned = tree.prune(*targets)
+    labels = set()
+    edges = set()
+    for target in targets:
+        single = tree.prune(target)
+        labels |= {node.label for node in single.nodes}
+        edges |= set(single.edges)
+    return [node.label for node in pruned.nodes] == [node.label for node in tree.ancestry()[0] if node.label in labels] \
+        and set(pruned.edges) == edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the multi-target prune on synthetic trees')
+    parser.add_argument('--sizes', type=str, nargs='+', default=['4x4', '5x5', '6x5'], help='Synthetic tree sizes as DEPTHxBRANCHING')
+    parser.add_argument('--max-nodes', type=int, default=50000, help='Maximum number of nodes of a synthetic tree')
+    parser.add_argument('--targets', type=int, nargs='+', default=[1, 10, 100], help='Numbers of subtree roots to keep')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the target choice')
+    args = parser.parse_args()
+
+    r = random.Random(args.seed)
+    print(f"{'tree':<8} {'nodes':>7} {'index':>9} {'targets':>8} {'kept':>7} {'one prune':>10} {'per target':>11}")
+    for size in args.sizes:
+        depth, branching = (int(v) for v in size.split("x"))
+        tree = tp.parse_string(generate_tree(depth, branching, max_nodes=args.max_nodes, seed=0))
+        start = time.perf_counter()
+        tree.ancestry()
+        index_time = time.perf_counter() - start
+        labels = [node.label for node in tree.nodes]
+        for count in args.targets:
+            targets = r.sample(labels, min(count, len(labels)))
+            if not check(tree, targets):
+                print(f"{size}: the prune of {count} targets is not the union of their prunes")
+                sys.exit(1)
+            start = time.perf_counter()
+            pruned = tree.prune(*targets)
+            together = time.perf_counter() - start
+            start = time.perf_counter()
+            for target in targets:
+                tree.prune(target)
+            separately = time.perf_counter() - start
+            print(f"{size:<8} {len(labels):>7} {index_time * 1000:7.1f}ms {count:>8} {len(pruned.nodes):>7} "
+                  f"{together * 1000:8.2f}ms {separately * 1000:9.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'server'))
+from modules.simulation import PathSummary, sample_strategy
+
+
+def random_strategy(states, actions, branching, seed=0):
+    """
+    Builds a random strategy in the format of parse_strategy: a layered model where
+    every state chooses among a few actions with probabilistic successors in the next
+    layers, and about a tenth of the states are deadlocks.
+
+    Returns:
+        dict: The strategy.
+    """
+    r = random.Random(seed)
+    offsets, targets, edge_actions, probabilities = [0], [], [], []
+    for s in range(states):
+        if s > 0 and (r.random() < 0.1 or s >= states - 10):
+            offsets.append(len(targets))
+            continue
+        for a in r.sample(range(actions), r.randint(1, 2)):
+            successors = [r.randrange(s + 1, min(states, s + 50)) for _ in range(branching)]
+            for t in successors:
+                targets.append(t)
+                edge_actions.append(a)
+                probabilities.append(1 / branching)
+        offsets.append(len(targets))
+    return {
+        "states": [str(s) for s in range(states)],
+        "labels": [f"{s}:({s})" for s in range(states)],
+        "actions": [f"action{a}" for a in range(actions)],
+        "offsets": offsets,
+        "targets": targets,
+        "edge_actions": edge_actions,
+        "probabilities": probabilities
+    }
+
+
+def walk(strategy, paths, max_steps, seed=0):
+    """
+    Samples the paths one at a time in Python, the naive way of summarising them.
+
+    Returns:
+        PathSummary: The summary.
+    """
+    r = random.Random(seed)
+    offsets = strategy["offsets"]
+    summary = PathSummary(max_steps)
+
+    def path():
+        s = 0
+        for _ in range(max_steps):
+            edges = range(offsets[s], offsets[s + 1])
+            if not edges:
+                return
+            chosen = sorted({strategy["edge_actions"][e] for e in edges})
+            a = r.choice(chosen)
+            edges = [e for e in edges if strategy["edge_actions"][e] == a]
+            e = r.choices(edges, [strategy["probabilities"][e] for e in edges])[0]
+            yield strategy["labels"][s].partition(":")[2], strategy["actions"][a]
+            s = strategy["targets"][e]
+
+    for _ in range(paths):
+        summary.add_path(path())
+    return summary
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    summary = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summary.to_dict(), elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the summary of simulated paths sampled from a strategy')
+    parser.add_argument('--states', type=int, default=20000, help='States of the random strategy')
+    parser.add_argument('--actions', type=int, default=40, help='Actions of the random strategy')
+    parser.add_argument('--branching', type=int, default=3, help='Successors of every action')
+    parser.add_argument('--paths', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of paths')
+    parser.add_argument('--max-steps', type=int, default=10000, help='Length bound of the paths')
+    parser.add_argument('--naive-limit', type=int, default=10000, help='Largest number of paths sampled one at a time')
+    args = parser.parse_args()
+
+    strategy = random_strategy(args.states, args.actions, args.branching)
+    print(f"{'paths':>7} {'batched':>10} {'peak':>9} {'one at a time':>14} {'peak':>9} {'mean length':>12}")
+    for paths in args.paths:
+        summary, batched, batched_peak = measure(lambda: sample_strategy(strategy, paths, args.max_steps, seed=0))
+        if paths <= args.naive_limit:
+            naive_summary, naive, naive_peak = measure(lambda: walk(strategy, paths, args.max_steps))
+            naive_text = f"{naive:13.2f}s {naive_peak / 2**20:7.1f}MB"
+            # both sample the same distribution
+            if abs(naive_summary["length"]["mean"] - summary["length"]["mean"]) > 0.2 * summary["length"]["mean"]:
+                print(f"{paths}: mean lengths differ ({summary['length']['mean']} vs {naive_summary['length']['mean']})")
+                sys.exit(1)
+        else:
+            naive_text = f"{'-':>14} {'-':>9}"
+        print(f"{paths:>7} {batched:9.2f}s {batched_peak / 2**20:7.1f}MB {naive_text} {summary['length']['mean']:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+PANACEA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../PANACEA'))
+
+# modules that must not be imported by the conversion path
+HEAVY_MODULES = ["pandas", "networkx", "matplotlib", "numpy"]
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter with `-X importtime`.
+
+    Args:
+        module (str): The name of the module to import from the PANACEA directory.
+
+    Returns:
+        list: A list of (self_us, cumulative_us, name) tuples, one per imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PANACEA_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return times
+
+
+def startup_time(args, runs):
+    """
+    Measures the best wall time of a full interpreter start running main.py.
+
+    Args:
+        args (list): The arguments of main.py.
+        runs (int): The number of runs.
+
+    Returns:
+        float: The best wall time in seconds.
+    """
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(PANACEA_DIR, "main.py")] + args,
+                       check=True, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the import time of the PANACEA conversion path and enforce a budget')
+    parser.add_argument('--module', '-m', type=str, default='tree_to_prism', help='Module to import')
+    parser.add_argument('--budget-ms', type=float, default=100, help='Budget for the cumulative import time in milliseconds')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to report')
+    parser.add_argument('--input', '-i', type=str, help='XML file to convert with main.py to time a full start')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs of main.py')
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    total_ms = next(c for _, c, name in times if name.strip() == args.module) / 1000
+    heavy = sorted({name.strip().split(".")[0] for _, _, name in times} & set(HEAVY_MODULES))
+
+    print(f"{'self [ms]':>10} {'cumul [ms]':>11}  module")
+    for self_us, cumulative_us, name in sorted(times, key=lambda t: -t[1])[:args.top]:
+        print(f"{self_us / 1000:10.2f} {cumulative_us / 1000:11.2f}  {name}")
+    print(f"\n{args.module}: {total_ms:.2f} ms (budget {args.budget_ms:.2f} ms)")
+
+    if args.input:
+        output = os.path.join(os.path.dirname(os.path.abspath(args.input)), "startup_benchmark.prism")
+        best = startup_time(["--input", args.input, "--output", output], args.runs)
+        os.remove(output)
+        print(f"main.py best of {args.runs}: {best * 1000:.2f} ms")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.2f} ms exceeds the budget of {args.budget_ms:.2f} ms")
+    if heavy:
+        failures.append(f"heavy modules imported: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
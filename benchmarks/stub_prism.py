@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+A stand-in for the PRISM executable, for the load tests of the analysis server: it
+waits STUB_PRISM_TIME seconds (default 1), as a model check would, without using the
+CPU, then prints a PRISM-like output and writes the files requested with -simpath,
+-exportresults and -exportstrat.
+
+Run the server with PRISM_PATH pointing to this file.
+"""
+import os
+import sys
+import time
+
+
+def option(args, name, offset=1):
+    return args[args.index(name) + offset] if name in args else None
+
+
+def main():
+    args = sys.argv[1:]
+    time.sleep(float(os.getenv('STUB_PRISM_TIME', '1')))
+
+    properties = []
+    if len(args) > 1 and os.path.exists(args[1]):
+        with open(args[1]) as f:
+            properties = [line.strip() for line in f if line.strip() and not line.startswith("//")]
+    print("PRISM-games\n===========\n\nVersion: 3.2.1 (stub)\n")
+    print("Time for model construction: 0.001 seconds.\n")
+    print("States:      4 (1 initial)\nTransitions: 4\nChoices:     4\n")
+    for prop in properties[:1] if "-prop" in args else properties:
+        print(f"---------------------------------------------------------------------\n\nModel checking: {prop}\n")
+        print("Value iteration (min) took 1 iterations and 0.00 seconds.\n")
+        print("Time for model checking: 0.001 seconds.\n\nResult: 1.0 (value in the initial state)\n")
+
+    path = option(args, "-simpath", 2)
+    if path:
+        with open(path, "w") as f:
+            f.write("action step sched Goal\n- 0 1 0\n[stub] 1 2 1\n")
+    results = option(args, "-exportresults")
+    if results:
+        with open(results.rsplit(":", 1)[0], "w") as f:
+            f.write("Result\n1.0\n")
+    strategy = option(args, "-exportstrat")
+    if strategy:
+        with open(strategy, "w") as f:
+            f.write('digraph S {\n0 [label="0:(1,0)"];\n1 [label="1:(2,1)"];\n0 -> 1 [label="stub"];\n}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../PANACEA')))
+import tree_to_prism as tp
+from generator import generate_tree
+
+
+def randomize(tree, seed):
+    """Assigns new costs and times to the actions of a tree, keeping its structure."""
+    r = random.Random(seed)
+    for node in tree.nodes:
+        if node.action:
+            node.cost = r.randint(1, 100)
+            node.time = r.randint(1, 20)
+
+
+def check(tree, cache, variants):
+    """
+    Checks that the templated models equal the fully generated ones.
+
+    Args:
+        tree (Tree): The tree.
+        cache (TemplateCache): The template cache.
+        variants (int): The number of cost/time assignments to check.
+
+    Returns:
+        int: The number of mismatching models.
+    """
+    mismatches = 0
+    for seed in range(variants):
+        randomize(tree, seed)
+        for full, templated in ((tp.get_prism_model, lambda t: tp.get_prism_model(t, cache)),
+                                (tp.get_prism_model_time, lambda t: tp.get_prism_model_time(t, cache))):
+            if full(tree) != templated(tree):
+                mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time the PRISM templates against full generation')
+    parser.add_argument('inputs', nargs='*', help='XML files (a synthetic tree is used if none is given)')
+    parser.add_argument('--nodes', '-n', type=int, default=2000, help='Number of nodes of the synthetic tree')
+    parser.add_argument('--variants', type=int, default=10, help='Number of cost/time assignments to check')
+    parser.add_argument('--repeat', '-r', type=int, default=5, help='Number of repetitions')
+    args = parser.parse_args()
+
+    inputs = args.inputs
+    if not inputs:
+        inputs = [os.path.join(tempfile.mkdtemp(), "synthetic.xml")]
+        with open(inputs[0], "w") as f:
+            f.write(generate_tree(depth=64, branching=4, max_nodes=args.nodes))
+
+    failed = False
+    for file in inputs:
+        tree = tp.parse_file(file)
+        cache = tp.TemplateCache()
+        mismatches = check(tree, cache, args.variants)
+        failed |= mismatches > 0
+
+        full = min(timeit.repeat(lambda: tp.get_prism_model(tree), number=1, repeat=args.repeat))
+        compile = min(timeit.repeat(lambda: tp.PrismTemplate(tree), number=1, repeat=args.repeat))
+        render = min(timeit.repeat(lambda: tp.get_prism_model(tree, cache), number=1, repeat=args.repeat))
+        print(f"{os.path.basename(file)}: {len(tree.nodes)} nodes, {mismatches} mismatches, "
+              f"full {full * 1000:.2f} ms, compile {compile * 1000:.2f} ms, templated {render * 1000:.2f} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
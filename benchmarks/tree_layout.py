@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../PANACEA')))
+import layout
+import tree_to_prism as tp
+from generator import generate_tree
+
+
+def best_time(function, runs):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def chain(depth):
+    """The children lists of a path of depth nodes, deeper than the recursion limit."""
+    return [[i + 1] for i in range(depth - 1)] + [[]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the tree layouts against Tree.hierarchy_pos on synthetic trees')
+    parser.add_argument('--sizes', type=str, nargs='+', default=['3x3', '4x4', '5x5', '6x5'], help='Synthetic tree sizes as DEPTHxBRANCHING')
+    parser.add_argument('--max-nodes', type=int, default=50000, help='Maximum number of nodes of a synthetic tree')
+    parser.add_argument('--depth', type=int, default=100000, help='Depth of the path used to check deep trees')
+    parser.add_argument('--runs', type=int, default=3, help='Number of runs of every layout')
+    args = parser.parse_args()
+
+    try:
+        import networkx  # noqa: F401
+        compare = True
+    except ImportError:
+        compare = False
+        print("networkx is not installed: hierarchy_pos is not timed")
+
+    print(f"{'tree':<8} {'nodes':>7} {'hierarchy_pos':>14} {'hierarchy':>10} {'tidy':>10}")
+    for size in args.sizes:
+        depth, branching = (int(v) for v in size.split("x"))
+        tree = tp.parse_string(generate_tree(depth, branching, max_nodes=args.max_nodes, seed=0))
+        labels, _, _ = tree.layout()
+
+        def uncached(mode):
+            tree._layouts = {}
+            return tree.layout(mode)
+
+        recursive = "-"
+        if compare:
+            graph = tree.to_graph()
+            recursive = f"{best_time(lambda: tree.hierarchy_pos(graph, tree.root.label), args.runs) * 1000:12.1f}ms"
+        print(f"{size:<8} {len(labels):>7} {recursive:>14} "
+              f"{best_time(lambda: uncached('hierarchy'), args.runs) * 1000:8.1f}ms "
+              f"{best_time(lambda: uncached('tidy'), args.runs) * 1000:8.1f}ms")
+
+    path = chain(args.depth)
+    elapsed = best_time(lambda: layout.tidy_layout(path, [0]), 1)
+    print(f"\npath of {args.depth} nodes (recursion limit {sys.getrecursionlimit()}): tidy layout in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../PANACEA')))
+import snapshot
+import tree_to_prism as tp
+from generator import generate_tree
+
+
+def best_time(function, runs):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def same(a, b):
+    """Checks that two trees have the same nodes, edges and string table."""
+    fields = lambda t: [(n.label, n.refinement, n.type, n.action, n.cost, n.time, n.role) for n in t.nodes]
+    return fields(a) == fields(b) and a.edges == b.edges and a.symbols == b.symbols
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the loading of tree snapshots against the XML parse')
+    parser.add_argument('--sizes', type=str, nargs='+', default=['3x3', '4x4', '5x5', '6x5'], help='Synthetic tree sizes as DEPTHxBRANCHING')
+    parser.add_argument('--max-nodes', type=int, default=50000, help='Maximum number of nodes of a synthetic tree')
+    parser.add_argument('--runs', type=int, default=3, help='Number of runs of every measure')
+    args = parser.parse_args()
+
+    print(f"{'tree':<8} {'nodes':>7} {'XML':>9} {'snapshot':>9} {'parse':>9} {'load':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            depth, branching = (int(v) for v in size.split("x"))
+            xml = generate_tree(depth, branching, max_nodes=args.max_nodes, seed=0)
+            file = os.path.join(workdir, f"{size}.xml")
+            with open(file, "w") as f:
+                f.write(xml)
+
+            parse_time, tree = best_time(lambda: tp.load_file(file, snapshots=False), args.runs)
+            tp.load_file(file)  # writes the snapshot
+            load_time, loaded = best_time(lambda: tp.load_file(file), args.runs)
+            if not same(tree, loaded):
+                print(f"{size}: the snapshot differs from the XML")
+                sys.exit(1)
+            print(f"{size:<8} {len(tree.nodes):>7} {len(xml) / 1e6:7.2f}MB "
+                  f"{os.path.getsize(snapshot.snapshot_path(file)) / 1e6:7.2f}MB "
+                  f"{parse_time * 1000:7.1f}ms {load_time * 1000:7.1f}ms {parse_time / load_time:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
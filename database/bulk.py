@@ -0,0 +1,140 @@
+import io
+import json
+import os
+
+from flask import jsonify, request
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db
+
+# Record inseriti per istruzione e per transazione
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '500'))
+# Limite di ?batch_size=, perché le transazioni restino limitate
+BULK_MAX_BATCH_SIZE = int(os.getenv('BULK_MAX_BATCH_SIZE', '5000'))
+
+
+def read_ndjson(stream):
+    """
+    Reads an NDJSON stream one line at a time, skipping blank lines.
+
+    Yields:
+        tuple: The line number and the decoded record, or the line number and the
+            decoding error.
+    """
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield number, None, f"Invalid JSON: {e}"
+
+
+def required(*fields):
+    """
+    Returns a record validator that checks the required fields and keeps only those.
+    """
+    def validate(record):
+        if not isinstance(record, dict):
+            raise ValueError("The record must be an object")
+        missing = [f for f in fields if record.get(f) is None]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+        return {f: record[f] for f in fields}
+    return validate
+
+
+def insert_batch(model, batch):
+    """
+    Inserts a batch of rows in one multi-row statement and one transaction. If the
+    batch fails (e.g. a foreign key violation), its rows are inserted one by one, each
+    in a savepoint, so that only the invalid records fail.
+
+    Args:
+        model (db.Model): The model of the rows.
+        batch (list): The (line number, row) pairs.
+
+    Returns:
+        tuple: The ids by line number and the errors by line number.
+    """
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    try:
+        ids = db.session.execute(statement, [row for _, row in batch]).scalars().all()
+        db.session.commit()
+        return dict(zip((number for number, _ in batch), ids)), {}
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    ids, errors = {}, {}
+    for number, row in batch:
+        try:
+            with db.session.begin_nested():
+                ids[number] = db.session.execute(statement, [row]).scalar_one()
+        except SQLAlchemyError as e:
+            errors[number] = str(getattr(e, "orig", e)).strip().splitlines()[0]
+    db.session.commit()
+    return ids, errors
+
+
+def ingest(model, validate, stream, batch_size=BULK_BATCH_SIZE):
+    """
+    Inserts the records of an NDJSON stream in batches, in bounded transactions. Invalid
+    records are reported without aborting the others; the batches committed before a
+    failure of the connection stay committed.
+
+    Args:
+        model (db.Model): The model of the records.
+        validate (callable): Converts a record into a row, raising ValueError if invalid.
+        stream (iterable): The lines of the NDJSON stream.
+        batch_size (int): The number of records per statement and transaction.
+
+    Returns:
+        dict: The number of records inserted and failed, the ids assigned (in input
+            order, with the line numbers) and the errors by line number.
+    """
+    ids, errors = {}, {}
+    batch = []
+    for number, record, error in read_ndjson(stream):
+        if error is None:
+            try:
+                batch.append((number, validate(record)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            errors[number] = error
+        if len(batch) >= batch_size:
+            inserted, failed = insert_batch(model, batch)
+            ids.update(inserted)
+            errors.update(failed)
+            batch = []
+    if batch:
+        inserted, failed = insert_batch(model, batch)
+        ids.update(inserted)
+        errors.update(failed)
+
+    return {
+        "inserted": len(ids),
+        "failed": len(errors),
+        "ids": [{"line": number, "id": ids[number]} for number in sorted(ids)],
+        "errors": [{"line": number, "error": errors[number]} for number in sorted(errors)]
+    }
+
+
+def bulk_response(model, validate):
+    """
+    Ingests the NDJSON body of the current request, see ingest.
+
+    Returns:
+        A JSON response with the ids and the errors: 200 if every record was inserted,
+        207 if some failed, 400 if ?batch_size= is not an integer in 1..BULK_MAX_BATCH_SIZE.
+    """
+    batch_size = request.args.get("batch_size", str(BULK_BATCH_SIZE))
+    if not batch_size.isdigit() or not 1 <= int(batch_size) <= BULK_MAX_BATCH_SIZE:
+        return jsonify({"error": f"batch_size must be an integer between 1 and {BULK_MAX_BATCH_SIZE}"}), 400
+
+    # Lo stream della richiesta non è bufferizzato: senza buffer ogni riga verrebbe letta byte per byte
+    lines = io.TextIOWrapper(io.BufferedReader(request.stream, 1 << 16), encoding="utf-8", errors="replace")
+    report = ingest(model, validate, lines, int(batch_size))
+    return jsonify(report), 207 if report["failed"] else 200
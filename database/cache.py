@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, make_response, request
+
+# Dimensione massima delle risposte in cache, in byte, per processo
+RESPONSE_CACHE_BYTES = int(os.getenv('RESPONSE_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+# I record non vengono mai modificati dopo la creazione
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Le risposte che dipendono da relazioni modificabili (es. la lineage di TreePolicy) vanno rivalidate con l'ETag
+REVALIDATE = "no-cache"
+
+
+class ResponseCache:
+    """
+    A least recently used cache of serialized responses, bounded by the total size of
+    the bodies. Thread-safe.
+
+    Args:
+        maxbytes (int): The maximum total size of the cached bodies.
+    """
+    def __init__(self, maxbytes=RESPONSE_CACHE_BYTES):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: The body and the ETag cached for the key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        """
+        Caches a body, evicting the least recently used ones to stay within the bound.
+        Bodies larger than the bound are not cached.
+
+        Returns:
+            str: The strong ETag of the body.
+        """
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        if len(body) > self.maxbytes:
+            return etag
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self._entries[key] = (body, etag)
+            self.size += len(body)
+            while self.size > self.maxbytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+RESPONSES = ResponseCache()
+
+
+def immutable_response(body, etag, cache_control=CACHE_CONTROL):
+    """
+    Builds the response of an immutable record: 304 Not Modified if the client already
+    has this version (If-None-Match), otherwise the body.
+
+    Args:
+        body (bytes): The JSON body.
+        etag (str): Its ETag.
+        cache_control (str): The Cache-Control header (REVALIDATE if the record may change).
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def cached_response(key, endpoint, cache_control=CACHE_CONTROL):
+    """
+    Returns the response cached for a key, calling the endpoint on a miss. Only the
+    successful responses are cached.
+
+    Args:
+        key (tuple): The key of the response, unique across the endpoints.
+        endpoint (callable): Builds the response, without arguments.
+        cache_control (str): The Cache-Control header (REVALIDATE if the record may change).
+    """
+    entry = RESPONSES.get(key)
+    if entry is None:
+        response = make_response(endpoint())
+        # Gli errori (es. 404) non vengono messi in cache: il record potrebbe essere creato dopo
+        if response.status_code != 200:
+            return response
+        body = response.get_data()
+        entry = (body, RESPONSES.put(key, body))
+    return immutable_response(*entry, cache_control=cache_control)
+
+
+def cached(kind):
+    """
+    Caches the successful responses of an endpoint returning an immutable record, by
+    record kind, view arguments and query string. Hits skip the database read and the
+    JSON encoding.
+
+    Args:
+        kind (str): The kind of record, to separate the keys of the endpoints.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        def wrapper(**kwargs):
+            key = (kind,) + tuple(sorted(kwargs.items())) + tuple(sorted(request.args.items(multi=True)))
+            return cached_response(key, lambda: endpoint(**kwargs))
+        return wrapper
+    return decorator
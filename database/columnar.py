@@ -0,0 +1,110 @@
+import json
+
+# Campi di ogni stato della policy, oltre alle variabili di state_data
+STATE_FIELDS = ("state_id", "optimal_action")
+
+
+def policy_states(content):
+    """
+    Returns the states of a policy content, decoding the contents stored as JSON strings.
+    """
+    if isinstance(content, str):
+        content = json.loads(content)
+    return content.get("states", [])
+
+
+def state_fields(states):
+    """
+    Returns:
+        list: The fields of the states: state_id, optimal_action and the state
+            variables, in order of appearance.
+    """
+    fields = dict.fromkeys(STATE_FIELDS)
+    for state in states:
+        fields.update(dict.fromkeys(state.get("state_data", {})))
+    return list(fields)
+
+
+def state_value(state, field):
+    if field in STATE_FIELDS:
+        return state.get(field)
+    return state.get("state_data", {}).get(field)
+
+
+def parse_projection(args, states):
+    """
+    Reads the projection of a request: the comma-separated "fields" (all by default)
+    and the state_id range from "start" (included) to "stop" (excluded).
+
+    Returns:
+        tuple: The fields, start and stop (None if unbounded).
+
+    Raises:
+        ValueError: If a field is unknown or the range is not made of integers.
+    """
+    available = state_fields(states)
+    fields = [f for f in args.get("fields", "").split(",") if f] or available
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (expected some of {', '.join(available)})")
+    try:
+        start = int(args["start"]) if args.get("start") else None
+        stop = int(args["stop"]) if args.get("stop") else None
+    except ValueError:
+        raise ValueError("start and stop must be integers")
+    return fields, start, stop
+
+
+def project(states, fields, start=None, stop=None):
+    """
+    Selects some fields of the states in a state_id range, in columnar format: one list
+    of values per field, instead of one object per state repeating every key.
+
+    Args:
+        states (list): The states of a policy.
+        fields (list): The fields to keep.
+        start (int): The first state_id, or None.
+        stop (int): The state_id after the last one, or None.
+
+    Returns:
+        dict: The number of states and the columns.
+    """
+    selected = [s for s in states
+                if (start is None or s.get("state_id", 0) >= start) and (stop is None or s.get("state_id", 0) < stop)]
+    return {
+        "count": len(selected),
+        "columns": {field: [state_value(s, field) for s in selected] for field in fields}
+    }
+
+
+def diff(base_states, states):
+    """
+    Compares two policies state by state (matched by state_id), in columnar format: one
+    row per changed field, with the value in the base policy and in the new one. A
+    state present in one policy only is reported with the field "state".
+
+    Returns:
+        dict: The number of changes and the columns state_id, field, base and policy.
+    """
+    base = {s.get("state_id"): s for s in base_states}
+    new = {s.get("state_id"): s for s in states}
+    fields = state_fields(base_states + states)
+    columns = {"state_id": [], "field": [], "base": [], "policy": []}
+
+    def add(state_id, field, old, value):
+        columns["state_id"].append(state_id)
+        columns["field"].append(field)
+        columns["base"].append(old)
+        columns["policy"].append(value)
+
+    for state_id in sorted(set(base) | set(new), key=lambda i: (i is None, i)):
+        if state_id not in new:
+            add(state_id, "state", True, None)
+        elif state_id not in base:
+            add(state_id, "state", None, True)
+        else:
+            for field in fields[1:]:
+                old, value = state_value(base[state_id], field), state_value(new[state_id], field)
+                if old != value:
+                    add(state_id, field, old, value)
+    return {"count": len(columns["state_id"]), "columns": columns}
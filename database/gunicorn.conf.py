@@ -0,0 +1,38 @@
+# Profilo di produzione del servizio del database (gunicorn -c database/gunicorn.conf.py).
+# L'applicazione è caricata nel master prima del fork (le tabelle e le migrazioni una volta
+# sola); ogni worker apre poi il pool delle connessioni (vedi /ready).
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "db:app"
+bind = os.getenv('DB_BIND', '0.0.0.0:5003')
+preload_app = True
+
+worker_class = "gthread"
+workers = int(os.getenv('DB_WORKERS', '2'))
+threads = int(os.getenv('DB_THREADS', '8'))
+
+max_requests = int(os.getenv('DB_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('DB_MAX_REQUESTS_JITTER', '0'))
+MAX_RSS = os.getenv('DB_MAX_RSS', '1g')
+
+
+def when_ready(arbiter):
+    # Nel master, dopo il preload dell'applicazione e prima del fork dei worker
+    from db import WARMUP
+    WARMUP.preload()
+
+
+def post_fork(arbiter, worker):
+    from db import after_fork
+    after_fork()
+
+
+def post_worker_init(worker):
+    from db import WARMUP
+    WARMUP.start()
+
+
+def post_request(worker, req, environ, resp):
+    from warmup import parse_memory, recycle
+    recycle(worker, parse_memory(MAX_RSS))
@@ -0,0 +1,55 @@
+import json
+
+from sqlalchemy import text
+
+# Colonne aggiunte dopo la creazione delle tabelle: db.create_all() non modifica le tabelle esistenti
+MIGRATIONS = [
+    "ALTER TABLE analysis_runs ADD COLUMN IF NOT EXISTS statistics JSONB",
+    "ALTER TABLE analysis_runs ADD COLUMN IF NOT EXISTS results JSONB",
+    "ALTER TABLE analysis_runs ADD COLUMN IF NOT EXISTS strategy JSONB",
+    "ALTER TABLE analysis_runs ADD COLUMN IF NOT EXISTS settings JSONB",
+    "ALTER TABLE treesxml ADD COLUMN IF NOT EXISTS snapshot BYTEA",
+    "ALTER TABLE analysis_runs ADD COLUMN IF NOT EXISTS simulation JSONB",
+]
+
+# Tabelle in cui create_tree e create_policy salvavano il contenuto come stringa JSON dentro il JSONB
+DOUBLE_ENCODED = ["trees", "policies"]
+
+def migrate(db):
+    """
+    Applies the schema changes that db.create_all() does not, to the tables of an
+    existing database, and repairs the double-encoded contents. Every step is idempotent.
+
+    Args:
+        db (SQLAlchemy): The database, within an application context.
+    """
+    with db.engine.begin() as connection:
+        for statement in MIGRATIONS:
+            connection.execute(text(statement))
+        for table in DOUBLE_ENCODED:
+            repair_double_encoded(connection, table)
+
+def repair_double_encoded(connection, table):
+    """
+    Replaces the contents stored as JSON strings of an object or an array with the
+    decoded JSON. The other strings are left as they are, so the repair is idempotent.
+
+    Args:
+        connection (Connection): The connection, in a transaction.
+        table (str): The table, with a JSONB content column.
+
+    Returns:
+        int: The number of repaired rows.
+    """
+    rows = connection.execute(text(f"SELECT id, content #>> '{{}}' FROM {table} WHERE jsonb_typeof(content) = 'string'"))
+    repaired = []
+    for row_id, content in rows:
+        try:
+            decoded = json.loads(content)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(decoded, (dict, list)):
+            repaired.append({"id": row_id, "content": content})
+    if repaired:
+        connection.execute(text(f"UPDATE {table} SET content = CAST(:content AS JSONB) WHERE id = :id"), repaired)
+    return len(repaired)
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy import Text, ForeignKey
+from sqlalchemy import Text, ForeignKey, LargeBinary
 from sqlalchemy.orm import relationship
 
 db = SQLAlchemy()
@@ -18,6 +18,7 @@ class TreeXML(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=False, nullable=False)  # Nome del file
     content = db.Column(Text, nullable=False)  # Contenuto XML salvato come stringa
+    snapshot = db.deferred(db.Column(LargeBinary))  # Snapshot binario dell'albero analizzato (PANACEA/snapshot.py)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
@@ -40,3 +41,29 @@ class TreePolicy(db.Model):
     treexml = relationship('TreeXML', backref='tree_policies')
     policy = relationship('Policy', backref='tree_policies')
 
+
+class Sweep(db.Model):
+    __tablename__ = 'sweeps'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, unique=False, nullable=False)  # Nome dell'analisi
+    treexml_id = db.Column(db.Integer, ForeignKey('treesxml.id'), nullable=False)
+    parameters = db.Column(JSONB, nullable=False)  # Griglia delle costanti e modalità
+    content = db.Column(JSONB, nullable=False)  # Tabella dei risultati e differenze delle policy
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    treexml = relationship('TreeXML', backref='sweeps')
+
+
+class AnalysisRun(db.Model):
+    __tablename__ = 'analysis_runs'
+    id = db.Column(db.Integer, primary_key=True)
+    policy_id = db.Column(db.Integer, ForeignKey('policies.id'), nullable=False)
+    metrics = db.Column(JSONB, nullable=False)  # Tempi e risorse di ogni fase dell'analisi
+    settings = db.Column(JSONB)  # Motore e metodo di soluzione usati da PRISM
+    statistics = db.Column(JSONB)  # Statistiche di PRISM (stati, transizioni, iterazioni, tempi)
+    results = db.Column(JSONB)  # Risultati numerici esportati da PRISM
+    strategy = db.Column(JSONB)  # Strategia come lista di adiacenza compatta
+    simulation = db.Column(JSONB)  # Riepilogo dei percorsi simulati (azioni, lunghezze, azioni ottime per stato)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    policy = relationship('Policy', backref='analysis_runs')
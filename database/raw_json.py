@@ -0,0 +1,27 @@
+import json
+
+from flask import Response, jsonify
+from sqlalchemy import Text, cast
+
+from models import db
+
+
+def content_response(model, record_id, not_found):
+    """
+    Returns a record with its JSONB content as Postgres serializes it (content::text),
+    without decoding it into Python objects and encoding it again.
+
+    Args:
+        model (db.Model): The model, with id, name and a JSONB content.
+        record_id (int): The id of the record.
+        not_found (str): The error message if the record does not exist.
+
+    Returns:
+        The JSON response, with the keys in the order jsonify uses, or 404.
+    """
+    row = db.session.query(model.name, cast(model.content, Text)).filter(model.id == record_id).first()
+    if row is None:
+        return jsonify({"error": not_found}), 404
+    name, content = row
+    body = f'{{"content":{content},"id":{json.dumps(record_id)},"name":{json.dumps(name)}}}\n'
+    return Response(body, mimetype="application/json")
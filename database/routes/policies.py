@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
-from models import db, Policy
-import json
+from models import db, Policy, AnalysisRun, TreePolicy
+from cache import CACHE_CONTROL, REVALIDATE, cached, cached_response
+from columnar import diff, parse_projection, policy_states, project
+from bulk import bulk_response, required
+from raw_json import content_response
 
 policy_routes = Blueprint('policy_routes', __name__)
 
@@ -10,20 +13,88 @@ def get_policies():
     return jsonify([{"id": p.id, "name": p.name} for p in policies])
 
 @policy_routes.route('/<int:policy_id>', methods=['GET'])
+@cached("policy")
 def get_policy(policy_id):
-    policy = Policy.query.get(policy_id)
-    if not policy:
-        return jsonify({"error": "Policy not found"}), 404
-    return jsonify({"id": policy.id, "name": policy.name, "content": policy.content})
+    # Il contenuto JSONB passa come testo direttamente nella risposta
+    return content_response(Policy, policy_id, "Policy not found")
 
 @policy_routes.route('', methods=['POST'])
 def create_policy():
     data = request.json
 
-    # Serializza il contenuto in una stringa JSON
-    serialized_content = json.dumps(data['content'])
-
-    policy = Policy(name=data['name'], content=serialized_content)
+    policy = Policy(name=data['name'], content=data['content'])
     db.session.add(policy)
     db.session.commit()
     return jsonify({"message": "Policy created", "id": policy.id})
+
+@policy_routes.route('/<int:policy_id>/runs', methods=['GET'])
+def get_policy_runs(policy_id):
+    policy = Policy.query.get(policy_id)
+    if not policy:
+        return jsonify({"error": "Policy not found"}), 404
+    return jsonify([{"id": r.id, "created_at": r.created_at.isoformat(), "metrics": r.metrics,
+                     "settings": r.settings, "statistics": r.statistics, "results": r.results}
+                    for r in policy.analysis_runs])
+
+@policy_routes.route('/<int:policy_id>/strategy', methods=['GET'])
+def get_policy_strategy(policy_id):
+    # La strategia dell'ultima analisi che l'ha esportata
+    run = AnalysisRun.query.filter(AnalysisRun.policy_id == policy_id, AnalysisRun.strategy.isnot(None)) \
+        .order_by(AnalysisRun.id.desc()).first()
+    if not run:
+        return jsonify({"error": "Strategy not found"}), 404
+    return jsonify({"policy_id": policy_id, "run_id": run.id, "strategy": run.strategy})
+
+
+@policy_routes.route('/<int:policy_id>/states', methods=['GET'])
+@cached("policy_states")
+def get_policy_states(policy_id):
+    """Restituisce solo alcuni campi degli stati della policy (?fields=a,b&start=&stop=), in formato colonnare"""
+    policy = Policy.query.get(policy_id)
+    if not policy:
+        return jsonify({"error": "Policy not found"}), 404
+    states = policy_states(policy.content)
+    try:
+        fields, start, stop = parse_projection(request.args, states)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(dict(project(states, fields, start, stop), id=policy.id, name=policy.name))
+
+@policy_routes.route('/<int:policy_id>/diff', methods=['GET'])
+def get_policy_diff(policy_id):
+    """
+    Restituisce le differenze tra la policy e una policy di base (?base=<id>), in formato colonnare.
+    Di default la base è la policy precedente dello stesso albero XML, secondo TreePolicy: la lineage
+    può cambiare, quindi la base risolta fa parte della chiave e la risposta va rivalidata.
+    """
+    base_id = request.args.get("base", type=int)
+    cache_control = CACHE_CONTROL
+    if base_id is None:
+        lineage = TreePolicy.query.filter_by(policy_id=policy_id).first()
+        previous = lineage and TreePolicy.query \
+            .filter(TreePolicy.treexml_id == lineage.treexml_id, TreePolicy.policy_id < policy_id) \
+            .order_by(TreePolicy.policy_id.desc()).first()
+        if not previous:
+            if not Policy.query.get(policy_id):
+                return jsonify({"error": "Policy not found"}), 404
+            return jsonify({"error": "No previous policy for the same tree"}), 404
+        base_id = previous.policy_id
+        cache_control = REVALIDATE
+
+    def policy_diff():
+        policy = Policy.query.get(policy_id)
+        if not policy:
+            return jsonify({"error": "Policy not found"}), 404
+        base = Policy.query.get(base_id)
+        if not base:
+            return jsonify({"error": "Base policy not found"}), 404
+        return jsonify(dict(diff(policy_states(base.content), policy_states(policy.content)),
+                            base_id=base.id, policy_id=policy.id))
+
+    # Il corpo contiene base_id, quindi anche l'ETag cambia con la base
+    return cached_response(("policy_diff", policy_id, base_id), policy_diff, cache_control)
+
+@policy_routes.route('/bulk', methods=['POST'])
+def create_policy_bulk():
+    """Inserisce in blocco i record di uno stream NDJSON (un oggetto JSON per riga)"""
+    return bulk_response(Policy, required("name", "content"))
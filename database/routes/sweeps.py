@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify
+from models import Sweep
+from cache import cached
+
+sweep_routes = Blueprint('sweep_routes', __name__)
+
+@sweep_routes.route('', methods=['GET'])
+def get_sweeps():
+    sweeps = Sweep.query.all()
+    return jsonify([{"id": s.id, "name": s.name, "treexml_id": s.treexml_id} for s in sweeps])
+
+@sweep_routes.route('/<int:sweep_id>', methods=['GET'])
+@cached("sweep")
+def get_sweep(sweep_id):
+    sweep = Sweep.query.get(sweep_id)
+    if not sweep:
+        return jsonify({"error": "Sweep not found"}), 404
+    return jsonify({
+        "id": sweep.id,
+        "name": sweep.name,
+        "treexml_id": sweep.treexml_id,
+        "parameters": sweep.parameters,
+        "content": sweep.content
+    })
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models import db, TreePolicy, TreeJSON, TreeXML, Policy
+from bulk import bulk_response, required
 
 treepolicy_routes = Blueprint('treepolicy_routes', __name__)
 
@@ -41,3 +42,8 @@ def create_tree_policy():
     db.session.commit()
     
     return jsonify({"message": "TreePolicy created", "id": tree_policy.id})
+
+@treepolicy_routes.route('/bulk', methods=['POST'])
+def create_treepolicy_bulk():
+    """Inserisce in blocco i record di uno stream NDJSON (un oggetto JSON per riga)"""
+    return bulk_response(TreePolicy, required("tree_id", "treexml_id", "policy_id"))
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import db, TreeJSON
-import json
+from cache import cached
+from bulk import bulk_response, required
+from raw_json import content_response
 
 tree_routes = Blueprint('tree_routes', __name__)
 
@@ -10,21 +12,22 @@ def get_trees():
     return jsonify([{"id": t.id, "name": t.name} for t in trees])
 
 @tree_routes.route('/<int:tree_id>', methods=['GET'])
+@cached("tree")
 def get_tree(tree_id):
-    tree = TreeJSON.query.get(tree_id)
-    if not tree:
-        return jsonify({"error": "TreeJSON not found"}), 404
-    return jsonify({"id": tree.id, "name": tree.name, "content": tree.content})
+    # Il contenuto JSONB passa come testo direttamente nella risposta
+    return content_response(TreeJSON, tree_id, "TreeJSON not found")
 
 @tree_routes.route('', methods=['POST'])
 def create_tree():
     data = request.json
     
-    # Serializza il contenuto in una stringa JSON
-    serialized_content = json.dumps(data['content'])
-
-    tree = TreeJSON(name=data['name'], content=serialized_content)
+    tree = TreeJSON(name=data['name'], content=data['content'])
     db.session.add(tree)
     db.session.commit()
     
-    return jsonify({"message": "TreeJSON created", "id": tree.id})
\ No newline at end of file
+    return jsonify({"message": "TreeJSON created", "id": tree.id})
+
+@tree_routes.route('/bulk', methods=['POST'])
+def create_tree_bulk():
+    """Inserisce in blocco i record di uno stream NDJSON (un oggetto JSON per riga)"""
+    return bulk_response(TreeJSON, required("name", "content"))
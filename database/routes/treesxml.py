@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
-from models import db, TreeXML
+from models import db, TreeXML, TreePolicy, AnalysisRun
+from cache import cached
+from bulk import bulk_response, required
 
 treesxml_routes = Blueprint('treesxml_routes', __name__)
 
@@ -10,6 +12,7 @@ def get_treesxml():
     return jsonify([{"id": t.id, "name": t.name} for t in treesxml])
 
 @treesxml_routes.route('/<int:treexml_id>', methods=['GET'])
+@cached("treexml")
 def get_treexml(treexml_id):
     """Restituisce un singolo albero XML in base all'ID"""
     treexml = TreeXML.query.get(treexml_id)
@@ -29,3 +32,25 @@ def create_treexml():
     db.session.commit()
     
     return jsonify({"message": "Tree XML created", "id": treexml.id})
+
+
+@treesxml_routes.route('/<int:treexml_id>/statistics', methods=['GET'])
+def get_treexml_statistics(treexml_id):
+    """Restituisce le statistiche di PRISM di tutte le analisi di un albero, in ordine cronologico"""
+    if not TreeXML.query.get(treexml_id):
+        return jsonify({"error": "Tree XML not found"}), 404
+    runs = AnalysisRun.query.join(TreePolicy, TreePolicy.policy_id == AnalysisRun.policy_id) \
+        .filter(TreePolicy.treexml_id == treexml_id).order_by(AnalysisRun.created_at, AnalysisRun.id).all()
+    return jsonify([{
+        "run_id": r.id,
+        "policy_id": r.policy_id,
+        "created_at": r.created_at.isoformat(),
+        "settings": r.settings,
+        "statistics": r.statistics,
+        "total_time": r.metrics.get("total_time")
+    } for r in runs])
+
+@treesxml_routes.route('/bulk', methods=['POST'])
+def create_treesxml_bulk():
+    """Inserisce in blocco i record di uno stream NDJSON (un oggetto JSON per riga)"""
+    return bulk_response(TreeXML, required("name", "content"))
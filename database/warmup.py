@@ -0,0 +1,212 @@
+import logging
+import os
+import resource
+import threading
+import time
+
+from flask import jsonify
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+MEMORY_UNITS = {"k": 2**10, "m": 2**20, "g": 2**30}
+
+
+def parse_memory(value):
+    """Converts a memory size (e.g. 512m, 4g) to bytes; None or 0 disable the limit."""
+    value = str(value or "0").strip().lower()
+    if value[-1:] in MEMORY_UNITS:
+        return int(value[:-1]) * MEMORY_UNITS[value[-1]]
+    return int(value)
+
+
+def current_rss():
+    """Returns the resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        # Senza /proc: il picco è un limite superiore
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Warmup:
+    """
+    The warm-up of a service process, in two phases: the preload steps run once in the
+    gunicorn master before the workers are forked (imports and caches, then shared
+    copy-on-write), the worker steps in every worker after the fork (connections and
+    threads, which a fork does not carry). The readiness of the worker is the outcome
+    of its required steps.
+
+    Args:
+        name (str): The name of the service.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.preload_steps = []
+        self.worker_steps = []
+        self.preloaded = False
+        self.preload_ok = True
+        self.pid = os.getpid()
+        self.started = time.time()
+        self._reset()
+
+    def _reset(self):
+        self.state = "cold"
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def add_step(self, name, function, preload=False, required=True):
+        """
+        Adds a step. The steps run in order; a failed optional step is only reported.
+
+        Args:
+            name (str): The name of the step.
+            function (callable): The step, without arguments.
+            preload (bool): Whether the step runs before the fork.
+            required (bool): Whether the worker is not ready if the step fails.
+        """
+        (self.preload_steps if preload else self.worker_steps).append((name, function, required))
+
+    def _run_steps(self, steps):
+        ok = True
+        for name, function, required in steps:
+            start = time.perf_counter()
+            try:
+                function()
+                self.steps[name] = {"ok": True, "seconds": time.perf_counter() - start}
+            except Exception as e:
+                logging.warning(f"Warm-up step {name} failed: {e}")
+                self.steps[name] = {"ok": False, "seconds": time.perf_counter() - start, "error": str(e)}
+                ok = ok and not required
+        return ok
+
+    def preload(self):
+        """Runs the preload steps, in the master before the fork (see gunicorn.conf.py)."""
+        with self._lock:
+            if not self.preloaded:
+                self.preload_ok = self._run_steps(self.preload_steps)
+                self.preloaded = True
+
+    def after_fork(self):
+        """Resets the state in a forked worker: the preload steps are inherited."""
+        self.pid = os.getpid()
+        self.started = time.time()
+        steps = {name: dict(step, inherited=True) for name, step in self.steps.items()}
+        self._reset()
+        self.steps = steps
+
+    def run(self):
+        """
+        Runs the steps not run yet in this process.
+
+        Returns:
+            bool: Whether the process is ready.
+        """
+        with self._lock:
+            if self.state in ("warming", "ready"):
+                return self.state == "ready"
+            self.state = "warming"
+        start = time.perf_counter()
+        # Senza preload (es. python server.py) anche i passi del master sono eseguiti qui
+        if not self.preloaded:
+            self.preload_ok = self._run_steps(self.preload_steps)
+            self.preloaded = True
+        ok = self._run_steps(self.worker_steps) and self.preload_ok
+        self.state = "ready" if ok else "failed"
+        logging.info(f"{self.name} worker {self.pid} {self.state} after {time.perf_counter() - start:.2f} s of warm-up")
+        return ok
+
+    def start(self):
+        """Runs the warm-up in a background thread, so that /health answers meanwhile."""
+        threading.Thread(target=self.run, name=f"{self.name}-warmup", daemon=True).start()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def status(self):
+        """
+        Returns:
+            dict: The state of the warm-up, the timing of every step and the uptime.
+        """
+        return {
+            "service": self.name,
+            "pid": self.pid,
+            "state": self.state,
+            "uptime": time.time() - self.started,
+            "rss": current_rss(),
+            "steps": self.steps
+        }
+
+
+def open_pool(app, db, size):
+    """
+    Opens connections of the SQLAlchemy pool in advance, so that the first requests
+    do not pay the connection setup.
+
+    Args:
+        app (Flask): The application.
+        db (SQLAlchemy): Its database.
+        size (int): The number of connections, at most the pool size.
+    """
+    with app.app_context():
+        connections = [db.engine.connect() for _ in range(size)]
+        try:
+            for connection in connections:
+                connection.exec_driver_sql("SELECT 1")
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+def reset_pool(app, db):
+    """
+    Drops, without closing them, the pooled connections inherited from the master:
+    their sockets are shared with it and with the other workers.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def register(app, warmup, live=None):
+    """
+    Adds the probes of a service: GET /health (liveness: 200 while the process works,
+    even during the warm-up) and GET /ready (readiness: 200 once the warm-up succeeded,
+    503 before or if it failed).
+
+    Args:
+        app (Flask): The application.
+        warmup (Warmup): Its warm-up.
+        live (callable): Returns a dict of the liveness checks (name to bool), or None.
+    """
+    @app.route('/health', methods=['GET'])
+    def health():
+        checks = live() if live else {}
+        status = dict(warmup.status(), checks=checks)
+        return jsonify(status), 200 if all(checks.values()) else 503
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+
+def recycle(worker, max_rss):
+    """
+    Stops a gunicorn worker gracefully once its resident memory exceeds a threshold:
+    it finishes its requests and the master forks a new one from the preloaded
+    application. To be called from the post_request hook.
+
+    Args:
+        worker (Worker): The gunicorn worker.
+        max_rss (int): The threshold in bytes; 0 disables the recycling.
+    """
+    if not max_rss or not worker.alive:
+        return
+    rss = current_rss()
+    if rss > max_rss:
+        worker.log.info(f"Worker {worker.pid} uses {rss / 2**20:.0f} MiB (limit {max_rss / 2**20:.0f} MiB): recycling")
+        worker.alive = False
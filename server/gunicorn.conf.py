@@ -0,0 +1,44 @@
+# Profilo di produzione del server di analisi (gunicorn -c server/gunicorn.conf.py).
+# L'applicazione e i moduli di PANACEA sono caricati nel master prima del fork, così le
+# pagine sono condivise copy-on-write e un worker riciclato riparte già caldo; ogni worker
+# apre poi il pool delle connessioni e avvia il supervisore di PRISM (vedi /ready).
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "server:app"
+bind = os.getenv('SERVER_BIND', '0.0.0.0:5002')
+preload_app = True
+
+# Un processo con molti thread: le cache dei modelli e dei risultati sono per processo, quindi con più
+# worker i precalcoli speculativi e la cache dei risultati servono solo le richieste dello stesso worker
+# (vedi modules.result_cache.RESULTS); meglio più thread che più worker
+worker_class = "gthread"
+workers = int(os.getenv('SERVER_WORKERS', '1'))
+threads = int(os.getenv('SERVER_THREADS', '64'))
+
+# Un worker riciclato termina le analisi in corso, che durano al più PRISM_WALL_TIMEOUT
+graceful_timeout = int(float(os.getenv('SERVER_GRACEFUL_TIMEOUT', os.getenv('PRISM_WALL_TIMEOUT', '900'))))
+max_requests = int(os.getenv('SERVER_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('SERVER_MAX_REQUESTS_JITTER', '0'))
+MAX_RSS = os.getenv('SERVER_MAX_RSS', '3g')
+
+
+def when_ready(arbiter):
+    # Nel master, dopo il preload dell'applicazione e prima del fork dei worker
+    from server import WARMUP
+    WARMUP.preload()
+
+
+def post_fork(arbiter, worker):
+    from server import after_fork
+    after_fork()
+
+
+def post_worker_init(worker):
+    from server import WARMUP
+    WARMUP.start()
+
+
+def post_request(worker, req, environ, resp):
+    from database.warmup import parse_memory, recycle
+    recycle(worker, parse_memory(MAX_RSS))
@@ -0,0 +1,247 @@
+import contextvars
+import functools
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Wall time buckets of the /metrics histograms, in seconds
+BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, float("inf"))
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+# CPU times of the child processes run within the open spans of the context (see add_children_cpu)
+open_children_cpu = contextvars.ContextVar("open_children_cpu", default=())
+
+
+class Trace:
+    """
+    The spans recorded while processing one request.
+
+    Args:
+        name (str): The name of the request (e.g. the endpoint).
+    """
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "total_time": time.perf_counter() - self.start,
+            "spans": self.spans
+        }
+
+
+class Metrics:
+    """
+    Process-wide aggregates of the spans, exposed in the Prometheus text format.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, record):
+        with self.lock:
+            stage = self.stages.setdefault(record["name"], {
+                "buckets": [0] * len(BUCKETS), "count": 0, "wall": 0.0, "cpu": 0.0, "peak_rss": 0, "children_peak_rss": 0
+            })
+            stage["count"] += 1
+            stage["wall"] += record["wall_time"]
+            stage["cpu"] += record["cpu_time"] + record["children_cpu_time"]
+            stage["peak_rss"] = max(stage["peak_rss"], record["peak_rss"])
+            stage["children_peak_rss"] = max(stage["children_peak_rss"], record["children_peak_rss"] or 0)
+            for i, bound in enumerate(BUCKETS):
+                if record["wall_time"] <= bound:
+                    stage["buckets"][i] += 1
+            for key in ("model_bytes", "states"):
+                if key in record["attributes"]:
+                    self.gauges[key] = record["attributes"][key]
+
+    def increment(self, name, value=1):
+        """Increments a counter, exposed as panacea_<name>_total."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = [
+            "# HELP panacea_stage_seconds Wall time of the pipeline stages.",
+            "# TYPE panacea_stage_seconds histogram",
+        ]
+        with self.lock:
+            stages = {name: dict(stage, buckets=list(stage["buckets"])) for name, stage in self.stages.items()}
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        for name, stage in sorted(stages.items()):
+            for bound, count in zip(BUCKETS, stage["buckets"]):
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'panacea_stage_seconds_bucket{{stage="{name}",le="{le}"}} {count}')
+            lines.append(f'panacea_stage_seconds_sum{{stage="{name}"}} {stage["wall"]}')
+            lines.append(f'panacea_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        lines += ["# HELP panacea_stage_cpu_seconds_total CPU time of the pipeline stages, including child processes.",
+                  "# TYPE panacea_stage_cpu_seconds_total counter"]
+        for name, stage in sorted(stages.items()):
+            lines.append(f'panacea_stage_cpu_seconds_total{{stage="{name}"}} {stage["cpu"]}')
+        lines += ["# HELP panacea_stage_peak_rss_bytes Peak resident set size of the server process after the pipeline stages.",
+                  "# TYPE panacea_stage_peak_rss_bytes gauge"]
+        for name, stage in sorted(stages.items()):
+            lines.append(f'panacea_stage_peak_rss_bytes{{stage="{name}"}} {stage["peak_rss"]}')
+        lines += ["# HELP panacea_stage_children_peak_rss_bytes Peak resident set size of the child processes (PRISM).",
+                  "# TYPE panacea_stage_children_peak_rss_bytes gauge"]
+        for name, stage in sorted(stages.items()):
+            if stage["children_peak_rss"]:
+                lines.append(f'panacea_stage_children_peak_rss_bytes{{stage="{name}"}} {stage["children_peak_rss"]}')
+        for name, value in sorted(counters.items()):
+            lines += [f"# TYPE panacea_{name}_total counter", f"panacea_{name}_total {value}"]
+        for name, value in sorted(gauges.items()):
+            lines += [f"# TYPE panacea_last_{name} gauge", f"panacea_last_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def peak_rss():
+    """Returns the peak resident set size of this process, in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def add_children_cpu(seconds):
+    """
+    Attributes the CPU time of a child process, measured by wait4 when it is reaped (see
+    prism_runner), to the open spans of the current context. Unlike RUSAGE_CHILDREN,
+    which is process-wide, this only counts the children of the request.
+    """
+    for times in open_children_cpu.get():
+        times.append(seconds)
+
+
+def in_context(function):
+    """
+    Returns a function running in a copy of the current context, for a thread pool: the
+    child CPU time of its PRISM runs is attributed to the spans of the caller.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # one copy per call: a context cannot be entered by two threads at once
+        return context.copy().run(function, *args, **kwargs)
+    return run
+
+
+def group_rss(pgids):
+    """
+    Measures the resident set size of some process groups, in one scan of /proc.
+
+    Args:
+        pgids (set): The process group ids.
+
+    Returns:
+        dict: Maps the process group ids that have processes to their total RSS in bytes.
+    """
+    totals = {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # the fields after the command name, which may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+            pgid = int(fields[2])
+            if pgid in pgids:
+                totals[pgid] = totals.get(pgid, 0) + int(fields[21]) * resource.getpagesize()
+        except (OSError, IndexError, ValueError):
+            continue
+    return totals
+
+
+@contextmanager
+def trace(name):
+    """
+    Records the spans of a request, see span.
+
+    Args:
+        name (str): The name of the request.
+
+    Yields:
+        Trace: The trace.
+    """
+    t = Trace(name)
+    token = current_trace.set(t)
+    try:
+        yield t
+    finally:
+        current_trace.reset(token)
+        METRICS.increment("requests")
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Measures a stage of the pipeline: wall time, CPU time of this thread and of the
+    child processes it ran (see add_children_cpu), and peak RSS of this process and of
+    the children.
+
+    The record is added to the current trace, if any, and to the process metrics.
+    Attributes (e.g. model size, state count) can be added to the yielded dict.
+
+    Args:
+        name (str): The name of the stage.
+        **attributes: Initial attributes of the span.
+
+    Yields:
+        dict: The attributes of the span.
+    """
+    t = current_trace.get()
+    depth = t.depth if t else 0
+    if t:
+        t.depth += 1
+    attributes = dict(attributes)
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    children_cpu = []
+    children_token = open_children_cpu.set(open_children_cpu.get() + (children_cpu,))
+    failed = False
+    try:
+        yield attributes
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        open_children_cpu.reset(children_token)
+        record = {
+            "name": name,
+            "depth": depth,
+            "wall_time": time.perf_counter() - start_wall,
+            "cpu_time": time.thread_time() - start_cpu,
+            "children_cpu_time": sum(children_cpu),
+            "peak_rss": peak_rss(),
+            "children_peak_rss": attributes.pop("children_peak_rss", None),
+            "failed": failed,
+            "attributes": attributes
+        }
+        if t:
+            t.depth -= 1
+            t.spans.append(record)
+        METRICS.observe(record)
+
+
+def traced(name):
+    """Decorator recording every call of a function as a span."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -2,6 +2,8 @@ import json
 import xml.etree.ElementTree as ET
 import logging
 
+from modules.instrumentation import traced
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -46,9 +48,9 @@ def remove_subtrees_from_xml(xml_content, hidden_labels):
         root = tree.getroot()
 
         def should_remove(node):
-            """Checks if a node should be removed based on its label."""
+            """Checks if a node should be removed based on its label, without spaces as in the JSON tree."""
             label_element = node.find("label")
-            return label_element is not None and label_element.text in hidden_labels
+            return label_element is not None and (label_element.text or "").replace(" ", "") in hidden_labels
 
         def remove_nodes(parent):
             """Recursively removes matching nodes from the XML tree."""
@@ -68,6 +70,7 @@ def remove_subtrees_from_xml(xml_content, hidden_labels):
         logging.error(f"Failed to process XML content: {e}")
         raise
 
+@traced("prune_tree")
 def prune_tree(json_content, xml_content):
     """
     Prunes an XML tree by removing subtrees specified in the JSON content.
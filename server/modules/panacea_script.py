@@ -1,7 +1,16 @@
-import subprocess
 import logging
 import tempfile
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../PANACEA')))
+import tree_to_prism as tp
+import explicit_model as em
+from modules.instrumentation import span
+from modules.prism2json_parser import parse_property_results, parse_statistics, parse_strategy, strategy_choices
+from modules import prism_settings
+from modules.prism_runner import PrismError, current_job, limits, run_prism
+from modules.result_cache import RESULTS, result_key
 
 # Configure logging
 logging.basicConfig(
@@ -9,79 +18,189 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def panacea(xml_content):
+PANACEA_DIR = "/app/PANACEA"
+PRISM_PATH = os.getenv('PRISM_PATH', os.path.join(PANACEA_DIR, "prism-games-3.2.1-linux64-x86/bin/prism"))
+PROPS_PATH = os.path.join(PANACEA_DIR, "properties.props")
+
+# PRISM model templates compiled in this process, shared by all the requests
+TEMPLATES = tp.TemplateCache(maxsize=int(os.getenv('PRISM_TEMPLATE_CACHE_SIZE', '128')))
+
+# Stati al massimo di uno spazio esportato per PRISM; oltre, PRISM costruisce il modello dal testo
+EXPLICIT_MAX_STATES = int(os.getenv('PRISM_EXPLICIT_MAX_STATES', '2000000'))
+
+def explore(tree, timed):
+    """
+    Explores the state space of a tree for the explicit model setting (see explicit_model).
+
+    Returns:
+        ExplicitModel: The state space, or None if PRISM has to build the language model
+            (the state space is too large, or the model invalid: PRISM then reports why).
+    """
+    with span("explicit_model") as attributes:
+        try:
+            model = em.explore(tree, timed=timed, max_states=EXPLICIT_MAX_STATES)
+        except ValueError as e:
+            logging.info(f"State space not exported ({e}), PRISM builds the model.")
+            attributes["exported"] = False
+            return None
+        attributes.update(model.statistics(), exported=True)
+    return model
+
+def panacea(xml_content, settings=None, queries=None, timed=False, prune=None, tree=None, speculative=False):
     """
     Executes the PANACEA tool pipeline entirely in memory.
 
+    All the queries are checked in a single PRISM run, which builds the model once. The
+    policy (simulated path and strategy) is always computed from the equilibrium query.
+    The outputs are cached per model, properties and settings (see result_cache), so a
+    repeated or precomputed analysis does not run PRISM again. With the explicit model
+    setting PRISM imports the state space explored here, and the policy path is simulated
+    here from the exported strategy.
+
     Args:
         xml_content (str): Content of the input XML file as a string.
+        settings (dict): The requested PRISM engine and solver settings, completed
+            with the configured defaults and the tree-size heuristics (see prism_settings.resolve).
+        queries (list): The queries to check besides the equilibrium (see tree_to_prism.parse_queries).
+        timed (bool): Whether to generate the time-based model.
+        prune (list): The labels of the subtrees to keep, with their paths to the root
+            (see Tree.prune); the whole tree if empty.
+        tree (Tree): The tree of the XML, if already parsed or loaded from its snapshot.
+        speculative (bool): Whether the analysis is precomputed in the background (see
+            speculation): PRISM then runs with the background limits, and the result
+            cache counts the output apart and is not looked up.
 
     Returns:
-        dict: A dictionary containing the generated PRISM outputs as strings.
+        dict: A dictionary containing the generated PRISM outputs and the PRISM
+            standard output as strings, the results of the queries, the PRISM
+            settings and the resources used, with "cached" true if PRISM did not run;
+            None for a speculative analysis already cached.
+
+    Raises:
+        ValueError: If a query is invalid or a node to keep is not in the tree.
+        PrismError: If PRISM fails, is cancelled or exceeds its limits.
+        RuntimeError: If the pipeline fails otherwise.
     """
-    PANACEA_DIR = "/app/PANACEA"
-    
+    # Le query non valide sono errori della richiesta
+    properties, names = tp.get_prism_properties(queries)
+    # L'XML è già stato validato; anche i nodi da mantenere sconosciuti sono errori della richiesta
+    if tree is None:
+        with span("parse", xml_bytes=len(xml_content)) as attributes:
+            tree = tp.parse_string(xml_content)
+            attributes["nodes"] = len(tree.nodes)
+    if prune:
+        with span("prune", targets=len(prune)) as attributes:
+            tree = tree.prune(*prune)
+            attributes["nodes"] = len(tree.nodes)
     try:
-        # Crea file temporaneo per il contenuto XML
-        with tempfile.NamedTemporaryFile(mode="w+", delete=True, suffix=".xml") as xml_temp:
-            xml_temp.write(xml_content)
-            xml_temp.flush()  # Assicura che il contenuto sia scritto nel file prima di usarlo
+        # Genera il modello PRISM in questo processo, dal template della struttura dell'albero
+        logging.info("Generating PRISM model...")
+        resolved = prism_settings.resolve(settings, len(tree.nodes))
+        with span("model_generation") as attributes:
+            if timed:
+                prism_model = tp.get_prism_model_time(tree, templates=TEMPLATES)
+            else:
+                prism_model = tp.get_prism_model(tree, templates=TEMPLATES)
+            attributes["model_bytes"] = len(prism_model)
+            attributes["model_lines"] = prism_model.count("\n")
+        logging.info(f"PRISM model generated (templates: {TEMPLATES.hits} hits, {TEMPLATES.misses} misses).")
+
+        # Stesso modello, proprietà e impostazioni: i risultati di PRISM sono già noti
+        key = result_key(prism_model, properties, resolved.to_args(), PRISM_PATH, resolved.model or "language")
+        if speculative and key in RESULTS:
+            logging.info("PRISM outputs already cached, speculative run skipped.")
+            return None
+        if not speculative:
+            with span("result_cache") as attributes:
+                cached = RESULTS.get(key)
+                attributes["hit"] = cached is not None
+            if cached is not None:
+                logging.info("PRISM outputs found in the result cache.")
+                return dict(cached, cached=True)
 
-            file_basename = os.path.splitext(os.path.basename(xml_temp.name))[0]
+        explicit = explore(tree, timed) if resolved.model == "explicit" else None
 
-            # File temporanei per i risultati di PRISM
-            with tempfile.NamedTemporaryFile(mode="r", delete=True, suffix=".prism") as prism_temp, \
-                 tempfile.NamedTemporaryFile(mode="r", delete=True, suffix=".txt") as txt_temp, \
+        # File temporanei per il modello, le proprietà e i risultati di PRISM
+        with tempfile.NamedTemporaryFile(mode="w+", delete=True, suffix=".prism") as prism_temp, \
+             tempfile.NamedTemporaryFile(mode="w+", delete=True, suffix=".props") as props_temp, \
+             tempfile.TemporaryDirectory() as explicit_dir:
+            props_temp.write(properties)
+            props_temp.flush()
+
+            with tempfile.NamedTemporaryFile(mode="r", delete=True, suffix=".txt") as txt_temp, \
                  tempfile.NamedTemporaryFile(mode="r", delete=True, suffix=".csv") as csv_temp, \
                  tempfile.NamedTemporaryFile(mode="r", delete=True, suffix=".dot") as dot_temp:
 
-                try:
-                    # Esegui main.py per generare il file PRISM
-                    logging.info("Running main.py script in memory...")
-                    main_script_path = os.path.join(PANACEA_DIR, "main.py")
-                    subprocess.run(
-                        f"python {main_script_path} --input {xml_temp.name} --output {prism_temp.name}",
-                        shell=True,
-                        check=True,
-                        executable="/bin/bash"
-                    )
-                    logging.info("main.py script executed successfully.")
+                if explicit is None:
+                    prism_temp.write(prism_model)
+                    prism_temp.flush()  # Assicura che il contenuto sia scritto nel file prima di usarlo
+                    model_args = [prism_temp.name]
+                    path_args = ["-simpath", "deadlock", txt_temp.name]
+                else:
+                    # PRISM importa lo spazio degli stati; il percorso della politica è simulato qui
+                    with span("explicit_export") as attributes:
+                        basename = os.path.join(explicit_dir, "model")
+                        attributes["bytes"] = sum(os.path.getsize(path) for path in explicit.write(basename))
+                    model_args = explicit.import_args(basename)
+                    path_args = []
 
+                try:
                     # Esegui PRISM
-                    logging.info("Executing PRISM in memory...")
-                    prism_script_path = os.path.join(PANACEA_DIR, "prism-games-3.2.1-linux64-x86/bin/prism")
-                    prism_props_path = os.path.join(PANACEA_DIR, "properties.props")
-                    subprocess.run(
-                        f"{prism_script_path} {prism_temp.name} {prism_props_path} -prop 1 "
-                        f"-simpath 'deadlock' {txt_temp.name} "
-                        f"-exportresults {csv_temp.name}:csv -exportstrat {dot_temp.name}",
-                        shell=True,
-                        check=True,
-                        executable="/bin/bash"
-                    )
-                    logging.info("PRISM executed successfully.")
+                    logging.info(f"Executing PRISM in memory with {resolved.to_dict()}...")
+                    with span("prism", properties=len(names), **resolved.to_dict()) as attributes:
+                        # Argomenti mai interpretati dalla shell, in un nuovo gruppo di processi e con i limiti di tempo e memoria;
+                        # senza -prop PRISM verifica tutte le proprietà del file sullo stesso modello
+                        stdout, usage = run_prism(
+                            [PRISM_PATH] + model_args + [props_temp.name] + path_args
+                            + ["-exportresults", f"{csv_temp.name}:csv", "-exportstrat", dot_temp.name]
+                            + resolved.to_args(),
+                            limits(resolved.javamaxmem, background=speculative),
+                            current_job.get()
+                        )
+                        attributes["children_peak_rss"] = usage["peak_rss"]
+                        attributes["children_max_rss"] = usage["max_rss"]
+                        statistics = parse_statistics(stdout)
+                        results = parse_property_results(stdout, names)
+                        attributes.update({k: v for k, v in statistics.items() if k != "result"})
+                        # Il tempo non speso da PRISM a costruire e verificare il modello (avvio della JVM, parsing, export)
+                        if "construction_time" in statistics and "checking_time" in statistics:
+                            attributes["overhead_time"] = max(0.0, usage["wall_time"] - statistics["construction_time"] - statistics["checking_time"])
+                    logging.info(f"PRISM executed successfully ({statistics.get('states', '?')} states).")
 
                     # Legge i contenuti dei file generati
-                    txt_temp.seek(0)
-                    csv_temp.seek(0)
-                    dot_temp.seek(0)
+                    with span("read_outputs"):
+                        txt_temp.seek(0)
+                        csv_temp.seek(0)
+                        dot_temp.seek(0)
+
+                        txt_content = txt_temp.read()
+                        csv_content = csv_temp.read()
+                        dot_content = dot_temp.read()
 
-                    txt_content = txt_temp.read()
-                    csv_content = csv_temp.read()
-                    dot_content = dot_temp.read()
+                    if explicit is not None:
+                        with span("policy_path"):
+                            txt_content = explicit.policy_path(strategy_choices(parse_strategy(dot_content)))
 
-                except subprocess.CalledProcessError as e:
-                    logging.error(f"Error during command execution: {e}")
-                    raise RuntimeError(f"Command execution failed: {e}")
+                except PrismError as e:
+                    logging.error(f"Error during command execution ({e.kind}): {e}")
+                    raise
 
         logging.info("Panacea completed successfully.")
 
-        return {
+        output = {
             "txt_content": txt_content,
             "csv_content": csv_content,
-            "dot_content": dot_content
+            "dot_content": dot_content,
+            "stdout": stdout,
+            "results": results,
+            "settings": resolved.to_dict(),
+            "usage": usage
         }
+        RESULTS.put(key, output, speculative)
+        return dict(output, cached=False)
 
+    except PrismError:
+        raise
     except Exception as e:
         logging.error(f"Error: {e}")
         raise RuntimeError(f"Error: {e}")
@@ -0,0 +1,238 @@
+import itertools
+import logging
+import math
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.panacea_script import PRISM_PATH, PROPS_PATH, TEMPLATES, tp
+from modules.txt2json_parser import extract_policy
+from modules.prism2json_parser import parse_results
+from modules import prism_settings
+from modules.instrumentation import in_context
+from modules.prism_runner import PrismError, current_job, limits, run_prism
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+CONSTANT = re.compile(r"^const \w+ (\w+)", re.MULTILINE)
+
+# Punti al massimo di una griglia: in modalità pool ognuno è un'esecuzione di PRISM
+SWEEP_MAX_POINTS = int(os.getenv('SWEEP_MAX_POINTS', '1000'))
+# Tolleranza sul numero di passi di un intervallo con valori decimali (es. 0:0.1:0.3)
+RANGE_TOLERANCE = 1e-9
+
+def number(value, what):
+    """
+    Returns:
+        int | float: The value, if it is a finite number (booleans are not).
+
+    Raises:
+        ValueError: If it is not.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{what} must be a number, got {value!r}")
+    return value
+
+def parse_grid(grid):
+    """
+    Validates the grid of constant values of a sweep. The number of points is checked
+    before any range is expanded.
+
+    Args:
+        grid (dict): Maps constant names (cost_<action>, time_<action>) to a list of values
+            or to a range {"start": ..., "stop": ..., "step": ...} (step defaults to 1).
+
+    Returns:
+        dict: Maps constant names to (values, range) tuples, range being the PRISM
+            start:step:stop string, or None for lists.
+
+    Raises:
+        ValueError: If a value or range is invalid, or the grid has more than
+            SWEEP_MAX_POINTS points.
+    """
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError("The grid must map at least one constant to its values")
+    sizes = {}
+    for name, spec in grid.items():
+        if isinstance(spec, dict):
+            unknown = set(spec) - {"start", "stop", "step"}
+            missing = {"start", "stop"} - set(spec)
+            if unknown or missing:
+                raise ValueError(f"The range of {name} needs start and stop, and optionally step: {spec}")
+            start = number(spec["start"], f"The start of {name}")
+            stop = number(spec["stop"], f"The stop of {name}")
+            step = number(spec.get("step", 1), f"The step of {name}")
+            if step <= 0 or stop < start:
+                raise ValueError(f"Invalid range for {name}: {spec}")
+            sizes[name] = math.floor((stop - start) / step + RANGE_TOLERANCE) + 1
+        elif isinstance(spec, list) and spec:
+            for value in spec:
+                number(value, f"A value of {name}")
+            sizes[name] = len(spec)
+        else:
+            raise ValueError(f"Invalid values for {name}: {spec}")
+    points = math.prod(sizes.values())
+    if points > SWEEP_MAX_POINTS:
+        raise ValueError(f"The grid has {points} points, at most {SWEEP_MAX_POINTS} are allowed")
+
+    parsed = {}
+    for name, spec in grid.items():
+        if isinstance(spec, dict):
+            start, stop, step = spec["start"], spec["stop"], spec.get("step", 1)
+            # start + i*step, arrotondato: la somma ripetuta accumula gli errori (0.30000000000000004)
+            values = [start + i * step if isinstance(start + step, int) else round(start + i * step, 12)
+                      for i in range(sizes[name])]
+            parsed[name] = (values, f"{start}:{step}:{stop}")
+        else:
+            parsed[name] = (spec, None)
+    return parsed
+
+def run_session(model_path, grid, workdir, settings, job_id=None):
+    """
+    Checks every point of the grid in a single PRISM run, using -const ranges.
+
+    Args:
+        model_path (str): The path to the PRISM model with the undefined constants.
+        grid (dict): The parsed grid (see parse_grid); all values must be ranges.
+        workdir (str): The directory for the PRISM outputs.
+        settings (PrismSettings): The PRISM engine and solver settings.
+        job_id (str): The cancellable job of the PRISM run, or None.
+
+    Returns:
+        list: The result rows (see parse_results).
+    """
+    lists = [name for name, (_, spec) in grid.items() if spec is None]
+    if lists:
+        raise ValueError(f"Session sweeps need ranges, got lists for: {', '.join(lists)}")
+    csv_path = os.path.join(workdir, "results.csv")
+    constants = ",".join(f"{name}={spec}" for name, (_, spec) in grid.items())
+    run_prism(
+        [PRISM_PATH, model_path, PROPS_PATH, "-prop", "1", "-const", constants,
+         "-exportresults", f"{csv_path}:csv"] + settings.to_args(),
+        limits(settings.javamaxmem),
+        job_id
+    )
+    with open(csv_path) as f:
+        return parse_results(f.read())
+
+def run_point(model_path, point, workdir, index, settings, job_id=None):
+    """
+    Checks one point of the grid and simulates its policy.
+
+    Args:
+        model_path (str): The path to the PRISM model with the undefined constants.
+        point (dict): The constant values of the point.
+        workdir (str): The directory for the PRISM outputs.
+        index (int): The index of the point, used to name its outputs.
+        settings (PrismSettings): The PRISM engine and solver settings.
+        job_id (str): The cancellable job of the PRISM run, or None.
+
+    Returns:
+        dict: The constant values, the result and the optimal actions of the policy.
+    """
+    txt_path = os.path.join(workdir, f"path{index}.txt")
+    csv_path = os.path.join(workdir, f"results{index}.csv")
+    constants = ",".join(f"{name}={value}" for name, value in point.items())
+    run_prism(
+        [PRISM_PATH, model_path, PROPS_PATH, "-prop", "1", "-const", constants,
+         "-simpath", "deadlock", txt_path, "-exportresults", f"{csv_path}:csv"] + settings.to_args(),
+        limits(settings.javamaxmem),
+        job_id
+    )
+    with open(csv_path) as f:
+        results = parse_results(f.read())
+    with open(txt_path) as f:
+        policy = extract_policy(f.read())
+    return dict(point,
+                result=results[0]["result"] if results else None,
+                actions=[s["optimal_action"] for s in policy["states"] if s["optimal_action"]])
+
+def policy_differences(rows):
+    """
+    Compares the optimal actions of every point with the ones of the first point.
+
+    Args:
+        rows (list): The result rows of a pool sweep.
+
+    Returns:
+        list: For every row, whether the policy changed and the first differing step.
+    """
+    baseline = rows[0]["actions"] if rows else []
+    differences = []
+    for row in rows:
+        actions = row["actions"]
+        first = next((i for i, (a, b) in enumerate(zip(actions, baseline)) if a != b), None)
+        if first is None and len(actions) != len(baseline):
+            first = min(len(actions), len(baseline))
+        differences.append({"changed": first is not None, "first_difference": first})
+    return differences
+
+def sweep(xml_content, grid, mode="session", workers=4, timed=False, settings=None, tree=None):
+    """
+    Runs the analysis of a tree for a grid of cost and time values.
+
+    The model is generated once with the swept costs and times as undefined PRISM
+    constants. In "session" mode PRISM checks the whole grid in one run (-const ranges)
+    and only the results are returned; in "pool" mode every point is a separate PRISM
+    run on the worker pool, which also returns the simulated policies and how they
+    differ from the one of the first point.
+
+    Args:
+        xml_content (str): Content of the input XML file as a string.
+        grid (dict): Maps constant names to values, see parse_grid.
+        mode (str): "session" or "pool".
+        workers (int): The maximum number of concurrent PRISM runs in pool mode.
+        timed (bool): Whether to use the time-based model.
+        settings (dict): The requested PRISM settings (see prism_settings.resolve).
+        tree (Tree): The tree of the XML, if already parsed or loaded from its snapshot.
+
+    Returns:
+        dict: The constants, the PRISM settings, the result rows and, in pool mode,
+            the policy differences.
+    """
+    if mode not in ("session", "pool"):
+        raise ValueError(f"Unknown sweep mode: {mode}")
+    grid = parse_grid(grid)
+
+    if tree is None:
+        tree = tp.parse_string(xml_content)
+    resolved = prism_settings.resolve(settings, len(tree.nodes))
+    generate = tp.get_prism_model_time if timed else tp.get_prism_model
+    prism_model = generate(tree, templates=TEMPLATES, constants=True, undefined=grid.keys())
+    unknown = set(grid) - set(CONSTANT.findall(prism_model))
+    if unknown:
+        raise ValueError(f"Unknown constants: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = os.path.join(workdir, "model.prism")
+        tp.save_prism_model(prism_model, model_path)
+        try:
+            if mode == "session":
+                logging.info(f"Running sweep over {', '.join(grid)} in one PRISM session...")
+                rows = run_session(model_path, grid, workdir, resolved, current_job.get())
+                differences = None
+            else:
+                names = list(grid)
+                points = [dict(zip(names, values)) for values in itertools.product(*(grid[n][0] for n in names))]
+                logging.info(f"Running sweep over {len(points)} points with {workers} workers...")
+                job_id = current_job.get()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    rows = list(executor.map(in_context(lambda p: run_point(model_path, p[1], workdir, p[0], resolved, job_id)), enumerate(points)))
+                differences = policy_differences(rows)
+        except PrismError as e:
+            logging.error(f"Error during command execution ({e.kind}): {e}")
+            raise
+
+    logging.info("Sweep completed successfully.")
+    return {
+        "mode": mode,
+        "constants": list(grid),
+        "settings": resolved.to_dict(),
+        "rows": rows,
+        "differences": differences
+    }
@@ -0,0 +1,101 @@
+import logging
+import os
+import sys
+
+from modules.panacea_script import PRISM_PATH, TEMPLATES, em, tp
+from modules.json2xml_pruner import get_hidden_labels, remove_subtrees_from_xml
+from modules.xml2json_parser import parse_tree
+from modules.prism_runner import limits, run_prism
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../PANACEA')))
+import snapshot
+from validator import validate_string
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Esegue PRISM una volta durante il riscaldamento, per caricare la JVM e i jar nella cache del sistema
+WARMUP_PRISM = os.getenv('WARMUP_PRISM', '1').lower() in ("1", "true", "yes")
+
+# Un piccolo albero con attaccante e difensore, che percorre tutti i parser
+SAMPLE_TREE = """<adtree>
+  <node refinement="disjunctive">
+    <label>Goal</label>
+    <comment>Type: Goal
+Role: Attacker</comment>
+    <node refinement="disjunctive">
+      <label>Attack</label>
+      <comment>Type: Action
+Action: attack
+Cost: 2
+Time: 1
+Role: Attacker</comment>
+      <node refinement="conjunctive">
+        <label>Access</label>
+        <comment>Type: Attribute
+Role: Attacker</comment>
+        <node refinement="disjunctive">
+          <label>Enter</label>
+          <comment>Type: Action
+Action: enter
+Cost: 1
+Time: 1
+Role: Attacker</comment>
+          <node refinement="disjunctive">
+            <label>Door</label>
+            <comment>Type: Attribute
+Role: Attacker</comment>
+          </node>
+        </node>
+        <node refinement="disjunctive" switchRole="yes">
+          <label>Lock</label>
+          <comment>Type: Action
+Action: lock
+Cost: 1
+Time: 1
+Role: Defender</comment>
+        </node>
+      </node>
+    </node>
+  </node>
+</adtree>"""
+
+
+def warm_parsers():
+    """
+    Runs the request pipeline, up to PRISM, on a sample tree: the lazily imported
+    modules are loaded, the regular expressions compiled and the first-call costs
+    (e.g. NumPy in the layout) paid before the first request. The traced stages are
+    left out, so that /metrics only counts requests.
+    """
+    issues = validate_string(SAMPLE_TREE)
+    errors = [issue.message for issue in issues if issue.severity == "error"]
+    if errors:
+        raise RuntimeError(f"Invalid sample tree: {'; '.join(errors)}")
+    tree = tp.parse_string(SAMPLE_TREE)
+    snapshot.loads(snapshot.dumps(tree, snapshot.digest(SAMPLE_TREE)))
+    json_tree = parse_tree.__wrapped__(SAMPLE_TREE)  # senza lo span di @traced
+    remove_subtrees_from_xml(SAMPLE_TREE, get_hidden_labels(json_tree))
+    tp.get_prism_model(tree, templates=TEMPLATES)
+    tp.get_prism_model_time(tree)
+    tp.get_prism_properties()
+    em.explore(tree)
+
+
+def warm_prism():
+    """
+    Starts PRISM once (-version), so that its JVM and jars are in the page cache
+    before the first analysis.
+
+    Raises:
+        FileNotFoundError: If PRISM is not installed.
+        PrismError: If PRISM fails.
+    """
+    if not WARMUP_PRISM:
+        return
+    if not os.path.exists(PRISM_PATH):
+        raise FileNotFoundError(f"PRISM not found at {PRISM_PATH}")
+    run_prism([PRISM_PATH, "-version"], limits())
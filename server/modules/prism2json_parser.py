@@ -0,0 +1,226 @@
+import csv
+import logging
+import re
+
+from modules.instrumentation import traced
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Statistiche stampate da PRISM sullo stdout
+PRISM_STATISTICS = {
+    "states": re.compile(r"^States:\s+(\d+)", re.MULTILINE),
+    "initial_states": re.compile(r"^States:\s+\d+ \((\d+) initial\)", re.MULTILINE),
+    "transitions": re.compile(r"^Transitions:\s+(\d+)", re.MULTILINE),
+    "choices": re.compile(r"^Choices:\s+(\d+)", re.MULTILINE),
+    "iterations": re.compile(r"took (\d+) iterations", re.MULTILINE),
+    "construction_time": re.compile(r"^Time for model construction:\s+([\d.]+)", re.MULTILINE),
+    "checking_time": re.compile(r"^Time for model checking:\s+([\d.]+)", re.MULTILINE),
+    "result": re.compile(r"^Result:\s+(\S+)", re.MULTILINE),
+}
+
+# Nodi e archi del file DOT esportato con -exportstrat
+DOT_EDGE = re.compile(r'^\s*"?([^\s"\[]+)"?\s*->\s*"?([^\s"\[;]+)"?\s*(?:\[(.*)\])?\s*;?\s*$')
+DOT_NODE = re.compile(r'^\s*"?([^\s"\[=;{}]+)"?\s*\[(.*)\]\s*;?\s*$')
+DOT_ATTRIBUTE = re.compile(r'(\w+)\s*=\s*("(?:[^"\\]|\\.)*"|[^,\s\]]+)')
+
+def parse_number(value):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+def parse_statistics(stdout):
+    """
+    Extracts the model size, the number of iterations, the timings and the result
+    reported by PRISM.
+
+    Args:
+        stdout (str): The standard output of PRISM.
+
+    Returns:
+        dict: The statistics found in the output (states, initial_states, transitions,
+            choices, iterations, construction_time, checking_time of all the properties,
+            result of the first property).
+    """
+    statistics = {}
+    for name, pattern in PRISM_STATISTICS.items():
+        match = pattern.search(stdout)
+        if match:
+            statistics[name] = parse_number(match.group(1))
+    # PRISM checks each property of the run separately
+    times = PRISM_STATISTICS["checking_time"].findall(stdout)
+    if len(times) > 1:
+        statistics["checking_time"] = sum(float(t) for t in times)
+    return statistics
+
+def parse_results(csv_content):
+    """
+    Parses the results exported by PRISM in CSV format. When several properties are
+    checked, PRISM writes one table per property, preceded by the property and
+    separated by blank lines.
+
+    Args:
+        csv_content (str): The content of the -exportresults file.
+
+    Returns:
+        list: A list of rows, mapping the constant names and "result" to their values,
+            and "property" to the property of the row when there are several tables.
+    """
+    rows = []
+    for table in re.split(r"\n\s*\n", csv_content.strip()):
+        lines = table.splitlines()
+        prop = None
+        if len(lines) > 1 and lines[0].endswith(":"):
+            prop, lines = lines[0][:-1], lines[1:]
+        for row in csv.DictReader(lines):
+            row = {("result" if k == "Result" else k): parse_number(v) for k, v in row.items()}
+            if prop is not None:
+                row["property"] = prop
+            rows.append(row)
+    return rows
+
+def parse_property_results(stdout, names):
+    """
+    Extracts the result of every property checked in a PRISM run, in the order of the
+    properties file. PRISM reports each property in a "Model checking:" section, ending
+    with its result or with the error that prevented checking it.
+
+    Args:
+        stdout (str): The standard output of PRISM.
+        names (list): The names of the properties, in order.
+
+    Returns:
+        dict: Maps each name to its "property" and either its "result" or its "error".
+    """
+    sections = re.split(r"^Model checking:\s*", stdout, flags=re.MULTILINE)[1:]
+    results = {}
+    for name, section in zip(names, sections):
+        prop, _, body = section.partition("\n")
+        entry = {"property": prop.strip()}
+        result = PRISM_STATISTICS["result"].search(body)
+        error = re.search(r"^Error:\s*(.*)$", body, re.MULTILINE)
+        if result:
+            entry["result"] = parse_number(result.group(1))
+        else:
+            entry["error"] = error.group(1) if error else "No result"
+        results[name] = entry
+    for name in names[len(sections):]:
+        results[name] = {"error": "Not checked"}
+    return results
+
+def parse_attributes(attributes):
+    return {name: value[1:-1].replace('\\"', '"') if value.startswith('"') else value
+            for name, value in DOT_ATTRIBUTE.findall(attributes or "")}
+
+@traced("parse_strategy")
+def parse_strategy(dot_content):
+    """
+    Parses the strategy exported by PRISM in DOT format into a compact adjacency
+    structure (compressed sparse rows).
+
+    The states are numbered in order of appearance. The outgoing edges of state i are
+    targets[offsets[i]:offsets[i + 1]], labelled with actions[edge_actions[j]] (None if
+    the edge has no action) and probabilities[j]. The intermediate choice nodes that
+    PRISM draws as points are collapsed into edges from the state to the successors.
+
+    Args:
+        dot_content (str): The content of the -exportstrat file.
+
+    Returns:
+        dict: The state ids and labels, the action names and the edge arrays.
+    """
+    nodes = {}
+    edges = []
+    for line in dot_content.splitlines():
+        match = DOT_EDGE.match(line)
+        if match:
+            edges.append((match.group(1), match.group(2), parse_attributes(match.group(3))))
+            continue
+        match = DOT_NODE.match(line)
+        if match and match.group(1) not in ("node", "edge", "graph"):
+            nodes[match.group(1)] = parse_attributes(match.group(2))
+
+    def is_choice(node):
+        return nodes.get(node, {}).get("shape") == "point"
+
+    # Successori dei nodi di scelta, con le probabilità
+    successors = {}
+    for source, target, attributes in edges:
+        if is_choice(source):
+            successors.setdefault(source, []).append((target, attributes.get("label")))
+
+    ids = []
+    index = {}
+
+    def state(node):
+        if node not in index:
+            index[node] = len(ids)
+            ids.append(node)
+        return index[node]
+
+    for node in nodes:
+        if not is_choice(node):
+            state(node)
+
+    outgoing = {}
+    action_index = {}
+    actions = []
+    for source, target, attributes in edges:
+        if is_choice(source):
+            continue
+        action = attributes.get("label") or None
+        if action is not None and action not in action_index:
+            action_index[action] = len(actions)
+            actions.append(action)
+        if is_choice(target):
+            branches = [(successor, parse_number(p) if p else 1.0) for successor, p in successors.get(target, [])]
+        else:
+            branches = [(target, 1.0)]
+        for successor, probability in branches:
+            outgoing.setdefault(state(source), []).append(
+                (state(successor), action_index.get(action), probability))
+
+    offsets, targets, edge_actions, probabilities = [0], [], [], []
+    for i in range(len(ids)):
+        for target, action, probability in outgoing.get(i, []):
+            targets.append(target)
+            edge_actions.append(action)
+            probabilities.append(probability)
+        offsets.append(len(targets))
+
+    return {
+        "states": ids,
+        "labels": [nodes.get(node, {}).get("label", node) for node in ids],
+        "actions": actions,
+        "offsets": offsets,
+        "targets": targets,
+        "edge_actions": edge_actions,
+        "probabilities": probabilities
+    }
+
+def state_name(label):
+    """Returns the variable values of a state labelled by PRISM as index:(values)."""
+    index, _, values = label.partition(":")
+    return values if values and index.isdigit() else label
+
+def strategy_choices(strategy):
+    """
+    Returns the actions a parsed strategy (see parse_strategy) chooses in every state.
+
+    Returns:
+        dict: The set of actions of every state with a choice, by its variable values.
+    """
+    choices = {}
+    offsets, edge_actions = strategy["offsets"], strategy["edge_actions"]
+    for i, label in enumerate(strategy["labels"]):
+        actions = {strategy["actions"][a] for a in edge_actions[offsets[i]:offsets[i + 1]] if a is not None}
+        if actions:
+            choices[state_name(label)] = actions
+    return choices
@@ -0,0 +1,483 @@
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+from modules.instrumentation import add_children_cpu
+from modules.supervisor import SUPERVISOR
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Limiti di ogni esecuzione di PRISM
+WALL_TIMEOUT = float(os.getenv('PRISM_WALL_TIMEOUT', '900'))
+CPU_TIMEOUT = int(os.getenv('PRISM_CPU_TIMEOUT', '1800'))
+MEMORY_HEADROOM = os.getenv('PRISM_MEMORY_HEADROOM', '8g')  # oltre l'heap della JVM
+MEMORY_LIMIT = os.getenv('PRISM_MEMORY_LIMIT')  # se impostato, sostituisce heap + headroom
+CGROUP_ROOT = os.getenv('PRISM_CGROUP_ROOT')  # cgroup v2 delegato, es. /sys/fs/cgroup/panacea
+# Esecuzioni in background (es. precalcoli speculativi): priorità minima e un limite di tempo più breve
+BACKGROUND_NICE = int(os.getenv('PRISM_BACKGROUND_NICE', '19'))
+BACKGROUND_WALL_TIMEOUT = float(os.getenv('PRISM_BACKGROUND_WALL_TIMEOUT', '120'))
+KILL_GRACE = 2.0
+POLL_INTERVAL = 0.05  # controllo della cancellazione e dei limiti
+
+# Registro dei job, condiviso dai worker tramite il filesystem
+JOBS_DIR = os.getenv('PRISM_JOBS_DIR', os.path.join(tempfile.gettempdir(), 'panacea-jobs'))
+JOB_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+CANCEL_MARKER = "cancel"
+
+current_job = contextvars.ContextVar("current_job", default=None)
+
+OUT_OF_MEMORY = ("java.lang.OutOfMemoryError", "Could not reserve enough space", "Cannot allocate memory")
+MEMORY_UNITS = {"k": 2**10, "m": 2**20, "g": 2**30}
+
+# Codici HTTP dei tipi di errore
+FAILURE_STATUS = {"cancelled": 409, "timeout": 504, "cpu_limit": 504, "memory_limit": 500, "error": 500}
+
+
+class PrismError(RuntimeError):
+    """
+    A failed PRISM execution.
+
+    Args:
+        message (str): The error message.
+        kind (str): "cancelled", "timeout", "cpu_limit", "memory_limit" or "error".
+        usage (dict): The resources used by the execution.
+        stdout (str): The output of PRISM.
+    """
+    def __init__(self, message, kind, usage=None, stdout=""):
+        super().__init__(message)
+        self.kind = kind
+        self.usage = usage or {}
+        self.stdout = stdout
+
+    def to_dict(self):
+        return {"error": str(self), "failure": self.kind, "usage": self.usage}
+
+
+class JobError(ValueError):
+    """An invalid or already running job id."""
+
+
+class Limits(NamedTuple):
+    """
+    The limits of a PRISM execution: wall-clock and CPU seconds, memory bytes and the
+    niceness added to the process.
+    """
+    wall_timeout: float
+    cpu_timeout: int
+    memory: Optional[int]
+    nice: int = 0
+
+
+def parse_memory(value):
+    """Converts a PRISM-style memory size (e.g. 512m, 4g) to bytes."""
+    value = str(value).strip().lower()
+    if value[-1:] in MEMORY_UNITS:
+        return int(value[:-1]) * MEMORY_UNITS[value[-1]]
+    return int(value)
+
+
+def limits(javamaxmem=None, background=False):
+    """
+    Returns the configured limits. Unless PRISM_MEMORY_LIMIT is set, the memory cap is
+    the JVM heap plus PRISM_MEMORY_HEADROOM, which covers the rest of the JVM.
+
+    Args:
+        javamaxmem (str): The JVM heap of the execution.
+        background (bool): Whether nobody waits for the execution: it then runs with
+            the lowest priority (PRISM_BACKGROUND_NICE) and at most
+            PRISM_BACKGROUND_WALL_TIMEOUT seconds.
+
+    Returns:
+        Limits: The limits.
+    """
+    if MEMORY_LIMIT:
+        memory = parse_memory(MEMORY_LIMIT)
+    elif javamaxmem:
+        memory = parse_memory(javamaxmem) + parse_memory(MEMORY_HEADROOM)
+    else:
+        memory = None
+    if background:
+        return Limits(min(WALL_TIMEOUT, BACKGROUND_WALL_TIMEOUT), CPU_TIMEOUT, memory, BACKGROUND_NICE)
+    return Limits(WALL_TIMEOUT, CPU_TIMEOUT, memory)
+
+
+def job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+@contextmanager
+def job(job_id):
+    """
+    Registers a cancellable job for the PRISM executions of a request.
+
+    Args:
+        job_id (str): The job id chosen by the client, or None for an anonymous job.
+
+    Yields:
+        str: The job id.
+
+    Raises:
+        JobError: If the job id is invalid or already running.
+    """
+    if job_id is None:
+        job_id = uuid.uuid4().hex
+    if not isinstance(job_id, str) or not JOB_ID.match(job_id):
+        raise JobError(f"Invalid job_id: {job_id} (letters, digits, '-' and '_', at most 64)")
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    try:
+        os.mkdir(job_dir(job_id))
+    except FileExistsError:
+        raise JobError(f"Job {job_id} is already running")
+    token = current_job.set(job_id)
+    try:
+        yield job_id
+    finally:
+        current_job.reset(token)
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+
+
+def cancelled(job_id):
+    return job_id is not None and os.path.exists(os.path.join(job_dir(job_id), CANCEL_MARKER))
+
+
+def cancel(job_id):
+    """
+    Cancels a running job: its PRISM process groups are killed, by this worker or by
+    the one running the job as soon as it sees the marker.
+
+    Args:
+        job_id (str): The job id.
+
+    Returns:
+        bool: Whether the job was running.
+    """
+    if not isinstance(job_id, str) or not JOB_ID.match(job_id) or not os.path.isdir(job_dir(job_id)):
+        return False
+    try:
+        open(os.path.join(job_dir(job_id), CANCEL_MARKER), "w").close()
+        for name in os.listdir(job_dir(job_id)):
+            if name.isdigit():
+                kill_group(int(name), signal.SIGKILL)
+    except FileNotFoundError:
+        pass  # il job è terminato nel frattempo
+    logging.info(f"Job {job_id} cancelled")
+    return True
+
+
+def running_jobs():
+    """
+    Returns:
+        list: The ids of the running jobs and the process groups of their PRISM executions.
+    """
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    jobs = []
+    for job_id in sorted(os.listdir(JOBS_DIR)):
+        try:
+            names = os.listdir(job_dir(job_id))
+        except FileNotFoundError:
+            continue
+        jobs.append({"job_id": job_id, "processes": sorted(int(n) for n in names if n.isdigit()),
+                     "cancelled": CANCEL_MARKER in names})
+    return jobs
+
+
+def kill_group(pgid, sig):
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def create_cgroup(memory):
+    """
+    Creates a cgroup v2 below PRISM_CGROUP_ROOT with a memory cap and no swap.
+
+    Returns:
+        str: The path of the cgroup, or None if cgroups are not configured or usable.
+    """
+    if not CGROUP_ROOT or memory is None:
+        return None
+    path = os.path.join(CGROUP_ROOT, f"prism-{uuid.uuid4().hex}")
+    try:
+        os.mkdir(path)
+        with open(os.path.join(path, "memory.max"), "w") as f:
+            f.write(str(memory))
+        if os.path.exists(os.path.join(path, "memory.swap.max")):
+            with open(os.path.join(path, "memory.swap.max"), "w") as f:
+                f.write("0")
+        return path
+    except OSError as e:
+        logging.warning(f"Cannot use the cgroup {path}: {e}")
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+        return None
+
+
+def read_cgroup(path):
+    """Returns the memory peak and the OOM kills of a cgroup."""
+    usage = {}
+    try:
+        with open(os.path.join(path, "memory.peak")) as f:
+            usage["cgroup_memory_peak"] = int(f.read())
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(path, "memory.events")) as f:
+            events = dict(line.split() for line in f if line.strip())
+        usage["oom_kills"] = int(events.get("oom_kill", 0))
+    except (OSError, ValueError):
+        pass
+    return usage
+
+
+def remove_cgroup(path):
+    if path is None:
+        return
+    try:
+        if os.path.exists(os.path.join(path, "cgroup.kill")):
+            with open(os.path.join(path, "cgroup.kill"), "w") as f:
+                f.write("1")
+        for _ in range(50):
+            try:
+                os.rmdir(path)
+                return
+            except OSError:
+                time.sleep(0.01)
+    except OSError as e:
+        logging.warning(f"Cannot remove the cgroup {path}: {e}")
+
+
+# Applica i limiti nel figlio senza eseguire codice Python dopo la fork (preexec_fn può bloccarsi in un
+# processo con molti thread): la shell entra nel cgroup, imposta gli rlimit e si sostituisce con PRISM
+LIMIT_WRAPPER = """
+set -e
+if [ -n "$1" ]; then echo $$ > "$1/cgroup.procs"; fi
+ulimit -S -t "$2"
+ulimit -H -t "$3"
+if [ -n "$4" ]; then ulimit -v "$4"; fi
+nice_increment="$5"
+shift 5
+exec nice -n "$nice_increment" "$@"
+"""
+
+
+def limit_command(args, limits, cgroup):
+    """
+    Returns the command line running PRISM through LIMIT_WRAPPER: the process joins the
+    cgroup and gets the CPU and memory rlimits and the niceness before the exec, so that
+    the JVM and its threads inherit them.
+    """
+    memory = str(limits.memory // 1024) if limits.memory is not None else ""  # ulimit -v è in KiB
+    return (["/bin/sh", "-c", LIMIT_WRAPPER, "prism-limits", cgroup or "",
+             str(limits.cpu_timeout), str(limits.cpu_timeout + 5), memory, str(limits.nice)]
+            + list(args))
+
+
+def spawn(args, limits):
+    """
+    Starts PRISM in its own process group, with its limits (see limit_command). Blocking
+    (fork and exec), so the supervisor runs it in a thread.
+
+    Returns:
+        tuple: The process and its cgroup (None without cgroups).
+    """
+    cgroup = create_cgroup(limits.memory)
+    try:
+        process = subprocess.Popen(
+            limit_command(args, limits, cgroup),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            # Limita le arene di malloc, che altrimenti riservano molta memoria virtuale
+            env=dict(os.environ, MALLOC_ARENA_MAX="2")
+        )
+    except OSError:
+        remove_cgroup(cgroup)
+        raise
+    return process, cgroup
+
+
+def failure(returncode, stdout, usage, limits):
+    """Classifies a failed execution."""
+    signals = {-returncode, returncode - 128}
+    if signal.SIGXCPU in signals or (signal.SIGKILL in signals and usage.get("cpu_time", 0) >= limits.cpu_timeout):
+        return "cpu_limit", f"PRISM exceeded the CPU time limit of {limits.cpu_timeout} s"
+    if usage.get("oom_kills") or any(message in stdout for message in OUT_OF_MEMORY):
+        return "memory_limit", "PRISM ran out of memory"
+    # Codici della shell di LIMIT_WRAPPER: PRISM non trovato o non eseguibile
+    if returncode in (126, 127):
+        lines = stdout.strip().splitlines()
+        return "error", f"PRISM could not be started: {lines[-1] if lines else returncode}"
+    lines = [line for line in stdout.splitlines() if line.startswith("Error")]
+    return "error", lines[-1] if lines else f"PRISM exited with code {returncode}"
+
+
+def run_prism(args, limits, job_id=None):
+    """
+    Runs PRISM on the supervisor loop (see run_prism_async) and waits for it in the
+    calling thread. Its CPU time is attributed to the open spans of the caller.
+
+    Args:
+        args (list): The command line.
+        limits (Limits): The limits.
+        job_id (str): The job of the execution, which can be cancelled, or None.
+
+    Returns:
+        tuple: The standard output (with the standard error) and the resources used.
+
+    Raises:
+        PrismError: If PRISM fails, is cancelled or exceeds a limit.
+    """
+    try:
+        stdout, usage = SUPERVISOR.run(run_prism_async(args, limits, job_id))
+    except PrismError as e:
+        add_children_cpu(e.usage.get("cpu_time", 0.0))
+        raise
+    add_children_cpu(usage["cpu_time"])
+    return stdout, usage
+
+
+async def acquire(job_id):
+    """Waits for a free execution slot, unless the job is cancelled in the meantime."""
+    SUPERVISOR.queued += 1
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(SUPERVISOR.semaphore.acquire(), POLL_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                if cancelled(job_id):
+                    raise PrismError(f"Job {job_id} was cancelled", "cancelled")
+    finally:
+        SUPERVISOR.queued -= 1
+
+
+async def run_prism_async(args, limits, job_id=None):
+    """
+    Runs PRISM in its own process group (so that the JVM started by the PRISM script is
+    killed with it), with the CPU and memory limits applied as rlimits and, if
+    PRISM_CGROUP_ROOT is set, as a cgroup v2 memory cap, by a small shell wrapper that
+    execs PRISM (see limit_command).
+
+    At most PRISM_CONCURRENCY executions run at once in a server process; the others
+    wait for a slot (queue_time). The process is supervised by the event loop: its
+    output is read from the pipe, its exit is signalled by a pidfd and it is reaped
+    with wait4, which reports the resources used by PRISM and its JVM.
+
+    Args:
+        args (list): The command line.
+        limits (Limits): The limits.
+        job_id (str): The job of the execution, which can be cancelled, or None.
+
+    Returns:
+        tuple: The standard output (with the standard error) and the resources used
+            (queue_time, wall_time, cpu_time, max_rss and, when available, peak_rss
+            and the cgroup memory peak).
+
+    Raises:
+        PrismError: If PRISM fails, is cancelled or exceeds a limit.
+    """
+    if cancelled(job_id):
+        raise PrismError(f"Job {job_id} was cancelled", "cancelled")
+    queued = time.perf_counter()
+    await acquire(job_id)
+    try:
+        return await supervise(args, limits, job_id, time.perf_counter() - queued)
+    finally:
+        SUPERVISOR.semaphore.release()
+
+
+async def supervise(args, limits, job_id, queue_time):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    # La fork e l'exec avvengono in un thread, per non fermare il loop e le altre esecuzioni
+    process, cgroup = await asyncio.to_thread(spawn, args, limits)
+    registration = os.path.join(job_dir(job_id), str(process.pid)) if job_id else None
+    if registration:
+        try:
+            open(registration, "w").close()
+        except OSError:
+            registration = None
+
+    # L'output viene letto dal loop, senza un thread per processo
+    reader = asyncio.StreamReader(limit=2**20)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), process.stdout)
+    output = loop.create_task(reader.read())
+
+    kind = None
+    kill_at = None
+    SUPERVISOR.watch(process.pid)
+    try:
+        with SUPERVISOR.exit_event(process.pid) as exited:
+            while True:
+                pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    process.returncode = os.waitstatus_to_exitcode(status)
+                    break
+                if kind is None and cancelled(job_id):
+                    kind = "cancelled"
+                elif kind is None and time.perf_counter() - start > limits.wall_timeout:
+                    kind = "timeout"
+                if kind is not None and kill_at is None:
+                    # Termina l'intero gruppo di processi, poi lo uccide dopo un periodo di grazia
+                    kill_group(process.pid, signal.SIGTERM)
+                    kill_at = time.perf_counter() + KILL_GRACE
+                elif kill_at is not None and time.perf_counter() > kill_at:
+                    kill_group(process.pid, signal.SIGKILL)
+                try:
+                    await asyncio.wait_for(exited.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        # Uccide i processi rimasti nel gruppo (es. la JVM se lo script è terminato)
+        kill_group(process.pid, signal.SIGKILL)
+        peak_rss = SUPERVISOR.unwatch(process.pid)
+    if kind is None and process.returncode != 0 and cancelled(job_id):
+        kind = "cancelled"  # ucciso da cancel() in un altro worker
+    stdout = (await output).decode("utf-8", errors="replace")
+    transport.close()
+    if registration:
+        try:
+            os.remove(registration)
+        except OSError:
+            pass
+
+    # wait4 include le risorse dei processi figli di PRISM (la JVM)
+    usage = {
+        "queue_time": queue_time,
+        "wall_time": time.perf_counter() - start,
+        "cpu_time": rusage.ru_utime + rusage.ru_stime,
+        "max_rss": rusage.ru_maxrss * 1024,
+        "peak_rss": peak_rss
+    }
+    if cgroup:
+        usage.update(read_cgroup(cgroup))
+        remove_cgroup(cgroup)
+    usage["limits"] = limits._asdict()
+
+    if kind == "cancelled":
+        raise PrismError(f"Job {job_id} was cancelled", kind, usage, stdout)
+    if kind == "timeout":
+        raise PrismError(f"PRISM exceeded the wall-clock limit of {limits.wall_timeout} s", kind, usage, stdout)
+    if process.returncode != 0:
+        kind, message = failure(process.returncode, stdout, usage, limits)
+        logging.error(stdout)
+        raise PrismError(message, kind, usage, stdout)
+    return stdout, usage
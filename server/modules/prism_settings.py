@@ -0,0 +1,184 @@
+import os
+import re
+from typing import NamedTuple, Optional
+
+# Opzioni di PRISM per ogni motore e metodo di soluzione
+ENGINES = {
+    "explicit": "-explicit",
+    "sparse": "-sparse",
+    "hybrid": "-hybrid",
+    "mtbdd": "-mtbdd",
+}
+METHODS = {
+    "valiter": "-valiter",
+    "gaussseidel": "-gaussseidel",
+    "politer": "-politer",
+    "modpoliter": "-modpoliter",
+    "intervaliter": "-intervaliter",
+}
+# Come PRISM riceve il modello: il testo del modello da analizzare e costruire, o lo spazio
+# degli stati già esplorato (vedi PANACEA/explicit_model.py)
+MODELS = ("language", "explicit")
+# Le richieste non scelgono il modello: l'importazione di PRISM-games non è ancora verificata
+REQUEST_FIELDS = ("engine", "method", "epsilon", "maxiters", "javamaxmem")
+MEMORY = re.compile(r"^\d+[kmg]?$", re.IGNORECASE)
+
+# Soglie delle euristiche, in numero di nodi dell'albero
+SYMBOLIC_THRESHOLD = int(os.getenv('PRISM_SYMBOLIC_THRESHOLD', '400'))
+GAUSS_SEIDEL_THRESHOLD = int(os.getenv('PRISM_GAUSS_SEIDEL_THRESHOLD', '100'))
+LARGE_HEAP_THRESHOLD = int(os.getenv('PRISM_LARGE_HEAP_THRESHOLD', '200'))
+# Dimensione minima degli alberi il cui spazio degli stati è esportato per PRISM (0 lo disattiva)
+EXPLICIT_MODEL_THRESHOLD = int(os.getenv('PRISM_EXPLICIT_MODEL_THRESHOLD', '0'))
+
+
+class PrismSettings(NamedTuple):
+    """
+    The engine and solver settings of a PRISM run. None leaves the PRISM default; the
+    model, "language" by default, is how the model reaches PRISM and has no option.
+    """
+    engine: Optional[str] = None
+    method: Optional[str] = None
+    epsilon: Optional[float] = None
+    maxiters: Optional[int] = None
+    javamaxmem: Optional[str] = None
+    model: Optional[str] = None
+
+    def to_args(self):
+        """
+        Returns:
+            list: The PRISM command line options.
+        """
+        args = []
+        if self.engine:
+            args.append(ENGINES[self.engine])
+        if self.method:
+            args.append(METHODS[self.method])
+        if self.epsilon is not None:
+            args += ["-epsilon", repr(self.epsilon)]
+        if self.maxiters is not None:
+            args += ["-maxiters", str(self.maxiters)]
+        if self.javamaxmem:
+            args += ["-javamaxmem", self.javamaxmem]
+        return args
+
+    def to_dict(self):
+        return {k: v for k, v in self._asdict().items() if v is not None}
+
+
+def validate(settings, fields=REQUEST_FIELDS):
+    """
+    Validates and converts requested settings.
+
+    Args:
+        settings (dict): Maps the PrismSettings fields to values; None and "auto"
+            values are ignored.
+        fields (tuple): The accepted fields. The requests cannot set the model, which
+            only the PRISM_MODEL environment variable and the heuristics choose.
+
+    Returns:
+        dict: The valid settings.
+
+    Raises:
+        ValueError: If a setting is unknown or invalid.
+    """
+    if settings is None:
+        return {}
+    if not isinstance(settings, dict):
+        raise ValueError("The PRISM settings must be an object")
+    unknown = set(settings) - set(fields)
+    if unknown:
+        raise ValueError(f"Unknown PRISM settings: {', '.join(sorted(unknown))}")
+    valid = {}
+    for name, value in settings.items():
+        if value is None or value == "" or value == "auto":
+            continue
+        if name == "engine" and value not in ENGINES:
+            raise ValueError(f"Unknown PRISM engine: {value} (expected one of {', '.join(ENGINES)})")
+        if name == "method" and value not in METHODS:
+            raise ValueError(f"Unknown PRISM method: {value} (expected one of {', '.join(METHODS)})")
+        if name == "model" and value not in MODELS:
+            raise ValueError(f"Unknown PRISM model: {value} (expected one of {', '.join(MODELS)})")
+        if name == "epsilon":
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid PRISM epsilon: {value}")
+            if not 0 < value < 1:
+                raise ValueError(f"Invalid PRISM epsilon: {value}")
+        if name == "maxiters":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid PRISM maxiters: {value}")
+            if value <= 0:
+                raise ValueError(f"Invalid PRISM maxiters: {value}")
+        if name == "javamaxmem" and not MEMORY.match(str(value)):
+            raise ValueError(f"Invalid PRISM javamaxmem: {value} (e.g. 512m, 4g)")
+        valid[name] = value
+    return valid
+
+
+def defaults():
+    """
+    Returns:
+        dict: The settings configured through the PRISM_ENGINE, PRISM_METHOD,
+            PRISM_EPSILON, PRISM_MAXITERS, PRISM_JAVAMAXMEM and PRISM_MODEL environment
+            variables.
+    """
+    return validate({name: os.getenv(f'PRISM_{name.upper()}') for name in PrismSettings._fields},
+                    PrismSettings._fields)
+
+
+def heuristics(size):
+    """
+    Chooses settings from the size of the tree.
+
+    Small trees have small state spaces, which the explicit engine builds fastest; the
+    state space grows exponentially with the attributes, so larger trees use the hybrid
+    engine (PRISM-games falls back to the explicit engine for the games it cannot solve
+    symbolically). Gauss-Seidel value iteration converges in fewer iterations on the
+    larger models, which also get a larger JVM heap. With PRISM_EXPLICIT_MODEL_THRESHOLD,
+    the mid-sized trees solved by the explicit engine have their state space exported,
+    which PRISM imports instead of parsing and building the model.
+
+    The exported model is off by default (PRISM_EXPLICIT_MODEL_THRESHOLD=0) and the
+    requests cannot choose it: its state space is checked against the language model by
+    tests/test_explicit_model.py, but the import options of PRISM-games have not been
+    run on it. Enable it after running benchmarks/explicit_import.py with --prism on the
+    PRISM of the deployment.
+
+    Args:
+        size (int): The number of nodes of the tree.
+
+    Returns:
+        dict: The chosen settings.
+    """
+    settings = {
+        "engine": "hybrid" if size > SYMBOLIC_THRESHOLD else "explicit",
+        "method": "gaussseidel" if size > GAUSS_SEIDEL_THRESHOLD else "valiter",
+        "javamaxmem": "4g" if size > LARGE_HEAP_THRESHOLD else "1g",
+    }
+    if EXPLICIT_MODEL_THRESHOLD and EXPLICIT_MODEL_THRESHOLD <= size <= SYMBOLIC_THRESHOLD:
+        settings["model"] = "explicit"
+    return settings
+
+
+def resolve(requested, size):
+    """
+    Resolves the settings of a run: the requested settings take precedence over the
+    configured defaults, which take precedence over the tree-size heuristics.
+
+    Args:
+        requested (dict): The settings of the request, or None.
+        size (int): The number of nodes of the tree.
+
+    Returns:
+        PrismSettings: The settings.
+
+    Raises:
+        ValueError: If a requested or configured setting is invalid.
+    """
+    settings = heuristics(size)
+    settings.update(defaults())
+    settings.update(validate(requested))
+    return PrismSettings(**settings)
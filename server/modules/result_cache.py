@@ -0,0 +1,138 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Dimensione massima dei risultati di PRISM in cache, in byte, per processo
+RESULT_CACHE_BYTES = int(os.getenv('RESULT_CACHE_BYTES', str(256 * 1024 * 1024)))
+
+# Campi testuali dell'output di panacea che occupano la memoria della cache
+TEXT_FIELDS = ("txt_content", "csv_content", "dot_content", "stdout")
+
+
+def result_key(prism_model, properties, args, prism_path="", model="language"):
+    """
+    Returns the cache key of a PRISM execution: the same model, properties, settings and
+    executable give the same results.
+
+    Args:
+        prism_model (str): The PRISM model.
+        properties (str): The properties file.
+        args (list): The PRISM settings as command-line arguments.
+        prism_path (str): The PRISM executable.
+        model (str): How PRISM gets the model (see prism_settings.MODELS): the policy path
+            of an imported model is simulated by the server, not by PRISM.
+
+    Returns:
+        str: The key.
+    """
+    h = hashlib.sha256()
+    for part in (prism_path, " ".join(args), model, properties, prism_model):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def output_size(output):
+    return sum(len(output.get(field) or "") for field in TEXT_FIELDS)
+
+
+class ResultCache:
+    """
+    A least recently used cache of the outputs of panacea, bounded by the total size of
+    their texts. Thread-safe.
+
+    Entries computed speculatively (see modules.speculation) are counted apart, so that
+    the metrics show how many of them were then requested.
+
+    Args:
+        maxbytes (int): The maximum total size of the cached outputs.
+    """
+    def __init__(self, maxbytes=RESULT_CACHE_BYTES):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.speculative_stored = 0
+        self.speculative_hits = 0
+        self.speculative_used = 0
+        self.speculative_evicted_unused = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """
+        Returns:
+            dict: The output cached for the key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if entry["speculative"]:
+                self.speculative_hits += 1
+                if not entry["used"]:
+                    self.speculative_used += 1
+            entry["used"] = True
+            return entry["output"]
+
+    def put(self, key, output, speculative=False):
+        """
+        Caches an output, evicting the least recently used ones to stay within the bound.
+        Outputs larger than the bound are not cached.
+        """
+        size = output_size(output)
+        if size > self.maxbytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous["size"]
+            self._entries[key] = {"output": output, "size": size, "speculative": speculative, "used": False}
+            self.size += size
+            if speculative:
+                self.speculative_stored += 1
+            while self.size > self.maxbytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted["size"]
+                if evicted["speculative"] and not evicted["used"]:
+                    self.speculative_evicted_unused += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def status(self):
+        """
+        Returns:
+            dict: The size and the counters of the cache, and the share of the speculative
+                entries that were requested.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "speculative_stored": self.speculative_stored,
+                "speculative_hits": self.speculative_hits,
+                "speculative_used": self.speculative_used,
+                "speculative_evicted_unused": self.speculative_evicted_unused,
+                "speculative_used_ratio": self.speculative_used / self.speculative_stored if self.speculative_stored else 0.0
+            }
+
+
+# La cache è del processo: con SERVER_WORKERS>1 la richiesta successiva (es. /receive_json dopo un
+# precalcolo speculativo di modules.speculation) arriva spesso a un altro worker, che non trova i
+# risultati e riesegue PRISM. Gli hit e i precalcoli utili scendono circa a 1/SERVER_WORKERS
+RESULTS = ResultCache()
@@ -0,0 +1,391 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modules.panacea_script import PRISM_PATH, TEMPLATES, tp
+from modules.prism2json_parser import parse_strategy, state_name
+from modules import prism_settings
+from modules.instrumentation import in_context
+from modules.prism_runner import PrismError, current_job, limits, run_prism
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Limiti delle simulazioni: percorsi per richiesta, passi per percorso e stati riportati nel riepilogo.
+# In modalità pool ogni percorso è un'esecuzione completa di PRISM, che costruisce il modello e ripete
+# la verifica della proprietà di equilibrio solo per esportarne la strategia e simulare un percorso:
+# il costo di ogni percorso è quello di un'analisi, per questo il limite è basso
+MAX_PATHS = int(os.getenv('SIMULATION_MAX_PATHS', '100000'))
+MAX_POOL_PATHS = int(os.getenv('SIMULATION_MAX_POOL_PATHS', '64'))
+MAX_STEPS = int(os.getenv('SIMULATION_MAX_STEPS', '10000'))
+MAX_STATES = int(os.getenv('SIMULATION_MAX_STATES', '1000'))
+BATCH = 4096  # percorsi campionati insieme
+PERCENTILES = (50, 90, 99)
+
+
+def parse_options(options):
+    """
+    Validates the simulation options of a request.
+
+    Args:
+        options (dict): "paths" (required), and optionally "mode" ("session" or "pool"),
+            "max_steps", "workers" (pool mode) and "seed" (session mode: PRISM simulations
+            cannot be seeded, so the seed is rejected in pool mode).
+
+    Returns:
+        dict: The options, completed with the defaults, or None if no simulation is requested.
+
+    Raises:
+        ValueError: If an option is unknown or invalid.
+    """
+    if options is None:
+        return None
+    if not isinstance(options, dict):
+        raise ValueError("The simulation options must be an object")
+    unknown = set(options) - {"paths", "mode", "max_steps", "workers", "seed"}
+    if unknown:
+        raise ValueError(f"Unknown simulation options: {', '.join(sorted(unknown))}")
+    mode = options.get("mode", "session")
+    if mode not in ("session", "pool"):
+        raise ValueError(f"Unknown simulation mode: {mode}")
+    limit = MAX_PATHS if mode == "session" else MAX_POOL_PATHS
+    parsed = {"mode": mode}
+    for name, default, maximum in (("paths", None, limit), ("max_steps", MAX_STEPS, MAX_STEPS), ("workers", 4, 64)):
+        value = options.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= maximum:
+            raise ValueError(f"The simulation {name} must be an integer between 1 and {maximum}")
+        parsed[name] = value
+    seed = options.get("seed")
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+        raise ValueError("The simulation seed must be a non-negative integer")
+    if seed is not None and mode == "pool":
+        raise ValueError("The simulation seed is only supported in session mode")
+    parsed["seed"] = seed
+    return parsed
+
+
+class PathSummary:
+    """
+    Summary statistics of simulated paths, updated one path (or batch of paths) at a
+    time so that the paths themselves are never kept: how often every action is taken
+    and in how many paths, the distribution of the path lengths, and the actions taken
+    in every visited state, the most frequent being its optimal action.
+
+    Args:
+        max_steps (int): The length bound of the paths; the paths reaching it are truncated.
+    """
+    def __init__(self, max_steps=MAX_STEPS):
+        self.max_steps = max_steps
+        self.paths = 0
+        self.truncated = 0
+        self.lengths = Counter()
+        self.action_steps = Counter()
+        self.action_paths = Counter()
+        self.state_actions = {}
+        self._lock = threading.Lock()
+
+    def add_path(self, steps):
+        """
+        Adds a path.
+
+        Args:
+            steps (iterable): The (state, action) pairs of its transitions, the action
+                being the one chosen in the state (None for an unlabelled transition).
+        """
+        length = 0
+        actions = Counter()
+        states = {}
+        for state, action in steps:
+            length += 1
+            actions[action] += 1
+            states.setdefault(state, Counter())[action] += 1
+        with self._lock:
+            self.paths += 1
+            self.truncated += length >= self.max_steps
+            self.lengths[length] += 1
+            self.action_steps.update(actions)
+            self.action_paths.update(actions.keys())
+            for state, counts in states.items():
+                self.state_actions.setdefault(state, Counter()).update(counts)
+
+    def add_counts(self, lengths, action_steps, action_paths, state_actions):
+        """
+        Adds the counts of a set of paths (e.g. sampled together).
+
+        Args:
+            lengths (Counter): The number of paths of every length.
+            action_steps (Counter): The number of transitions of every action.
+            action_paths (Counter): The number of paths taking every action.
+            state_actions (dict): The number of times every action is chosen in every state.
+        """
+        with self._lock:
+            self.paths += sum(lengths.values())
+            self.truncated += sum(count for length, count in lengths.items() if length >= self.max_steps)
+            self.lengths.update(lengths)
+            self.action_steps.update(action_steps)
+            self.action_paths.update(action_paths)
+            for state, counts in state_actions.items():
+                self.state_actions.setdefault(state, Counter()).update(counts)
+
+    def to_dict(self, max_states=MAX_STATES):
+        """
+        Returns:
+            dict: The number of paths and of truncated paths, the length distribution
+                (minimum, maximum, mean, percentiles and histogram), the frequency of
+                every action, and the optimal actions of the most visited states.
+        """
+        with self._lock:
+            lengths = sorted(self.lengths.items())
+            percentiles = {}
+            cumulative = 0
+            targets = [(p, p / 100 * self.paths) for p in PERCENTILES]
+            for length, count in lengths:
+                cumulative += count
+                while targets and cumulative >= targets[0][1]:
+                    percentiles[f"p{targets.pop(0)[0]}"] = length
+            actions = {
+                "-" if action is None else action: {
+                    "count": count,
+                    "paths": self.action_paths[action],
+                    "share": self.action_paths[action] / self.paths
+                }
+                for action, count in self.action_steps.most_common()
+            }
+            visited = sorted(self.state_actions.items(), key=lambda item: -sum(item[1].values()))
+            states = []
+            for state, counts in visited[:max_states]:
+                visits = sum(counts.values())
+                action, count = counts.most_common(1)[0]
+                states.append({
+                    "state": state,
+                    "visits": visits,
+                    "optimal_action": action,
+                    "share": count / visits,
+                    "actions": {"-" if a is None else a: c for a, c in counts.most_common()}
+                })
+            return {
+                "paths": self.paths,
+                "truncated": self.truncated,
+                "max_steps": self.max_steps,
+                "length": {
+                    "min": lengths[0][0] if lengths else None,
+                    "max": lengths[-1][0] if lengths else None,
+                    "mean": sum(length * count for length, count in lengths) / self.paths if self.paths else None,
+                    **percentiles,
+                    "histogram": {str(length): count for length, count in lengths}
+                },
+                "actions": actions,
+                "states_visited": len(self.state_actions),
+                "states": states
+            }
+
+
+def initial_state(offsets, targets):
+    """The first state without incoming transitions, or the first state."""
+    incoming = np.zeros(len(offsets) - 1, dtype=bool)
+    incoming[targets] = True
+    roots = np.flatnonzero(~incoming)
+    return int(roots[0]) if len(roots) else 0
+
+
+def sample_strategy(strategy, paths, max_steps=MAX_STEPS, seed=None, summary=None):
+    """
+    Samples paths of the model induced by a strategy exported by PRISM (see
+    prism2json_parser.parse_strategy), in batches of BATCH paths advanced together
+    with NumPy. A path starts in the initial state and ends in a state without
+    transitions or after max_steps transitions. Where the strategy leaves several
+    actions, each is chosen with the same probability, then a successor with the
+    probability of its transition.
+
+    Args:
+        strategy (dict): The parsed strategy.
+        paths (int): The number of paths.
+        max_steps (int): The length bound of the paths.
+        seed (int): The seed of the sampling, or None.
+        summary (PathSummary): The summary to update, or None for a new one.
+
+    Returns:
+        PathSummary: The summary of the paths.
+    """
+    summary = summary or PathSummary(max_steps)
+    offsets = np.asarray(strategy["offsets"], dtype=np.int64)
+    n_states = len(offsets) - 1
+    if n_states <= 0:
+        return summary
+    targets = np.asarray(strategy["targets"], dtype=np.int64)
+    n_actions = len(strategy["actions"]) + 1  # 0: transizione senza azione
+    actions = np.asarray([0 if a is None else a + 1 for a in strategy["edge_actions"]], dtype=np.int64)
+    probabilities = np.asarray(strategy["probabilities"], dtype=float)
+    names = [state_name(label) for label in strategy["labels"]]
+    action_names = [None] + list(strategy["actions"])
+
+    # Ogni azione lasciata dalla strategia ha lo stesso peso, ripartito tra i suoi successori
+    degree = np.diff(offsets)
+    sources = np.repeat(np.arange(n_states), degree)
+    pairs = np.unique(sources * n_actions + actions)
+    choices = np.bincount(pairs // n_actions, minlength=n_states)
+    weights = probabilities / np.maximum(choices[sources], 1)
+    cumulative = np.concatenate(([0.], np.cumsum(weights)))
+    base = cumulative[offsets[:-1]]
+    total = cumulative[offsets[1:]] - base
+    final = (degree == 0) | (total <= 0)
+    start = initial_state(offsets, targets)
+
+    rng = np.random.default_rng(seed)
+    lengths = Counter()
+    action_steps = np.zeros(n_actions, dtype=np.int64)
+    action_paths = np.zeros(n_actions, dtype=np.int64)
+    state_actions = Counter()
+    done = 0
+    while done < paths:
+        size = min(BATCH, paths - done)
+        state = np.full(size, start, dtype=np.int64)
+        walkers = np.arange(size)
+        seen = np.zeros((size, n_actions), dtype=bool)
+        for step in range(max_steps):
+            ended = final[state]
+            if ended.any():
+                lengths[step] += int(ended.sum())
+                state = state[~ended]
+                walkers = walkers[~ended]
+            if not len(state):
+                break
+            u = rng.random(len(state))
+            edge = np.searchsorted(cumulative, base[state] + u * total[state], side="right") - 1
+            edge = np.clip(edge, offsets[state], offsets[state + 1] - 1)
+            action = actions[edge]
+            action_steps += np.bincount(action, minlength=n_actions)
+            seen[walkers, action] = True
+            keys, counts = np.unique(state * n_actions + action, return_counts=True)
+            state_actions.update(dict(zip(keys.tolist(), counts.tolist())))
+            state = targets[edge]
+        else:
+            # Percorsi ancora in corso al limite di lunghezza (o terminati esattamente lì)
+            if len(state):
+                lengths[max_steps] += len(state)
+        action_paths += seen.sum(axis=0)
+        done += size
+
+    by_state = {}
+    for key, count in state_actions.items():
+        s, a = divmod(key, n_actions)
+        by_state.setdefault(names[s], Counter())[action_names[a]] += count
+    used = np.flatnonzero(action_steps)
+    summary.add_counts(lengths,
+                       Counter({action_names[a]: int(action_steps[a]) for a in used}),
+                       Counter({action_names[a]: int(action_paths[a]) for a in used}),
+                       by_state)
+    return summary
+
+
+def read_path(lines):
+    """
+    Reads a path exported by PRISM with -simpath as a stream.
+
+    Args:
+        lines (iterable): The lines of the file: a header, then a state per line, with
+            the action of the transition into it first ("-" for the initial state).
+
+    Yields:
+        tuple: The (state, action) pair of every transition, the state being the one
+            where the action is chosen, as its variable values.
+    """
+    lines = iter(lines)
+    header = next(lines, "").split()
+    variables = [i for i, column in enumerate(header) if column not in ("action", "step")]
+    previous = None
+    for line in lines:
+        cells = line.split()
+        if not cells:
+            continue
+        state = "(" + ",".join(cells[i] for i in variables if i < len(cells)) + ")"
+        if previous is not None:
+            action = cells[0][1:-1] if cells[0].startswith("[") and cells[0].endswith("]") else None
+            yield previous, action
+        previous = state
+
+
+def run_path(model_path, props_path, workdir, index, settings, max_steps, job_id=None):
+    """
+    Simulates one path of the policy with PRISM, bounded by max_steps transitions.
+
+    Returns:
+        str: The path of the exported path file.
+    """
+    txt_path = os.path.join(workdir, f"path{index}.txt")
+    dot_path = os.path.join(workdir, f"strategy{index}.dot")
+    run_prism(
+        [PRISM_PATH, model_path, props_path, "-simpath", "deadlock", txt_path, "-simpathlen", str(max_steps),
+         "-exportstrat", dot_path] + settings.to_args(),
+        limits(settings.javamaxmem),
+        job_id
+    )
+    # La strategia serve a PRISM per simulare la politica, non al riepilogo
+    if os.path.exists(dot_path):
+        os.remove(dot_path)
+    return txt_path
+
+
+def simulate(options, tree, dot_content=None, strategy=None, settings=None, timed=False):
+    """
+    Simulates several paths of the policy of a tree and summarises them (see PathSummary).
+
+    In "session" mode the paths are sampled from the strategy exported by the PRISM run
+    of the analysis, so PRISM does not run again. In "pool" mode every path is a
+    separate PRISM simulation (-simpath), run on a pool of workers; the path files are
+    read as streams and removed as soon as they are summarised.
+
+    Args:
+        options (dict): The simulation options (see parse_options).
+        tree (Tree): The analysed tree, after any prune.
+        dot_content (str): The strategy exported by the analysis (session mode).
+        strategy (dict): The same strategy already parsed, if available (session mode).
+        settings (dict): The requested PRISM settings (pool mode).
+        timed (bool): Whether to use the time-based model (pool mode).
+
+    Returns:
+        dict: The summary of the paths and the mode.
+
+    Raises:
+        PrismError: If a PRISM simulation fails, is cancelled or exceeds its limits.
+    """
+    summary = PathSummary(options["max_steps"])
+    if options["mode"] == "session":
+        if strategy is None:
+            strategy = parse_strategy(dot_content or "")
+        logging.info(f"Sampling {options['paths']} paths from the strategy...")
+        sample_strategy(strategy, options["paths"], options["max_steps"], options["seed"], summary)
+    else:
+        resolved = prism_settings.resolve(settings, len(tree.nodes))
+        prism_model = tp.get_prism_model_time(tree, templates=TEMPLATES) if timed else tp.get_prism_model(tree, templates=TEMPLATES)
+        properties, _ = tp.get_prism_properties()
+        job_id = current_job.get()
+
+        def simulate_path(index):
+            txt_path = run_path(model_path, props_path, workdir, index, resolved, options["max_steps"], job_id)
+            with open(txt_path) as f:
+                summary.add_path(read_path(f))
+            os.remove(txt_path)
+
+        with tempfile.TemporaryDirectory() as workdir:
+            model_path = os.path.join(workdir, "model.prism")
+            props_path = os.path.join(workdir, "properties.props")
+            tp.save_prism_model(prism_model, model_path)
+            with open(props_path, "w") as f:
+                f.write(properties)
+            logging.info(f"Simulating {options['paths']} paths with {options['workers']} workers...")
+            try:
+                with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                    list(executor.map(in_context(simulate_path), range(options["paths"])))
+            except PrismError as e:
+                logging.error(f"Error during command execution ({e.kind}): {e}")
+                raise
+    return dict(summary.to_dict(), mode=options["mode"])
@@ -0,0 +1,211 @@
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+from modules.instrumentation import span
+from modules.json2xml_pruner import remove_subtrees_from_xml
+from modules.panacea_script import panacea
+from modules.prism_runner import JOBS_DIR, PrismError, cancel, job
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../PANACEA')))
+from validator import validate_string
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+# Budget del precalcolo: prune per albero (0 lo disattiva), prune in attesa, tentativi dopo una
+# prelazione, secondi di inattività prima di iniziare e intervallo di controllo
+SPECULATIVE_PRUNES = int(os.getenv('SPECULATIVE_PRUNES', '8'))
+SPECULATIVE_QUEUE = int(os.getenv('SPECULATIVE_QUEUE', '64'))
+SPECULATIVE_ATTEMPTS = int(os.getenv('SPECULATIVE_ATTEMPTS', '3'))
+SPECULATIVE_IDLE = float(os.getenv('SPECULATIVE_IDLE', '2'))
+POLL_INTERVAL = 0.2
+
+# I job speculativi si riconoscono dal prefisso: gli altri sono richieste dei client
+JOB_PREFIX = "speculative-"
+
+
+def likely_prunes(tree, limit=SPECULATIVE_PRUNES):
+    """
+    Lists the subtrees an analyst is likely to hide next: the defender countermeasures,
+    i.e. the Defender nodes whose parent is not a Defender node, in preorder.
+
+    Args:
+        tree (Tree): The tree.
+        limit (int): The maximum number of labels.
+
+    Returns:
+        list: The labels of the roots of the countermeasure subtrees.
+    """
+    nodes, _, parent, _ = tree.ancestry()
+    labels = []
+    for i, node in enumerate(nodes):
+        if len(labels) >= limit:
+            break
+        if node.role == "Defender" and parent[i] >= 0 and nodes[parent[i]].role != "Defender":
+            labels.append(node.label)
+    return labels
+
+
+def interactive_jobs():
+    """
+    Returns:
+        bool: Whether a client request is running in any worker (see prism_runner.job).
+    """
+    try:
+        return any(not name.startswith(JOB_PREFIX) for name in os.listdir(JOBS_DIR))
+    except FileNotFoundError:
+        return False
+
+
+class Precomputer:
+    """
+    A low-priority background thread that, after a tree is uploaded, analyses the tree
+    without each of its countermeasure subtrees, as /receive_json would when the analyst
+    hides them, and stores the outputs in the result cache.
+
+    Speculative work never delays the requests: a prune starts only after no request
+    has been running for SPECULATIVE_IDLE seconds, one at a time, and it is cancelled as
+    soon as a request starts, then retried later (at most SPECULATIVE_ATTEMPTS times).
+    PRISM runs with the background limits (see prism_runner.limits), and the pending
+    prunes are bounded by SPECULATIVE_QUEUE, the oldest being dropped.
+    """
+    def __init__(self, prunes=SPECULATIVE_PRUNES, queue=SPECULATIVE_QUEUE,
+                 attempts=SPECULATIVE_ATTEMPTS, idle=SPECULATIVE_IDLE):
+        self.prunes = prunes
+        self.queue = queue
+        self.attempts = attempts
+        self.idle = idle
+        self.pid = None
+        self.tasks = deque()
+        self.counters = {name: 0 for name in
+                         ("submitted", "completed", "cached", "rejected", "preempted", "failed", "dropped")}
+        self._condition = threading.Condition()
+
+    def start(self):
+        """Starts the thread, again in a child process forked by a server (e.g. a gunicorn worker)."""
+        with self._condition:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.tasks.clear()
+            threading.Thread(target=self._run, name="prism-speculation", daemon=True).start()
+
+    def submit(self, xml_content, tree, settings=None, queries=None, timed=False):
+        """
+        Queues the likely prunes of an uploaded tree, analysed with the settings, queries
+        and model of its upload.
+
+        Args:
+            xml_content (str): The XML of the tree.
+            tree (Tree): Its parsed tree.
+            settings (dict): The PRISM settings of the upload.
+            queries (list): The queries of the upload.
+            timed (bool): Whether the upload used the time-based model.
+
+        Returns:
+            int: The number of prunes queued.
+        """
+        if self.prunes <= 0:
+            return 0
+        labels = likely_prunes(tree, self.prunes)
+        if not labels:
+            return 0
+        self.start()
+        with self._condition:
+            for label in labels:
+                self.tasks.append({"xml": xml_content, "tree": tree, "label": label, "settings": settings,
+                                   "queries": queries, "timed": timed, "attempts": 0})
+                self.counters["submitted"] += 1
+            while len(self.tasks) > self.queue:
+                self.tasks.popleft()
+                self.counters["dropped"] += 1
+            self._condition.notify()
+        logging.info(f"{len(labels)} speculative prune(s) queued")
+        return len(labels)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self.tasks:
+                    self._condition.wait()
+            self._wait_idle()
+            with self._condition:
+                if not self.tasks:
+                    continue
+                task = self.tasks.popleft()
+            self._execute(task)
+
+    def _wait_idle(self):
+        idle_since = time.monotonic()
+        while time.monotonic() - idle_since < self.idle:
+            if interactive_jobs():
+                idle_since = time.monotonic()
+            time.sleep(POLL_INTERVAL)
+
+    def _execute(self, task):
+        label = task["label"]
+        task["attempts"] += 1
+        pruned_xml = remove_subtrees_from_xml(task["xml"], [label])
+        # Un prune che renderebbe l'albero non valido sarebbe rifiutato anche da /receive_json
+        if any(issue.severity == "error" for issue in validate_string(pruned_xml, task["timed"])):
+            self._count("rejected")
+            return
+
+        job_id = JOB_PREFIX + uuid.uuid4().hex
+        done = threading.Event()
+        preempted = threading.Event()
+
+        def watch():
+            while not done.wait(POLL_INTERVAL):
+                if interactive_jobs():
+                    preempted.set()
+                    cancel(job_id)
+                    return
+
+        try:
+            with job(job_id), span("speculative", label=label) as attributes:
+                watcher = threading.Thread(target=watch, name="prism-speculation-watch", daemon=True)
+                watcher.start()
+                try:
+                    output = panacea(pruned_xml, task["settings"], task["queries"], task["timed"],
+                                     tree=task["tree"].hide(label), speculative=True)
+                finally:
+                    done.set()
+                    watcher.join()
+                attributes["cached"] = output is None
+            self._count("cached" if output is None else "completed")
+        except PrismError as e:
+            if e.kind == "cancelled" and preempted.is_set():
+                self._count("preempted")
+                if task["attempts"] < self.attempts:
+                    with self._condition:
+                        self.tasks.appendleft(task)
+                return
+            logging.info(f"Speculative prune of {label} failed ({e.kind}): {e}")
+            self._count("failed")
+        except Exception as e:
+            logging.info(f"Speculative prune of {label} failed: {e}")
+            self._count("failed")
+
+    def _count(self, name):
+        with self._condition:
+            self.counters[name] += 1
+
+    def status(self):
+        """
+        Returns:
+            dict: The pending prunes and the counters of the prunes by outcome.
+        """
+        with self._condition:
+            return dict(self.counters, pending=len(self.tasks))
+
+
+PRECOMPUTER = Precomputer()
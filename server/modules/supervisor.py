@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+from contextlib import contextmanager
+
+from modules.instrumentation import group_rss
+
+# Esecuzioni di PRISM contemporanee per processo: le altre attendono in coda
+PRISM_CONCURRENCY = int(os.getenv('PRISM_CONCURRENCY', str(os.cpu_count() or 4)))
+SAMPLE_INTERVAL = 0.05
+
+
+class Supervisor:
+    """
+    An asyncio event loop, in a background thread, that supervises all the PRISM
+    processes of this server process: the request threads submit coroutines and wait
+    for their results, while the loop waits for the processes, reads their outputs,
+    samples their memory and enforces their limits.
+
+    Args:
+        concurrency (int): The maximum number of processes running at once.
+    """
+    def __init__(self, concurrency=PRISM_CONCURRENCY):
+        self.concurrency = concurrency
+        self.loop = None
+        self.semaphore = None
+        self.pid = None
+        self.peaks = {}
+        self.queued = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the loop, again in a child process forked by a server (e.g. a gunicorn worker)."""
+        with self._lock:
+            if self.pid == os.getpid():
+                return
+            self.loop = asyncio.new_event_loop()
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            self.peaks = {}
+            self.pid = os.getpid()
+            ready = threading.Event()
+            threading.Thread(target=self._run, args=(ready,), name="prism-supervisor", daemon=True).start()
+            ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.create_task(self._sample())
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the loop and waits for its result in the calling thread.
+
+        Returns:
+            The result of the coroutine.
+
+        Raises:
+            Exception: The exception raised by the coroutine.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _sample(self):
+        # Un'unica scansione di /proc per tutti i gruppi di processi in esecuzione
+        while True:
+            if self.peaks:
+                rss = await asyncio.to_thread(group_rss, set(self.peaks))
+                for pgid, total in rss.items():
+                    if pgid in self.peaks:
+                        self.peaks[pgid] = max(self.peaks[pgid] or 0, total)
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    def watch(self, pgid):
+        """Starts sampling the memory of a process group."""
+        self.peaks[pgid] = None
+
+    def unwatch(self, pgid):
+        """
+        Returns:
+            int: The peak RSS of the process group, or None if it was never sampled.
+        """
+        return self.peaks.pop(pgid, None)
+
+    @contextmanager
+    def exit_event(self, pid):
+        """
+        Yields an event set when a child process exits. The process is not reaped, so
+        that the caller can collect its resource usage with wait4. Without pidfd
+        (Linux < 5.3) the event is never set and the caller polls.
+        """
+        event = asyncio.Event()
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            pidfd = None
+        if pidfd is not None:
+            self.loop.add_reader(pidfd, event.set)
+        try:
+            yield event
+        finally:
+            if pidfd is not None:
+                self.loop.remove_reader(pidfd)
+                os.close(pidfd)
+
+    def alive(self):
+        """
+        Returns:
+            bool: Whether the loop runs, or is not started yet, in this process.
+        """
+        return self.pid != os.getpid() or (self.loop is not None and self.loop.is_running())
+
+    def status(self):
+        """
+        Returns:
+            dict: The concurrency limit, the running processes and the queued executions.
+        """
+        return {"concurrency": self.concurrency, "running": len(self.peaks), "queued": self.queued}
+
+
+SUPERVISOR = Supervisor()
@@ -11,6 +11,9 @@ logging.basicConfig(
 import logging
 import json
 
+from modules.instrumentation import traced
+
+@traced("extract_policy")
 def extract_policy(txt_content):
     """
     Parses a tabular text file content (as a string), extracts states and actions,
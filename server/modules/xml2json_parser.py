@@ -3,15 +3,24 @@ import json
 import os
 import re
 import string
+import sys
 import logging
 from datetime import datetime
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../PANACEA')))
+from comment_metadata import parse_comment
+from layout import edge_layout
+from modules.instrumentation import traced
+
 # Configure the logging system
 logging.basicConfig(
     level=logging.INFO,  # Set the minimum logging level
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# Layout delle posizioni dei nodi salvate con l'albero JSON: "tidy" o "hierarchy"
+TREE_LAYOUT_MODE = os.getenv('TREE_LAYOUT_MODE', 'tidy')
+
 def parse_node_name(label):
     """
     Parses the node label to create a human-readable name.
@@ -39,19 +48,7 @@ def extract_additional_info(comment):
     Returns:
         dict: A dictionary containing additional information parsed from the comment.
     """
-    additional_info = {}
-    for line in comment.splitlines():
-        if ":" in line:
-            key, value = line.split(":", 1)
-            key = key.strip().lower()  # Convert the key to lowercase
-            value = value.strip()
-            try:
-                # Convert numeric values to integers if possible
-                value = int(value)
-            except ValueError:
-                pass
-            additional_info[key] = value
-    return additional_info
+    return parse_comment(comment).to_dict()
 
 def traverse(node, parent_id=None):
     """
@@ -64,18 +61,9 @@ def traverse(node, parent_id=None):
     global node_id
     label = node.find('label').text if node.find('label') is not None else None
     comment = node.find('comment').text if node.find('comment') is not None else None
-    node_type = None
-    additional_info = {}
-
-    if comment:
-        # Extract the node type from the comment
-        for line in comment.splitlines():
-            if "Type:" in line:
-                node_type = line.split("Type:")[1].strip()
-                break
-        # Extract additional information if the node is of type 'Action'
-        if node_type == "Action":
-            additional_info = extract_additional_info(comment)
+    # Parse the comment once: type and additional information come from the same record
+    metadata = parse_comment(comment)
+    node_type = metadata.type or None
 
     current_id = node_id
     if label:
@@ -87,7 +75,7 @@ def traverse(node, parent_id=None):
         }
         # Add extra information for nodes of type 'Action'
         if node_type == "Action":
-            node_data.update(additional_info)
+            node_data.update(metadata.to_dict())
         nodes.append(node_data)
         node_id += 1
 
@@ -102,6 +90,7 @@ def traverse(node, parent_id=None):
     for child in node.findall('node'):
         traverse(child, current_id)
 
+@traced("parse_tree")
 def parse_tree(xml_content):
     """
     Parses an XML string into a JSON structure.
@@ -110,7 +99,8 @@ def parse_tree(xml_content):
         xml_content (str): Content of the XML file as a string.
 
     Returns:
-        dict: JSON structure of the parsed XML.
+        dict: JSON structure of the parsed XML, with the layout of the nodes (their
+            x and y coordinates, indexed by node id).
     """
     logging.info("Parsing tree data from XML to JSON...")
     
@@ -129,10 +119,18 @@ def parse_tree(xml_content):
     for child in root.findall('node'):
         traverse(child)  # No `parent_id` passed for the root node
 
+    # Posizioni dei nodi, per id, calcolate qui una volta per albero invece che dal frontend
+    x, y = edge_layout(len(nodes), [(e["id_source"], e["id_target"]) for e in edges], TREE_LAYOUT_MODE)
+
     output_data = {
         "tree": {
             "nodes": nodes,
             "edges": edges
+        },
+        "layout": {
+            "mode": TREE_LAYOUT_MODE,
+            "x": x.tolist(),
+            "y": y.tolist()
         }
     }
 
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(ROOT, 'PANACEA'))
+sys.path.append(os.path.join(ROOT, 'benchmarks'))
+sys.path.append(os.path.join(ROOT, 'server'))
@@ -0,0 +1,23 @@
+import pytest
+
+import explicit_model as em
+import tree_to_prism as tp
+from explicit_import import compare, explicit_view, interpret
+from generator import generate_tree
+
+TREES = [(depth, ratio, seed) for depth in (2, 3) for ratio in (0.0, 0.3, 0.6) for seed in range(3)]
+# larger state spaces are skipped: the naive interpreter is slow on them
+MAX_STATES = 5000
+
+
+@pytest.mark.parametrize("timed", [False, True])
+@pytest.mark.parametrize("depth,ratio,seed", TREES)
+def test_explorer_matches_language_model(depth, ratio, seed, timed):
+    generate = tp.get_prism_model_time if timed else tp.get_prism_model
+    tree = tp.parse_string(generate_tree(depth=depth, defender_ratio=ratio, max_nodes=60, seed=seed))
+    try:
+        model = em.explore(tree, timed=timed, max_states=MAX_STATES)
+    except em.StateSpaceError as e:
+        pytest.skip(str(e))
+    # states, transitions, rewards, terminate states and players
+    assert compare(interpret(generate(tree)), explicit_view(model)) == []
@@ -0,0 +1,21 @@
+import pytest
+
+from modules import prism_settings
+
+
+def test_requests_cannot_choose_the_model():
+    with pytest.raises(ValueError, match="Unknown PRISM settings: model"):
+        prism_settings.validate({"engine": "explicit", "model": "explicit"})
+
+
+def test_model_from_the_environment(monkeypatch):
+    monkeypatch.setenv('PRISM_MODEL', 'explicit')
+    assert prism_settings.defaults()["model"] == "explicit"
+    monkeypatch.setenv('PRISM_MODEL', 'binary')
+    with pytest.raises(ValueError, match="Unknown PRISM model"):
+        prism_settings.defaults()
+
+
+def test_explicit_model_off_by_default():
+    for size in (1, 50, 1000):
+        assert "model" not in prism_settings.heuristics(size)
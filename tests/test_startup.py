@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from generator import generate_tree
+from startup import HEAVY_MODULES, PANACEA_DIR, import_times
+
+# cumulative import time allowed to the conversion path, overridable on slow machines
+BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '100'))
+
+
+@pytest.mark.parametrize("module", ["tree_to_prism", "main"])
+def test_import_within_budget(module):
+    times = import_times(module)
+    total_ms = next(c for _, c, name in times if name.strip() == module) / 1000
+    assert total_ms <= BUDGET_MS, f"import {module} took {total_ms:.2f} ms (budget {BUDGET_MS:.2f} ms)"
+
+
+@pytest.mark.parametrize("module", ["tree_to_prism", "main"])
+def test_no_heavy_modules(module):
+    imported = {name.strip().split(".")[0] for _, _, name in import_times(module)}
+    assert not imported & set(HEAVY_MODULES)
+
+
+def test_main_runs_without_heavy_modules(tmp_path):
+    # the command line converts a tree without loading the layout or analysis dependencies
+    source = tmp_path / "tree.xml"
+    source.write_text(generate_tree(depth=3, seed=0))
+    script = ("import runpy, sys; sys.argv = ['main.py', '--input', sys.argv[1], '--output', sys.argv[2]]; "
+              "runpy.run_path('main.py', run_name='__main__'); "
+              f"print(sorted(set(m.split('.')[0] for m in sys.modules) & {set(HEAVY_MODULES)!r}))")
+    result = subprocess.run([sys.executable, "-c", script, str(source), str(tmp_path / "tree.prism")],
+                            cwd=PANACEA_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+    assert (tmp_path / "tree.prism").exists()
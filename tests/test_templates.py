@@ -0,0 +1,47 @@
+import pytest
+
+import tree_to_prism as tp
+from generator import generate_tree
+from templates import randomize
+
+TREES = [(depth, ratio, seed) for depth in (2, 3, 5) for ratio in (0.0, 0.3) for seed in range(3)]
+
+
+def relabel(xml, seed):
+    """Renames the labels and the actions of a generated tree, keeping its structure."""
+    return xml.replace("Attribute", f"Attr{seed}x").replace("action", f"act{seed}x").replace("Action", f"Act{seed}x")
+
+
+@pytest.mark.parametrize("timed", [False, True])
+@pytest.mark.parametrize("depth,ratio,seed", TREES)
+def test_templated_model_equals_full_generation(depth, ratio, seed, timed):
+    generate = tp.get_prism_model_time if timed else tp.get_prism_model
+    cache = tp.TemplateCache()
+    tree = tp.parse_string(generate_tree(depth=depth, defender_ratio=ratio, max_nodes=150, seed=seed))
+    assert generate(tree, templates=cache) == generate(tree)
+    assert cache.misses == 1
+
+    # same structure with new costs and times: rendered from the cached template
+    for variant in range(3):
+        randomize(tree, variant)
+        assert generate(tree, templates=cache) == generate(tree)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+@pytest.mark.parametrize("timed", [False, True])
+def test_relabelled_trees_get_their_own_template(timed):
+    generate = tp.get_prism_model_time if timed else tp.get_prism_model
+    cache = tp.TemplateCache()
+    xml = generate_tree(depth=3, defender_ratio=0.3, max_nodes=100, seed=1)
+    for seed in range(3):
+        tree = tp.parse_string(relabel(xml, seed))
+        assert generate(tree, templates=cache) == generate(tree)
+        randomize(tree, seed)
+        assert generate(tree, templates=cache) == generate(tree)
+    assert (cache.hits, cache.misses) == (3, 3)
+
+
+def test_constants_render_as_full_generation():
+    cache = tp.TemplateCache()
+    tree = tp.parse_string(generate_tree(depth=3, defender_ratio=0.3, max_nodes=100, seed=2))
+    assert tp.get_prism_model(tree, templates=cache, constants=True) == tp.get_prism_model(tree, constants=True)